@@ -15,16 +15,12 @@ import logging
 from sqlalchemy import text
 import re
 import socket
+import time
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
-    handlers=[
-        logging.FileHandler("app_init_debug.log"),
-        logging.StreamHandler()
-    ]
-)
+# Configurar logging (fila assíncrona; nível via LOG_LEVEL)
+from app.logging_setup import configure_logging
+from app.tracing import init_tracing, record_span
+configure_logging()
 logger = logging.getLogger('blog_app_init')
 
 # Inicializar objetos
@@ -56,6 +52,21 @@ login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Please log in to access this page.'
 login_manager.login_message_category = 'info'
 
+class LazyCsrfToken:
+    """Token CSRF gerado apenas quando um template o lê.
+
+    Funciona tanto como {{ csrf_token }} quanto como {{ csrf_token() }};
+    páginas sem formulário não pagam o HMAC nem alteram a sessão.
+    """
+    def __call__(self):
+        from flask_wtf.csrf import generate_csrf
+        return generate_csrf()
+
+    def __str__(self):
+        return self()
+
+    __html__ = __str__
+
 def diagnose_connection(host, port=5432):
     """Função para diagnosticar problemas de conectividade com banco de dados"""
     results = {
@@ -127,14 +138,20 @@ def setup_db_event_listeners(app_db):
     
     @app_db.event.listens_for(app_db.engine, 'checkout')
     def receive_checkout(dbapi_connection, connection_record, connection_proxy):
-        logger.info("Conexão retirada do pool")
+        logger.debug("Conexão retirada do pool")
     
     @app_db.event.listens_for(app_db.engine, 'before_cursor_execute')
     def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-        # Logar apenas as consultas relacionadas a posts para não sobrecarregar o log
-        if 'post' in statement.lower():
-            logger.info(f"SQL: {statement}")
-            logger.info(f"Parâmetros: {parameters}")
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+        # Caminho quente: sem custo algum quando o nível DEBUG está desativado
+        if logger.isEnabledFor(logging.DEBUG) and 'post' in statement.lower():
+            logger.debug("SQL: %s", statement, extra={'params': parameters})
+    
+    @app_db.event.listens_for(app_db.engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # Span da consulta no trace da requisição (ignorado fora de requisições)
+        started = conn.info['query_started'].pop()
+        record_span('sql', 'sql', started, {'db.statement': statement[:300]})
     
     logger.info("Event listeners registrados para SQLAlchemy")
 
@@ -228,16 +245,17 @@ def create_app():
         app.config['SESSION_COOKIE_PATH'] = "/"
     
     # Configurações da sessão
-    app.config['SESSION_TYPE'] = 'filesystem'
     app.config['SESSION_PERMANENT'] = True
     app.config['SESSION_USE_SIGNER'] = True
     app.config['SESSION_REFRESH_EACH_REQUEST'] = True
-    app.config['SESSION_FILE_DIR'] = os.path.join(app.instance_path, 'flask_session')
     app.config['SESSION_KEY_PREFIX'] = 'reconquest_'
-    app.config['SESSION_FILE_THRESHOLD'] = 500  # Aumentar número máximo de arquivos de sessão
     app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=31)  # Aumentar tempo de vida da sessão
-    os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
-    logger.info(f"Diretório de sessão: {app.config['SESSION_FILE_DIR']}")
+    if app.config.get('SESSION_BACKEND') == 'filesystem':
+        app.config['SESSION_TYPE'] = 'filesystem'
+        app.config['SESSION_FILE_DIR'] = os.path.join(app.instance_path, 'flask_session')
+        app.config['SESSION_FILE_THRESHOLD'] = 500  # Aumentar número máximo de arquivos de sessão
+        os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
+        logger.info(f"Diretório de sessão: {app.config['SESSION_FILE_DIR']}")
     
     # Configuração CSRF
     # TEMPORARIAMENTE DESABILITADO PARA PERMITIR LOGIN/REGISTRO
@@ -259,10 +277,33 @@ def create_app():
     
     logger.info("Proteção CSRF: DESATIVADA TEMPORARIAMENTE")
     
+    # Circuit breakers das dependências HTTP externas
+    from app.circuit_breaker import configure_breakers
+    configure_breakers(app.config)
+    
+    # Métricas Prometheus (precisa vir antes do db.init_app para instrumentar o pool)
+    from app.metrics import init_metrics
+    init_metrics(app)
+    
+    # Request ID, spans por requisição e Server-Timing para admins
+    init_tracing(app)
+    
+    # Profiler sob demanda (?_profile=cprofile|sample) e amostragem 1 a cada N
+    from app.profiler import init_profiler
+    init_profiler(app)
+    
+    # Compressão gzip/brotli (registrada depois do tracing: o span entra no Server-Timing)
+    from app.compression import init_compression
+    init_compression(app)
+    
     # Inicializar extensões
     db.init_app(app)
     logger.info("SQLAlchemy inicializado")
     
+    # GET/HEAD sem escrita: transação READ ONLY e alerta de flush
+    from app.read_only import init_read_only_guard
+    init_read_only_guard(app, db)
+    
     # Configurar listeners dentro do contexto da aplicação
     with app.app_context():
         setup_db_event_listeners(db)
@@ -326,6 +367,8 @@ def create_app():
         logger.warning("Alterando para SQLite como fallback devido a erro de conexão...")
         # Alterar para SQLite como fallback
         app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(app.instance_path, 'fallback.db')
+        # Opções de pool do PostgreSQL não se aplicam ao SQLite
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
         logger.info(f"Novo URI SQLite: {app.config['SQLALCHEMY_DATABASE_URI']}")
         # Reinicializar a conexão mas manter a instância db
         with app.app_context():
@@ -337,9 +380,24 @@ def create_app():
         logger.info("Flask-Migrate inicializado")
     login_manager.init_app(app)
     logger.info("Flask-Login inicializado")
-    if sess is not None:
-        sess.init_app(app)
-        logger.info("Flask-Session inicializado")
+    if app.config.get('SESSION_BACKEND') == 'filesystem':
+        if sess is not None:
+            sess.init_app(app)
+            logger.info("Flask-Session inicializado")
+    else:
+        # Sessões em tabela SQL com expiração indexada (compartilhadas entre nós)
+        from app.session_store import init_sql_sessions
+        try:
+            init_sql_sessions(app, db)
+            logger.info("Sessões SQL inicializadas")
+        except Exception as e:
+            logger.error(f"❌ Erro ao inicializar sessões SQL: {str(e)}")
+            if sess is not None:
+                app.config['SESSION_TYPE'] = 'filesystem'
+                app.config['SESSION_FILE_DIR'] = os.path.join(app.instance_path, 'flask_session')
+                os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
+                sess.init_app(app)
+                logger.warning("Usando Flask-Session (filesystem) como fallback")
     
     # Configurar login manager
     login_manager.login_view = 'auth.login'
@@ -472,6 +530,15 @@ def create_app():
         except Exception as e:
             logger.error(f"❌ Erro ao criar tabelas do banco de dados: {str(e)}")
             logger.exception("Detalhes do erro ao criar tabelas:")
+
+    from app.search import init_search
+    init_search(app)
+    
+    from app.popularity import init_popularity
+    init_popularity(app)
+    
+    from app.feeds import init_feeds
+    init_feeds(app)
     
     # Handler específico para erros de CSRF
     @app.errorhandler(CSRFError)
@@ -509,15 +576,29 @@ def create_app():
         logger.error(f"Erro interno do servidor: {str(e)}")
         return render_template('errors/500.html', error=str(e)), 500
     
-    # Adicionar variável now para os templates e token CSRF
+    # Manifesto dos arquivos estáticos (asset_url nos templates, sem stat por requisição)
+    from app.assets import static_manifest
+    static_manifest.init_app(app)
+    
+    # Versão dos templates para os ETags das páginas (GET condicional)
+    from app.conditional import init_conditional
+    init_conditional(app)
+    
+    # Token CSRF preguiçoso: só é gerado se o template realmente o usar
+    app.jinja_env.globals['csrf_token'] = LazyCsrfToken()
+    
+    # Adicionar variável now para os templates
     @app.context_processor
     def inject_template_globals():
-        from flask_wtf.csrf import generate_csrf
         return {
-            'now': datetime.utcnow(),
-            'csrf_token': generate_csrf()
+            'now': datetime.utcnow()
         }
     
+    # Fechar as conexões abertas durante a inicialização: com preload_app os
+    # workers são forkados depois daqui e não podem herdar sockets do master
+    with app.app_context():
+        db.engine.dispose()
+    
     logger.info("==== APLICAÇÃO FLASK INICIALIZADA COM SUCESSO ====")
     return app
 
@@ -0,0 +1,209 @@
+"""
+Manifesto dos arquivos estáticos
+
+Na inicialização, app/static é percorrido uma única vez e cada arquivo fica
+registrado com tamanho e fingerprint (sha256 do conteúdo). Durante as
+requisições, existência e fingerprint são consultas O(1) a um dicionário:
+nenhuma chamada ao sistema de arquivos no caminho da requisição.
+
+O manifesto é reconstruído a cada deploy (reinício dos workers) e pode ser
+atualizado explicitamente com `static_manifest.refresh()` depois de gravar
+novos arquivos em app/static.
+
+Nos templates, `asset_url('css/style.css')` gera a URL com o fingerprint
+(`/static/css/style.css?v=<hash>`), que muda sempre que o conteúdo muda.
+
+Pacotes (BUNDLES) gerados por scripts/build_assets.py ficam em app/static/dist
+com o hash no nome e variantes .gz/.br pré-comprimidas; quando o build existe
+(dist/manifest.json), `asset_url`/`asset_urls` apontam para eles e a rota
+static os entrega com a codificação negociada e Cache-Control imutável. Sem
+build, os arquivos de origem são usados normalmente.
+"""
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import threading
+
+from flask import request, send_from_directory, url_for
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_LENGTH = 12
+
+# Nome lógico do pacote -> arquivos de origem (relativos a app/static), na ordem
+BUNDLES = {
+    'css/site.css': ['css/style.css', 'css/custom.css'],
+    'css/admin.css': ['css/admin.css'],
+    'js/main.js': ['js/main.js'],
+    'js/admin.js': ['js/admin.js'],
+    'js/chat.js': ['js/chat.js'],
+}
+
+DIST_DIR = 'dist'
+BUILD_MANIFEST = DIST_DIR + '/manifest.json'
+
+# Codificações pré-comprimidas, em ordem de preferência
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def negotiate_encoding(available):
+    """Melhor codificação de `available` aceita pelo cliente (Accept-Encoding), ou None"""
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = request.accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class StaticManifest:
+    """Índice em memória de app/static: caminho relativo -> {size, fingerprint}"""
+
+    def __init__(self, static_folder=None):
+        self.static_folder = static_folder
+        self.use_bundles = True
+        self._entries = None
+        self._bundles = {}
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.use_bundles = app.config.get('ASSET_BUNDLES', True)
+        self.refresh()
+        app.jinja_env.globals['asset_url'] = self.url
+        app.jinja_env.globals['asset_urls'] = self.urls
+        static_view = app.view_functions.get('static')
+        if static_view is not None:
+            app.view_functions['static'] = self._wrap_static_view(static_view)
+
+    def refresh(self):
+        """Percorre o diretório estático e troca o manifesto inteiro de uma vez"""
+        entries = {}
+        if self.static_folder and os.path.isdir(self.static_folder):
+            for root, _, files in os.walk(self.static_folder):
+                for name in files:
+                    path = os.path.join(root, name)
+                    relative = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                    try:
+                        entries[relative] = self._describe(path)
+                    except OSError as e:
+                        logger.warning("Arquivo estático ignorado (%s): %s", relative, e)
+        bundles, variants = self._load_build(entries)
+        with self._lock:
+            self._entries = entries
+            self._bundles = bundles
+            self._variants = variants
+        logger.info("Manifesto estático: %s arquivos, %s pacotes", len(entries), len(bundles))
+        return entries
+
+    def _load_build(self, entries):
+        """Lê dist/manifest.json, ignorando pacotes cujos arquivos não existem"""
+        if BUILD_MANIFEST not in entries:
+            return {}, {}
+        try:
+            with open(os.path.join(self.static_folder, BUILD_MANIFEST), encoding='utf-8') as f:
+                build = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Manifesto do build ignorado: %s", e)
+            return {}, {}
+        bundles, variants = {}, {}
+        for name, info in build.get('bundles', {}).items():
+            path = f"{DIST_DIR}/{info['file']}"
+            if path not in entries:
+                logger.warning("Pacote %s ausente em %s; usando os arquivos de origem", name, path)
+                continue
+            bundles[name] = path
+            variants[path] = {
+                encoding: f"{DIST_DIR}/{compressed}"
+                for encoding, compressed in info.get('encodings', {}).items()
+                if f"{DIST_DIR}/{compressed}" in entries
+            }
+        return bundles, variants
+
+    @staticmethod
+    def _describe(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+        return {
+            'size': os.path.getsize(path),
+            'fingerprint': digest.hexdigest()[:FINGERPRINT_LENGTH],
+        }
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            # Uso fora do create_app (scripts): construir sob demanda uma vez
+            self.refresh()
+        return self._entries
+
+    @staticmethod
+    def normalize(path):
+        """Aceita 'css/x.css', '/static/css/x.css' ou 'static/css/x.css'"""
+        path = (path or '').split('?', 1)[0].lstrip('/')
+        if path.startswith('static/'):
+            path = path[len('static/'):]
+        return path
+
+    def get(self, path):
+        return self.entries.get(self.normalize(path))
+
+    def exists(self, path):
+        return self.normalize(path) in self.entries
+
+    def fingerprint(self, path):
+        entry = self.get(path)
+        return entry['fingerprint'] if entry else None
+
+    def url(self, filename):
+        """URL do pacote do build ou do arquivo com o fingerprint do conteúdo (cache busting)"""
+        filename = self.normalize(filename)
+        if self.use_bundles and filename in self._bundles:
+            # O nome do arquivo já contém o hash
+            return url_for('static', filename=self._bundles[filename])
+        fingerprint = self.fingerprint(filename)
+        if fingerprint is None:
+            return url_for('static', filename=filename)
+        return url_for('static', filename=filename, v=fingerprint)
+
+    def urls(self, name):
+        """URLs a incluir para um pacote: o arquivo do build ou, sem build, cada origem"""
+        name = self.normalize(name)
+        if self.use_bundles and name in self._bundles:
+            return [self.url(name)]
+        return [self.url(source) for source in BUNDLES.get(name, [name])]
+
+    def _wrap_static_view(self, static_view):
+        """Rota static com variantes pré-comprimidas e cache imutável para arquivos com hash"""
+
+        def serve_static(filename):
+            path = self.normalize(filename)
+            variants = self._variants.get(path)
+            if variants is None:
+                response = static_view(filename=filename)
+                version = request.args.get('v')
+                if version and version == self.fingerprint(path) and response.status_code in (200, 304):
+                    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+                return response
+
+            encoding = negotiate_encoding([e for e, _ in ENCODING_SUFFIXES if e in variants])
+            if encoding is None:
+                response = static_view(filename=filename)
+            else:
+                mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+                response = send_from_directory(self.static_folder, variants[encoding], mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+            return response
+
+        return serve_static
+
+
+static_manifest = StaticManifest(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
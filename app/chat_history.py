@@ -0,0 +1,93 @@
+"""
+Histórico da IA de Relacionamento persistido no banco de dados
+
+Substitui a lista em session['chat_messages']: cada mensagem é uma linha em
+ChatMessage, a página carrega o histórico paginado e o modelo recebe apenas
+uma janela recente limitada por um orçamento de tokens, de modo que o custo
+por requisição não cresce com o tamanho da conversa.
+"""
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, or_
+from app import db
+from app.models import ChatMessage
+
+# Quantidade máxima de linhas lidas para montar a janela de contexto
+CONTEXT_SCAN_LIMIT = 50
+
+
+def estimate_tokens(text):
+    """Estimativa barata de tokens (~4 caracteres por token, mais overhead da mensagem)"""
+    return len(text or '') // 4 + 4
+
+
+def save_exchange(user_id, user_message, assistant_response):
+    """Grava a pergunta do usuário e a resposta do assistente"""
+    now = datetime.utcnow()
+    db.session.add_all([
+        ChatMessage(user_id=user_id, role='user', content=user_message, created_at=now),
+        ChatMessage(user_id=user_id, role='assistant', content=assistant_response,
+                    created_at=datetime.utcnow()),
+    ])
+    db.session.commit()
+
+
+def get_history_page(user_id, before_id=None, per_page=None):
+    """Retorna (mensagens em ordem cronológica, id para carregar a página anterior ou None).
+
+    Paginação por keyset sobre (created_at, id), servida pelo índice
+    (user_id, created_at): o custo não depende de quantas páginas já existem.
+    """
+    per_page = per_page or current_app.config.get('CHAT_HISTORY_PAGE_SIZE', 20)
+    query = ChatMessage.query.filter(ChatMessage.user_id == user_id)
+
+    if before_id:
+        anchor = ChatMessage.query.filter_by(id=before_id, user_id=user_id).first()
+        if anchor is not None:
+            query = query.filter(or_(
+                ChatMessage.created_at < anchor.created_at,
+                and_(ChatMessage.created_at == anchor.created_at, ChatMessage.id < anchor.id)
+            ))
+
+    rows = (query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .limit(per_page + 1).all())
+    has_more = len(rows) > per_page
+    rows = list(reversed(rows[:per_page]))
+    older_id = rows[0].id if has_more and rows else None
+    return rows, older_id
+
+
+def build_context(user_id, token_budget=None):
+    """Monta as mensagens recentes que cabem no orçamento de tokens, no formato da API"""
+    if token_budget is None:
+        token_budget = current_app.config.get('CHAT_CONTEXT_TOKEN_BUDGET', 1500)
+    if token_budget <= 0:
+        return []
+
+    rows = (ChatMessage.query
+            .with_entities(ChatMessage.role, ChatMessage.content)
+            .filter(ChatMessage.user_id == user_id)
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .limit(CONTEXT_SCAN_LIMIT).all())
+
+    context = []
+    used = 0
+    for role, content in rows:
+        cost = estimate_tokens(content)
+        if used + cost > token_budget:
+            break
+        context.append({"role": role, "content": content})
+        used += cost
+
+    context.reverse()
+    # A janela deve começar com uma mensagem do usuário
+    while context and context[0]["role"] != 'user':
+        context.pop(0)
+    return context
+
+
+def clear_history(user_id):
+    """Remove todo o histórico do usuário"""
+    deleted = ChatMessage.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
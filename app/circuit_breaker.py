@@ -0,0 +1,201 @@
+"""
+Circuit breaker para dependências HTTP externas (OpenAI, webhook do Railway)
+
+Cada dependência tem um breaker com janela deslizante de resultados, taxa de
+falha limite e um orçamento de tempo (timeout) próprio. Quando a dependência
+está falhando, o circuito abre e as requisições falham em milissegundos em vez
+de esperar o timeout inteiro; após `reset_timeout` segundos o circuito passa
+para half-open e deixa passar uma única chamada de teste.
+
+O estado é por processo (cada worker do gunicorn mantém o seu).
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Levantada quando o circuito está aberto e a chamada é recusada sem ser feita"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuito '{name}' aberto; nova tentativa em {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Breaker thread-safe com janela deslizante de sucessos/falhas"""
+
+    def __init__(self, name, timeout=10.0, failure_rate=0.5, window_size=20,
+                 min_calls=5, reset_timeout=30.0):
+        self.name = name
+        self.timeout = timeout  # Orçamento de tempo por chamada (segundos)
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._results = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._last_error = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def allow_request(self):
+        """Retorna True se a chamada pode ser feita agora"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._rejected += 1
+            return False
+
+    def before_call(self):
+        """Levanta CircuitOpenError se a chamada não for permitida"""
+        if not self.allow_request():
+            retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                logger.info("Circuito '%s' fechado após chamada de teste bem-sucedida", self.name)
+                self._state = CLOSED
+                self._results.clear()
+                self._trial_in_flight = False
+            self._results.append(True)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._last_error = str(error) if error is not None else None
+            if self._state == HALF_OPEN:
+                self._trip()
+                return
+            self._results.append(False)
+            calls = len(self._results)
+            failures = calls - sum(self._results)
+            if self._state == CLOSED and calls >= self.min_calls and failures / calls >= self.failure_rate:
+                self._trip()
+
+    def _trip(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+        logger.warning("Circuito '%s' aberto por %.0fs (último erro: %s)",
+                       self.name, self.reset_timeout, self._last_error)
+
+    def configure(self, timeout=None, failure_rate=None, window_size=None, min_calls=None, reset_timeout=None):
+        """Aplica novos limites a um breaker já em uso (os resultados recentes da janela são mantidos)"""
+        with self._lock:
+            if timeout is not None:
+                self.timeout = timeout
+            if failure_rate is not None:
+                self.failure_rate = failure_rate
+            if min_calls is not None:
+                self.min_calls = min_calls
+            if reset_timeout is not None:
+                self.reset_timeout = reset_timeout
+            if window_size is not None and window_size != self._results.maxlen:
+                self._results = deque(self._results, maxlen=window_size)
+
+    def reset(self):
+        """Fecha o circuito manualmente e limpa a janela"""
+        with self._lock:
+            self._state = CLOSED
+            self._results.clear()
+            self._trial_in_flight = False
+
+    def __enter__(self):
+        self.before_call()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.record_success()
+        else:
+            self.record_failure(exc)
+        return False
+
+    def snapshot(self):
+        """Estado atual para exibição no painel administrativo"""
+        with self._lock:
+            state = self._current_state()
+            calls = len(self._results)
+            failures = calls - sum(self._results)
+            retry_after = 0.0
+            if state == OPEN:
+                retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            return {
+                'name': self.name,
+                'state': state,
+                'calls': calls,
+                'failures': failures,
+                'failure_rate': round(failures / calls, 3) if calls else 0.0,
+                'rejected': self._rejected,
+                'timeout': self.timeout,
+                'retry_after': round(retry_after, 1),
+                'last_error': self._last_error,
+            }
+
+
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name, **settings):
+    """Retorna (criando se necessário) o breaker da dependência `name`"""
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, **settings)
+            _breakers[name] = breaker
+        return breaker
+
+
+def _configure_breaker(name, **settings):
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            _breakers[name] = CircuitBreaker(name, **settings)
+            return
+    # Breaker criado antes (por get_breaker ou outra app): passa a usar os novos limites
+    breaker.configure(**settings)
+
+
+def configure_breakers(config):
+    """Cria ou atualiza os breakers das dependências conhecidas a partir da configuração da aplicação"""
+    common = {
+        'failure_rate': config.get('CIRCUIT_BREAKER_FAILURE_RATE', 0.5),
+        'window_size': config.get('CIRCUIT_BREAKER_WINDOW', 20),
+        'min_calls': config.get('CIRCUIT_BREAKER_MIN_CALLS', 5),
+        'reset_timeout': config.get('CIRCUIT_BREAKER_RESET_TIMEOUT', 30.0),
+    }
+    _configure_breaker('openai', timeout=config.get('OPENAI_TIMEOUT', 20.0), **common)
+    _configure_breaker('webhook', timeout=config.get('WEBHOOK_TIMEOUT', 5.0), **common)
+
+
+def all_snapshots():
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return [breaker.snapshot() for breaker in breakers]
@@ -0,0 +1,181 @@
+"""
+Compressão dinâmica das respostas (gzip e brotli)
+
+Páginas HTML (post.html traz o conteúdo inteiro do post), listagens e o JSON
+do chat saem comprimidos conforme o Accept-Encoding do cliente, com brotli
+preferido quando disponível. Ficam de fora:
+- respostas menores que COMPRESS_MIN_SIZE ou de tipos fora de COMPRESS_MIMETYPES;
+- respostas já codificadas ou marcadas com Cache-Control: no-transform;
+- arquivos enviados com send_file (os estáticos do build já têm .br/.gz).
+
+Respostas em streaming são comprimidas pedaço a pedaço, com flush a cada
+pedaço para não segurar o envio. Corpos idênticos (ex.: a mesma página
+renderizada para vários visitantes anônimos) reaproveitam os bytes já
+comprimidos de um LRU em memória, indexado pelo hash do conteúdo.
+
+brotli é opcional: sem ele, apenas gzip é oferecido.
+"""
+import hashlib
+import importlib.util
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from app.assets import negotiate_encoding
+from app.tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+brotli = None
+for _module in ('brotli', 'brotlicffi'):
+    if importlib.util.find_spec(_module) is not None:
+        brotli = importlib.import_module(_module)
+        break
+
+DEFAULT_MIMETYPES = (
+    'text/html', 'text/plain', 'text/css', 'text/xml', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml',
+    'application/rss+xml', 'application/atom+xml', 'image/svg+xml',
+)
+
+# Corpos maiores que isto não entram no LRU (limita a memória por worker)
+CACHE_MAX_BODY = 512 * 1024
+
+
+class CompressedCache:
+    """LRU de corpos comprimidos: (hash do conteúdo, codificação) -> bytes"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+class Compressor:
+    """Codificadores gzip/brotli com os níveis configurados"""
+
+    def __init__(self, gzip_level=6, brotli_quality=4):
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        stream = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return stream.compress(data) + stream.flush()
+
+    def compress_stream(self, chunks, encoding):
+        """Comprime um iterável de pedaços, liberando a saída a cada pedaço"""
+        if encoding == 'br':
+            stream = brotli.Compressor(quality=self.brotli_quality)
+            process, flush = stream.process, stream.flush
+            finish = stream.finish
+        else:
+            stream = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            process = stream.compress
+            flush = lambda: stream.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+            finish = stream.flush
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                data = process(chunk) + flush()
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+
+def _compressible(response, mimetypes):
+    if response.mimetype not in mimetypes:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return False
+    return 'no-transform' not in (response.headers.get('Cache-Control') or '')
+
+
+def _weaken_etag(response):
+    # A representação comprimida é outra sequência de bytes: ETag forte vira fraca
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def init_compression(app):
+    """Registra a compressão das respostas (depois de init_tracing, para medir o custo)"""
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+    mimetypes = frozenset(app.config.get('COMPRESS_MIMETYPES') or DEFAULT_MIMETYPES)
+    compressor = Compressor(app.config.get('COMPRESS_LEVEL', 6), app.config.get('COMPRESS_BR_LEVEL', 4))
+    cache_size = app.config.get('COMPRESS_CACHE_SIZE', 128)
+    cache = CompressedCache(cache_size) if cache_size else None
+
+    @app.after_request
+    def compress_response(response):
+        if not _compressible(response, mimetypes):
+            return response
+        # O mesmo recurso muda de bytes conforme o Accept-Encoding
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(compressor.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compressor.compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+            response.headers['Content-Encoding'] = encoding
+            _weaken_etag(response)
+            return response
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        started = time.perf_counter()
+        key = None
+        compressed = None
+        if cache is not None and len(data) <= CACHE_MAX_BODY:
+            key = (hashlib.blake2b(data, digest_size=16).digest(), encoding)
+            compressed = cache.get(key)
+        cached = compressed is not None
+        if compressed is None:
+            compressed = compressor.compress(data, encoding)
+            if key is not None:
+                cache.set(key, compressed)
+        record_span('compress', 'compress', started,
+                    {'encoding': encoding, 'bytes': len(data), 'compressed': len(compressed),
+                     'cached': cached})
+
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        _weaken_etag(response)
+        return response
+
+    logger.info("Compressão de respostas ativa (%s, mínimo %s bytes)",
+                '/'.join(compressor.encodings), min_size)
@@ -0,0 +1,188 @@
+"""
+GET condicional (ETag / Last-Modified) para posts e listagens
+
+Os validadores são derivados de uma única consulta agregada e barata (datas
+dos posts, estado dos comentários aprovados) somada ao perfil do visitante
+(anônimo, usuário, premium, admin), aos parâmetros da URL e à versão dos
+templates. Se o cliente já tem a versão atual (If-None-Match ou
+If-Modified-Since), a view responde 304 antes das consultas pesadas e da
+renderização.
+
+    @main_bp.route('/post/<int:post_id>')
+    @conditional(post_state)
+    def post(post_id): ...
+
+Páginas com mensagens flash pendentes são sempre renderizadas. Respostas
+iguais para todos os visitantes (feeds, sitemaps) usam shared=True: sem
+Vary: Cookie, com cache público e sem gravar a sessão (g.skip_session_save),
+para que nenhum Set-Cookie vá parar no cache de um proxy. Se o backend de
+sessão não respeita essa marca, a rota volta ao cache privado. O estado
+calculado fica em g.conditional_state para a view reaproveitar.
+"""
+import hashlib
+import logging
+import os
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import func, select
+
+from app import db
+from app.assets import BUILD_MANIFEST, static_manifest
+from app.models import Comment, PopularPost, Post, RelatedPost
+
+logger = logging.getLogger(__name__)
+
+CONDITIONAL_METHODS = ('GET', 'HEAD')
+
+# A página muda por usuário (nome, badges): o cache é só do navegador, sempre revalidado
+CACHE_CONTROL = 'private, no-cache'
+# Igual para todos (shared=True): proxies e CDNs também podem guardar, sempre revalidando
+SHARED_CACHE_CONTROL = 'public, no-cache'
+
+
+def template_version(app):
+    """Hash dos templates (e do build estático): muda a cada deploy que altera o HTML"""
+    digest = hashlib.sha256()
+    for root, _, files in sorted(os.walk(os.path.join(app.root_path, app.template_folder))):
+        for name in sorted(files):
+            with open(os.path.join(root, name), 'rb') as f:
+                digest.update(f.read())
+    build = static_manifest.fingerprint(BUILD_MANIFEST)
+    if build:
+        digest.update(build.encode())
+    return digest.hexdigest()[:12]
+
+
+def _posts_columns():
+    return (
+        select(func.count(Post.id)).scalar_subquery(),
+        select(func.max(Post.created_at)).scalar_subquery(),
+        select(func.max(Post.updated_at)).scalar_subquery(),
+    )
+
+
+def posts_state():
+    """(quantidade de posts, criação mais recente, edição mais recente)"""
+    return tuple(db.session.execute(select(*_posts_columns())).one())
+
+
+def sitemap_state():
+    """Estado dos posts e o maior id (os sitemaps são faixas de ids)"""
+    return tuple(db.session.execute(select(
+        *_posts_columns(),
+        select(func.max(Post.id)).scalar_subquery(),
+    )).one())
+
+
+def index_state():
+    """Estado dos posts e a versão do ranking "Most Read" exibido na página inicial"""
+    return tuple(db.session.execute(select(
+        *_posts_columns(),
+        select(func.max(PopularPost.computed_at)).scalar_subquery(),
+    )).one())
+
+
+def post_state(post_id):
+    """Estado do post, dos seus comentários aprovados, da sua lista de relacionados e dos posts em geral"""
+    approved = (Comment.post_id == post_id, Comment.approved.is_(True))
+    # Assinatura da lista de relacionados: muda com o rebuild ou o refresh mesmo sem escrita de post
+    related = RelatedPost.post_id == post_id
+    row = db.session.execute(select(
+        select(Post.created_at).where(Post.id == post_id).scalar_subquery(),
+        select(Post.updated_at).where(Post.id == post_id).scalar_subquery(),
+        select(func.count(Comment.id)).where(*approved).scalar_subquery(),
+        select(func.max(Comment.id)).where(*approved).scalar_subquery(),
+        select(func.max(Comment.created_at)).where(*approved).scalar_subquery(),
+        select(func.sum(RelatedPost.related_id * RelatedPost.rank)).where(related).scalar_subquery(),
+        select(func.sum(RelatedPost.score)).where(related).scalar_subquery(),
+        *_posts_columns(),
+    )).one()
+    if row[0] is None:
+        return None  # Post inexistente: a view responde o 404
+    return tuple(row)
+
+
+def viewer_tier():
+    if not current_user.is_authenticated:
+        return 'anon'
+    return (f"user:{current_user.id}:{current_user.username}:"
+            f"{int(bool(current_user.is_premium))}:{int(bool(current_user.is_admin))}")
+
+
+def _last_modified(state):
+    timestamps = [value for value in state if isinstance(value, datetime)]
+    if not timestamps:
+        return None
+    return max(timestamps).replace(microsecond=0)
+
+
+def _is_fresh(etag, last_modified, shared=False):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    # Só a data não distingue o perfil do visitante: sem ETag, apenas para anônimos
+    if last_modified is not None and request.if_modified_since is not None and \
+            (shared or not current_user.is_authenticated):
+        return last_modified <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def _set_validators(response, etag, last_modified, shared=False):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if shared:
+        response.headers['Cache-Control'] = SHARED_CACHE_CONTROL
+    else:
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        response.vary.add('Cookie')
+    return response
+
+
+def _skip_session_save():
+    """Marca a resposta para não gravar a sessão; False se o backend não suporta"""
+    if not getattr(current_app.session_interface, 'honours_skip_session_save', False):
+        return False
+    g.skip_session_save = True
+    return True
+
+
+def conditional(state_for, shared=False):
+    """Decorator: 304 quando o cliente tem a versão atual; senão adiciona os validadores"""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            shared_response = shared and _skip_session_save()
+            if request.method not in CONDITIONAL_METHODS or (not shared_response and session.get('_flashes')):
+                return view(*args, **kwargs)
+            state = state_for(*args, **kwargs)
+            if state is None:
+                return view(*args, **kwargs)
+            g.conditional_state = state
+
+            version = current_app.extensions.get('template_version', '')
+            tier = 'shared' if shared_response else viewer_tier()
+            key = repr((request.endpoint, request.view_args, request.query_string, tier, version, state))
+            etag = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+            last_modified = _last_modified(state)
+
+            if _is_fresh(etag, last_modified, shared_response):
+                return _set_validators(make_response('', 304), etag, last_modified, shared_response)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                _set_validators(response, etag, last_modified, shared_response)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def init_conditional(app):
+    """Calcula a versão dos templates uma vez por processo"""
+    app.extensions['template_version'] = template_version(app)
+    logger.info("GET condicional ativo (templates %s)", app.extensions['template_version'])
@@ -0,0 +1,232 @@
+"""
+Processamento do conteúdo dos posts, feito ao salvar e nunca na visualização
+
+- render_markdown: Markdown -> HTML sanitizado, com ids nos títulos e a lista
+  de títulos para o sumário (RENDERER_VERSION muda quando o resultado muda;
+  scripts/render_posts.py re-renderiza os posts antigos);
+- sanitize_html: mantém só tags e atributos da lista permitida;
+- make_teaser: trecho bem formado do HTML, cortado por palavras e com todas
+  as tags fechadas (nada de cortar no meio de uma tag como o antigo
+  content[:500]);
+- count_words: base do tempo de leitura estimado.
+"""
+import importlib.util
+import logging
+import re
+from collections import namedtuple
+from html import escape, unescape
+from html.parser import HTMLParser
+
+logger = logging.getLogger(__name__)
+
+markdown_available = importlib.util.find_spec('markdown') is not None
+
+# Incrementar ao mudar extensões, sanitização ou qualquer coisa que altere o HTML gerado
+RENDERER_VERSION = 1
+
+MARKDOWN_EXTENSIONS = ('extra', 'sane_lists', 'toc')
+
+ALLOWED_TAGS = frozenset((
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'dd', 'del', 'div', 'dl', 'dt', 'em',
+    'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'ins',
+    'li', 'mark', 'ol', 'p', 'pre', 's', 'small', 'span', 'strong', 'sub', 'sup',
+    'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+))
+# Atributos permitidos por tag ('*' vale para todas)
+ALLOWED_ATTRIBUTES = {
+    '*': frozenset(('class', 'id', 'title')),
+    'a': frozenset(('href', 'rel', 'target')),
+    'img': frozenset(('src', 'alt', 'width', 'height', 'loading')),
+    'td': frozenset(('align', 'colspan', 'rowspan')),
+    'th': frozenset(('align', 'colspan', 'rowspan')),
+    'ol': frozenset(('start',)),
+}
+URL_ATTRIBUTES = frozenset(('href', 'src'))
+ALLOWED_URL_SCHEMES = frozenset(('http', 'https', 'mailto'))
+
+RenderedContent = namedtuple('RenderedContent', 'html headings')
+
+TEASER_WORDS = 80
+
+VOID_ELEMENTS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'source', 'track', 'wbr',
+))
+# Conteúdo que nunca entra no trecho
+SKIPPED_ELEMENTS = frozenset(('script', 'style', 'iframe', 'object'))
+
+WORD_SPLIT = re.compile(r'(\s+)')
+
+
+def _render_start_tag(tag, attrs, self_closing=False):
+    rendered = ''.join(
+        f' {name}' if value is None else f' {name}="{escape(value)}"' for name, value in attrs
+    )
+    return f"<{tag}{rendered}{' /' if self_closing else ''}>"
+
+
+def _safe_url(value):
+    value = (value or '').strip()
+    scheme = re.match(r'([a-zA-Z][a-zA-Z0-9+.-]*):', re.sub(r'[\x00-\x20]', '', value))
+    return scheme is None or scheme.group(1).lower() in ALLOWED_URL_SCHEMES
+
+
+class _Sanitizer(HTMLParser):
+    """Reescreve o HTML mantendo apenas tags/atributos permitidos; o resto vira texto ou some"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.open_tags = []
+        self.skipping = 0
+
+    def _attributes(self, tag, attrs):
+        allowed = ALLOWED_ATTRIBUTES['*'] | ALLOWED_ATTRIBUTES.get(tag, frozenset())
+        kept = []
+        for name, value in attrs:
+            if name not in allowed or (name in URL_ATTRIBUTES and not _safe_url(value)):
+                continue
+            kept.append((name, value))
+        if tag == 'a' and ('target', '_blank') in kept:
+            kept = [(name, value) for name, value in kept if name != 'rel'] + [('rel', 'noopener noreferrer')]
+        return kept
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_ELEMENTS:
+            self.skipping += 1
+        if self.skipping or tag not in ALLOWED_TAGS:
+            return
+        self.parts.append(_render_start_tag(tag, self._attributes(tag, attrs)))
+        if tag not in VOID_ELEMENTS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if not self.skipping and tag in ALLOWED_TAGS:
+            self.parts.append(_render_start_tag(tag, self._attributes(tag, attrs), self_closing=True))
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_ELEMENTS:
+            self.skipping = max(0, self.skipping - 1)
+            return
+        if self.skipping or tag not in self.open_tags:
+            return
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.parts.append(f"</{open_tag}>")
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(escape(data, quote=False))
+
+    def result(self):
+        self.close()
+        return ''.join(self.parts) + ''.join(f"</{tag}>" for tag in reversed(self.open_tags))
+
+
+def sanitize_html(html):
+    """HTML só com as tags/atributos permitidos, URLs seguras e tags balanceadas"""
+    sanitizer = _Sanitizer()
+    sanitizer.feed(html or '')
+    return sanitizer.result()
+
+
+def _flatten_toc(tokens):
+    headings = []
+    for token in tokens:
+        headings.append({'level': token['level'], 'id': token['id'], 'title': unescape(token['name'])})
+        headings.extend(_flatten_toc(token.get('children', [])))
+    return headings
+
+
+def render_markdown(source):
+    """Markdown (HTML embutido é aceito e sanitizado) -> RenderedContent(html, headings)"""
+    source = source or ''
+    if not markdown_available:
+        logger.warning("Pacote markdown não instalado; conteúdo tratado como HTML")
+        return RenderedContent(sanitize_html(source), [])
+
+    import markdown
+    md = markdown.Markdown(extensions=list(MARKDOWN_EXTENSIONS), output_format='html')
+    html = md.convert(source)
+    # toc_tokens traz os títulos já com o texto sem marcação e o id gerado
+    headings = _flatten_toc(getattr(md, 'toc_tokens', []))
+    return RenderedContent(sanitize_html(html), headings)
+
+
+class _TeaserBuilder(HTMLParser):
+    """Copia o HTML até o limite de palavras, mantendo a pilha de tags abertas"""
+
+    def __init__(self, max_words):
+        super().__init__(convert_charrefs=True)
+        self.max_words = max_words
+        self.words = 0
+        self.parts = []
+        self.open_tags = []
+        self.skipping = 0
+        self.truncated = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_ELEMENTS:
+            self.skipping += 1
+        if self.truncated or self.skipping:
+            return
+        self.parts.append(_render_start_tag(tag, attrs))
+        if tag not in VOID_ELEMENTS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if not (self.truncated or self.skipping or tag in SKIPPED_ELEMENTS):
+            self.parts.append(_render_start_tag(tag, attrs, self_closing=True))
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_ELEMENTS:
+            self.skipping = max(0, self.skipping - 1)
+            return
+        if self.truncated or self.skipping or tag not in self.open_tags:
+            return  # Fechamento sem abertura correspondente é descartado
+        # Fecha também as tags internas que ficaram abertas (HTML malformado)
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.parts.append(f"</{open_tag}>")
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.truncated or self.skipping:
+            return
+        kept = []
+        for token in WORD_SPLIT.split(data):
+            if token and not token.isspace():
+                if self.words >= self.max_words:
+                    self.truncated = True
+                    break
+                self.words += 1
+            kept.append(token)
+        text = ''.join(kept)
+        if self.truncated:
+            text = text.rstrip() + '…'
+        self.parts.append(escape(text, quote=False))
+
+    def result(self):
+        self.close()
+        closing = ''.join(f"</{tag}>" for tag in reversed(self.open_tags))
+        return ''.join(self.parts).strip() + closing
+
+
+def make_teaser(html, max_words=TEASER_WORDS):
+    """Trecho de até `max_words` palavras do HTML, com as tags abertas fechadas"""
+    builder = _TeaserBuilder(max_words)
+    builder.feed(html or '')
+    return builder.result()
+
+
+def html_to_text(html):
+    """Texto visível do HTML (tags removidas, entidades decodificadas, espaços colapsados)"""
+    return ' '.join(unescape(re.sub(r'<.*?>', ' ', html or '', flags=re.S)).split())
+
+
+def count_words(html):
+    """Palavras do texto visível (tags removidas)"""
+    return len(re.sub(r'<.*?>', ' ', html or '', flags=re.S).split())
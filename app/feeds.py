@@ -0,0 +1,247 @@
+"""
+Feed RSS (/feed.xml) e sitemaps XML (/sitemap.xml)
+
+Leitores de feed e crawlers recebem o XML gerado direto de um cursor do lado
+do servidor (stream_results: no PostgreSQL, um cursor nomeado lido em lotes),
+sem montar a lista inteira em memória nem paginar com COUNT.
+
+- Posts premium aparecem no feed só com o resumo e o trecho público
+  (teaser_html): o corpo completo nem é lido do banco. No sitemap eles
+  entram normalmente, já que a página do post mostra o trecho a todos.
+- Acima de SITEMAP_MAX_URLS URLs (50 mil pelo protocolo), /sitemap.xml vira
+  um índice de sitemaps /sitemap-<n>.xml. Cada sitemap cobre uma faixa fixa
+  de ids (keyset na chave primária, sem OFFSET), então um post não muda de
+  sitemap quando outros são excluídos.
+- As rotas usam @conditional(..., shared=True): crawlers que já têm a versão
+  atual recebem 304. O XML gerado fica num cache por worker indexado pelo
+  estado dos posts, limitado a FEED_CACHE_MAX_BYTES no total, e é descartado
+  a cada escrita de post.
+"""
+import logging
+import math
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from flask import Response, abort, current_app, g, request, stream_with_context, url_for
+from sqlalchemy import case, event, func, select
+
+from app import db
+from app.conditional import posts_state, sitemap_state
+from app.search import ResultCache
+
+logger = logging.getLogger(__name__)
+
+RSS_MIMETYPE = 'application/rss+xml'
+XML_MIMETYPE = 'application/xml'
+
+SITEMAP_PROTOCOL_LIMIT = 50000
+# Páginas fixas incluídas no primeiro sitemap (as listagens com a data do post mais recente)
+LISTING_PAGES = ('main.index', 'main.all_posts')
+STATIC_PAGES = LISTING_PAGES + ('main.coaching', 'main.premium_subscription')
+# Linhas lidas do cursor (e enviadas ao cliente) por vez
+STREAM_BATCH = 500
+
+feed_cache = ResultCache(ttl=3600, max_entries=64, max_bytes=4 * 1024 * 1024)
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+
+def _w3c_date(value):
+    return _utc(value).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def _stream_rows(statement):
+    """Lotes de linhas de um cursor do lado do servidor"""
+    result = db.session.execute(statement, execution_options={'stream_results': True})
+    try:
+        yield from result.partitions(STREAM_BATCH)
+    finally:
+        result.close()
+
+
+def _state(state_for=posts_state):
+    state = g.get('conditional_state')
+    return state if state is not None else state_for()
+
+
+def _last_modified(state):
+    dates = [value for value in state if isinstance(value, datetime)]
+    return max(dates) if dates else None
+
+
+def _cached_xml(kind, mimetype, generate, state):
+    """Resposta a partir do cache ou em streaming, guardando o XML gerado se couber no limite"""
+    key = (kind, request.host, request.path, state)
+    body = feed_cache.get(key)
+    if body is not None:
+        return Response(body, mimetype=mimetype)
+
+    max_bytes = feed_cache.max_bytes
+
+    def stream():
+        parts, size = [], 0
+        for chunk in generate():
+            if parts is not None:
+                parts.append(chunk)
+                size += len(chunk)
+                if size > max_bytes:
+                    parts = None  # Grande demais para o cache: só streaming
+            yield chunk
+        if parts is not None:
+            feed_cache.set(key, ''.join(parts).encode('utf-8'))
+
+    return Response(stream_with_context(stream()), mimetype=mimetype)
+
+
+# --- RSS ------------------------------------------------------------------
+
+def _rss_item(row):
+    link = url_for('main.post', post_id=row.id, _external=True)
+    published = _utc(row.created_at)
+    parts = [
+        '<item>',
+        f'<title>{escape(row.title or "")}</title>',
+        f'<link>{escape(link)}</link>',
+        f'<guid isPermaLink="true">{escape(link)}</guid>',
+    ]
+    if published is not None:
+        parts.append(f'<pubDate>{format_datetime(published, usegmt=True)}</pubDate>')
+    if row.username:
+        parts.append(f'<dc:creator>{escape(row.username)}</dc:creator>')
+    if row.premium_only:
+        parts.append('<category>Premium</category>')
+    parts.append(f'<description>{escape(row.summary or "")}</description>')
+    parts.append(f'<content:encoded>{escape(row.body or "")}</content:encoded>')
+    parts.append('</item>')
+    return ''.join(parts)
+
+
+def rss_response():
+    """Feed RSS 2.0 dos FEED_ITEMS posts mais recentes"""
+    from app.models import Post, User
+
+    state = _state()
+    limit = current_app.config.get('FEED_ITEMS', 30)
+    # Premium: só o trecho gerado ao salvar, nunca o conteúdo completo
+    body = case((Post.premium_only.is_(True), func.coalesce(Post.teaser_html, '')), else_=Post.content)
+    statement = (
+        select(Post.id, Post.title, Post.summary, Post.premium_only, Post.created_at,
+               User.username, body.label('body'))
+        .outerjoin(User, User.id == Post.user_id)
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(limit)
+    )
+
+    def generate():
+        home = url_for('main.index', _external=True)
+        updated = _last_modified(state)
+        header = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" '
+            'xmlns:content="http://purl.org/rss/1.0/modules/content/" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/">',
+            '<channel>',
+            '<title>Reconquest Blog</title>',
+            f'<link>{escape(home)}</link>',
+            '<description>Latest posts from the Reconquest Blog</description>',
+            '<language>en</language>',
+            f'<atom:link href={quoteattr(url_for("main.feed", _external=True))} rel="self" type="{RSS_MIMETYPE}"/>',
+        ]
+        if updated is not None:
+            header.append(f'<lastBuildDate>{format_datetime(_utc(updated), usegmt=True)}</lastBuildDate>')
+        yield ''.join(header)
+        for rows in _stream_rows(statement):
+            yield ''.join(_rss_item(row) for row in rows)
+        yield '</channel></rss>\n'
+
+    return _cached_xml('rss', RSS_MIMETYPE, generate, state)
+
+
+# --- Sitemaps -------------------------------------------------------------
+
+def _posts_per_sitemap():
+    max_urls = min(current_app.config.get('SITEMAP_MAX_URLS', SITEMAP_PROTOCOL_LIMIT), SITEMAP_PROTOCOL_LIMIT)
+    return max(1, max_urls - len(STATIC_PAGES))
+
+
+def sitemap_count(state=None):
+    """Quantidade de sitemaps (faixas de ids) necessária até o maior id de post"""
+    max_id = (state or _state(sitemap_state))[-1] or 0
+    return max(1, math.ceil(max_id / _posts_per_sitemap()))
+
+
+def _url_entry(loc, lastmod=None):
+    entry = f'<url><loc>{escape(loc)}</loc>'
+    if lastmod is not None:
+        entry += f'<lastmod>{_w3c_date(lastmod)}</lastmod>'
+    return entry + '</url>'
+
+
+def sitemap_response(page=None):
+    """/sitemap.xml (page=None): o sitemap único ou o índice; /sitemap-<page>.xml: um pedaço"""
+    from app.models import Post
+
+    state = _state(sitemap_state)
+    pages = sitemap_count(state)
+    if page is None and pages > 1:
+        return _sitemap_index(pages, _last_modified(state), state)
+    page = page or 1
+    if not 1 <= page <= pages:
+        abort(404)
+
+    # Faixa de ids da página: nenhum post anterior é percorrido
+    per_sitemap = _posts_per_sitemap()
+    statement = (
+        select(Post.id, func.coalesce(Post.updated_at, Post.created_at).label('lastmod'))
+        .where(Post.id > (page - 1) * per_sitemap, Post.id <= page * per_sitemap)
+        .order_by(Post.id)
+    )
+
+    def generate():
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        if page == 1:
+            updated = _last_modified(state)
+            yield ''.join(
+                _url_entry(url_for(endpoint, _external=True), updated if endpoint in LISTING_PAGES else None)
+                for endpoint in STATIC_PAGES
+            )
+        for rows in _stream_rows(statement):
+            yield ''.join(
+                _url_entry(url_for('main.post', post_id=row.id, _external=True), row.lastmod) for row in rows
+            )
+        yield '</urlset>\n'
+
+    return _cached_xml('sitemap', XML_MIMETYPE, generate, state)
+
+
+def _sitemap_index(pages, updated, state):
+    def generate():
+        yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">')
+        for page in range(1, pages + 1):
+            entry = f'<sitemap><loc>{escape(url_for("main.sitemap_page", page=page, _external=True))}</loc>'
+            if updated is not None:
+                entry += f'<lastmod>{_w3c_date(updated)}</lastmod>'
+            yield entry + '</sitemap>'
+        yield '</sitemapindex>\n'
+
+    return _cached_xml('sitemap-index', XML_MIMETYPE, generate, state)
+
+
+def init_feeds(app):
+    """Configura o cache dos feeds e o descarta a cada escrita de post neste processo"""
+    from app.models import Post
+
+    feed_cache.ttl = app.config.get('FEED_CACHE_TTL', 3600)
+    feed_cache.max_bytes = app.config.get('FEED_CACHE_MAX_BYTES', 4 * 1024 * 1024)
+    if event.contains(Post, 'after_insert', _clear_cache):
+        return
+    for name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(Post, name, _clear_cache)
+
+
+def _clear_cache(mapper, connection, target):
+    feed_cache.clear()
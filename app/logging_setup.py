@@ -0,0 +1,101 @@
+"""
+Configuração central de logging
+
+Todos os loggers da aplicação escrevem num QueueHandler; uma thread
+(QueueListener) formata e grava os registros no stdout e, opcionalmente, em
+LOG_FILE. A requisição nunca espera pelo disco ou pelo terminal.
+
+- LOG_LEVEL (padrão INFO) controla o nível: com DEBUG desativado,
+  logger.debug("... %s", valor) é descartado antes de formatar qualquer coisa;
+- LOG_FORMAT=json emite um objeto JSON por linha; o padrão é texto com os
+  campos extras (logger.info("...", extra={...})) anexados como chave=valor.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+
+# Atributos padrão de um LogRecord; o restante veio de `extra=` e é estruturado
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_queue_handler = None
+_output_handlers = []
+
+
+class StructuredFormatter(logging.Formatter):
+    """Texto legível com os campos extras no final (chave=valor)"""
+
+    def format(self, record):
+        line = super().format(record)
+        extras = {k: v for k, v in record.__dict__.items() if k not in _STANDARD_ATTRS}
+        if extras:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in extras.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha, com os campos extras no primeiro nível"""
+
+    def format(self, record):
+        payload = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def _start_listener():
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_output_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def configure_logging(level=None):
+    """Instala o pipeline assíncrono no logger raiz (idempotente)"""
+    global _queue_handler, _output_handlers
+    if _queue_handler is not None:
+        return
+
+    level_name = (level or os.environ.get('LOG_LEVEL') or 'INFO').upper()
+    if os.environ.get('LOG_FORMAT', '').lower() == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = StructuredFormatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    _output_handlers = [stream_handler]
+    if os.environ.get('LOG_FILE'):
+        file_handler = logging.FileHandler(os.environ['LOG_FILE'])
+        file_handler.setFormatter(formatter)
+        _output_handlers.append(file_handler)
+
+    _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(getattr(logging, level_name, logging.INFO))
+
+    _start_listener()
+    atexit.register(_stop_listener)
+    # A thread do listener não sobrevive ao fork dos workers do gunicorn (preload_app)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_start_listener)
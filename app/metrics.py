@@ -0,0 +1,168 @@
+"""
+Métricas no formato de exposição do Prometheus (/metrics)
+
+Registra, por endpoint dos blueprints (main.*, admin.*, auth.*, ai_chat.*):
+- latência das requisições (histograma) e contagem por status;
+- tempo de espera no checkout do pool de conexões e conexões em uso;
+- latência das chamadas HTTP externas (OpenAI, webhook).
+
+Com vários workers do gunicorn, cada processo grava seus valores em arquivos
+no diretório PROMETHEUS_MULTIPROC_DIR (definido em gunicorn_config.py antes de
+a aplicação ser importada) e o /metrics agrega todos eles na leitura.
+
+prometheus_client é opcional: sem ele as funções deste módulo não fazem nada.
+"""
+import importlib.util
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, g, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.pool import Pool, QueuePool
+
+from app.tracing import span
+
+logger = logging.getLogger(__name__)
+
+prometheus_available = importlib.util.find_spec('prometheus_client') is not None
+
+# Buckets (segundos) cobrindo desde páginas servidas do cache até respostas da IA
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+REQUEST_LATENCY = None
+REQUEST_COUNT = None
+POOL_CHECKOUT_WAIT = None
+POOL_IN_USE = None
+OUTBOUND_LATENCY = None
+
+if prometheus_available:
+    from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter,
+                                   Gauge, Histogram, generate_latest)
+
+    REQUEST_LATENCY = Histogram(
+        'http_request_duration_seconds', 'Latência das requisições por endpoint',
+        ['endpoint', 'method'], buckets=LATENCY_BUCKETS,
+    )
+    REQUEST_COUNT = Counter(
+        'http_requests_total', 'Requisições por endpoint e status',
+        ['endpoint', 'method', 'status'],
+    )
+    POOL_CHECKOUT_WAIT = Histogram(
+        'db_pool_checkout_wait_seconds', 'Tempo de espera para obter uma conexão do pool',
+        buckets=POOL_WAIT_BUCKETS,
+    )
+    POOL_IN_USE = Gauge(
+        'db_pool_connections_in_use', 'Conexões retiradas do pool no momento',
+        multiprocess_mode='livesum',
+    )
+    OUTBOUND_LATENCY = Histogram(
+        'outbound_request_duration_seconds', 'Latência das chamadas HTTP externas',
+        ['service', 'outcome'], buckets=LATENCY_BUCKETS,
+    )
+
+
+def multiprocess_enabled():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mede quanto tempo cada checkout esperou por uma conexão"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            if POOL_CHECKOUT_WAIT is not None:
+                POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+@contextmanager
+def observe_outbound(service):
+    """Mede uma chamada HTTP externa (métrica e span): with observe_outbound('openai'): ..."""
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        with span(service, 'http'):
+            yield
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        if OUTBOUND_LATENCY is not None:
+            OUTBOUND_LATENCY.labels(service, outcome).observe(time.perf_counter() - started)
+
+
+def _endpoint_label():
+    # Usar a regra (e não o path) mantém a cardinalidade limitada
+    return request.url_rule.endpoint if request.url_rule is not None else 'unmatched'
+
+
+def _authorized(app):
+    token = app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') == f"Bearer {token}":
+        return True
+    return current_user.is_authenticated and current_user.is_admin
+
+
+def _render_metrics():
+    if multiprocess_enabled():
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def init_metrics(app):
+    """Registra os hooks de medição e o endpoint /metrics (chamar antes de db.init_app)"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    if not prometheus_available:
+        logger.warning("prometheus_client não está instalado; métricas desativadas")
+        return
+
+    # O pool temporizado só faz sentido com QueuePool (PostgreSQL); no SQLite as opções ficam vazias
+    engine_options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    if 'pool_size' in engine_options:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(engine_options, poolclass=TimedQueuePool)
+
+    # Listeners na classe Pool valem para todas as engines (inclusive as recriadas)
+    if not event.contains(Pool, 'checkout', _on_checkout):
+        event.listen(Pool, 'checkout', _on_checkout)
+        event.listen(Pool, 'checkin', _on_checkin)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            endpoint = _endpoint_label()
+            REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+            REQUEST_COUNT.labels(endpoint, request.method, str(response.status_code)).inc()
+        return response
+
+    def metrics_view():
+        if not _authorized(app):
+            abort(403)
+        return Response(_render_metrics(), mimetype=CONTENT_TYPE_LATEST,
+                        headers={'Cache-Control': 'no-store'})
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    logger.info("Métricas Prometheus ativas (multiprocesso: %s)", multiprocess_enabled())
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    POOL_IN_USE.inc()
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    POOL_IN_USE.dec()
@@ -1,7 +1,32 @@
 from datetime import datetime
+import logging
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.orm import query_expression, validates
+from sqlalchemy.orm.attributes import set_committed_value
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from app import db, login_manager
+from app.assets import static_manifest
+from app.content import RENDERER_VERSION, count_words, make_teaser, render_markdown
+
+logger = logging.getLogger(__name__)
+
+# Saldo concedido pela reposição periódica de créditos de IA
+AI_CREDITS_PREMIUM = 5
+AI_CREDITS_STANDARD = 1
+
+# Imagem usada quando o post não tem uma imagem válida
+PLACEHOLDER_IMAGE_URL = 'https://via.placeholder.com/1200x400'
+
+
+def resolve_image_url(url):
+    """URL de imagem a gravar: placeholder se vazia ou se o arquivo em /static/ não existe"""
+    url = (url or '').strip()
+    if not url:
+        return PLACEHOLDER_IMAGE_URL
+    if url.startswith('/static/') and not static_manifest.exists(url):
+        return PLACEHOLDER_IMAGE_URL
+    return url
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -25,50 +50,144 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
-    def update_ai_credits(self):
-        """Atualiza os créditos da IA baseado no status premium do usuário, apenas se necessário"""
-        print(f"[DEBUG] Verificando créditos para {self.username}: atual={self.ai_credits}")
-        
-        # Verificar se os créditos precisam ser inicializados (zero ou NULL)
-        if self.ai_credits is None or self.ai_credits == 0:
-            credits_antes = self.ai_credits
-            if self.is_premium:
-                self.ai_credits = 5  # 5 créditos para usuários premium
-            else:
-                self.ai_credits = 1  # 1 crédito para usuários padrão
-            print(f"[DEBUG] Créditos atualizados para {self.username}: {credits_antes} -> {self.ai_credits}")
-            db.session.commit()
-            return True
-        
-        print(f"[DEBUG] Créditos não atualizados para {self.username}, mantendo {self.ai_credits}")
-        return False
-        
     def use_ai_credit(self):
-        """Usa um crédito de IA e retorna True se o crédito foi consumido com sucesso"""
-        print(f"[DEBUG] Tentando usar crédito para {self.username}: disponível={self.ai_credits}")
-        if self.ai_credits > 0:
-            self.ai_credits -= 1
-            db.session.commit()
-            print(f"[DEBUG] Crédito consumido para {self.username}: restantes={self.ai_credits}")
-            return True
-        print(f"[DEBUG] Sem créditos disponíveis para {self.username}")
-        return False  # Sem créditos disponíveis
+        """Usa um crédito de IA e retorna True se o crédito foi consumido com sucesso.
+
+        O consumo é um único UPDATE condicional (ai_credits > 0) seguido de
+        commit imediato, sem ler o saldo para o Python antes: requisições
+        concorrentes não conseguem gastar o mesmo crédito e o lock da linha
+        não fica preso durante a chamada à API.
+        """
+        remaining = User.consume_ai_credit(self.id)
+        if remaining is None:
+            logger.debug("Sem créditos disponíveis para o usuário %s", self.id)
+            return False
+        # Sincronizar o objeto em memória sem marcar a instância como alterada
+        set_committed_value(self, 'ai_credits', remaining)
+        return True
+
+    def refund_ai_credit(self):
+        """Devolve um crédito consumido (por exemplo, quando a chamada à IA falha)"""
+        remaining = User.refund_ai_credit_for(self.id)
+        if remaining is not None:
+            set_committed_value(self, 'ai_credits', remaining)
+        return remaining
+
+    @staticmethod
+    def consume_ai_credit(user_id):
+        """UPDATE ... SET ai_credits = ai_credits - 1 WHERE id = ? AND ai_credits > 0.
+
+        Retorna o saldo restante ou None se o usuário não tinha créditos.
+        """
+        users = User.__table__
+        stmt = (
+            update(users)
+            .where(users.c.id == user_id, users.c.ai_credits > 0)
+            .values(ai_credits=users.c.ai_credits - 1)
+        )
+        return _execute_credit_update(stmt, user_id)
+
+    @staticmethod
+    def refund_ai_credit_for(user_id):
+        """Incrementa atomicamente o saldo de créditos do usuário"""
+        users = User.__table__
+        stmt = (
+            update(users)
+            .where(users.c.id == user_id)
+            .values(ai_credits=func.coalesce(users.c.ai_credits, 0) + 1)
+        )
+        return _execute_credit_update(stmt, user_id)
+
+    @staticmethod
+    def refill_ai_credits():
+        """Repõe em lote os créditos de todos os usuários com saldo zerado ou NULL.
+
+        Substitui a antiga verificação preguiçosa por usuário: um único UPDATE
+        baseado em conjunto, pensado para rodar periodicamente
+        (ver scripts/refill_ai_credits.py). Retorna o número de usuários afetados.
+        """
+        users = User.__table__
+        stmt = (
+            update(users)
+            .where(or_(users.c.ai_credits.is_(None), users.c.ai_credits == 0))
+            .values(ai_credits=case(
+                (users.c.is_premium == True, AI_CREDITS_PREMIUM),  # noqa: E712
+                else_=AI_CREDITS_STANDARD
+            ))
+        )
+        result = db.session.execute(stmt)
+        db.session.commit()
+        logger.info("Créditos de IA repostos para %s usuários", result.rowcount)
+        return result.rowcount
+
+
+def _execute_credit_update(stmt, user_id):
+    """Executa um UPDATE de créditos, faz commit e retorna o novo saldo (ou None).
+
+    No PostgreSQL o saldo volta no próprio UPDATE via RETURNING; no SQLite
+    (fallback) é lido na mesma transação, apenas quando alguma linha mudou.
+    """
+    users = User.__table__
+    try:
+        if db.engine.dialect.name == 'postgresql':
+            remaining = db.session.execute(stmt.returning(users.c.ai_credits)).scalar()
+        else:
+            result = db.session.execute(stmt)
+            remaining = None
+            if result.rowcount == 1:
+                remaining = db.session.execute(
+                    select(users.c.ai_credits).where(users.c.id == user_id)
+                ).scalar()
+        db.session.commit()
+        return remaining
+    except Exception:
+        db.session.rollback()
+        raise
 
 class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100))
+    # Markdown escrito no admin; content guarda o HTML renderizado e sanitizado (ver set_markdown)
+    content_markdown = db.Column(db.Text)
     content = db.Column(db.Text)
+    headings = db.Column(db.JSON)  # [{'level', 'id', 'title'}] para o sumário
+    render_version = db.Column(db.Integer)
+    # Gerados a partir de content ao salvar (ver validate_content)
+    teaser_html = db.Column(db.Text)
+    word_count = db.Column(db.Integer)
     summary = db.Column(db.String(200))
-    image_url = db.Column(db.String(255), default='https://via.placeholder.com/1200x400')
+    image_url = db.Column(db.String(255), default=PLACEHOLDER_IMAGE_URL)
     premium_only = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
     reading_time = db.Column(db.Integer, nullable=True)  # Tempo de leitura em minutos (editável)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     comments = db.relationship('Comment', backref='post', lazy='dynamic')
+    # Corpo exibido na página do post: conteúdo completo ou só o trecho (ver main.post)
+    body_html = query_expression()
 
     def __repr__(self):
         return f'<Post {self.title}>'
+    
+    def set_markdown(self, source):
+        """Guarda o Markdown e o HTML renderizado uma única vez, com os títulos do sumário"""
+        rendered = render_markdown(source)
+        self.content_markdown = source
+        self.content = rendered.html
+        self.headings = rendered.headings
+        self.render_version = RENDERER_VERSION
+    
+    @validates('content')
+    def validate_content(self, key, content):
+        # Trecho para visitantes sem acesso premium e contagem de palavras, uma vez por edição
+        self.teaser_html = make_teaser(content)
+        self.word_count = count_words(content)
+        return content
+    
+    @validates('image_url')
+    def validate_image_url(self, key, url):
+        # O fallback é resolvido ao salvar, nunca na visualização da página
+        return resolve_image_url(url)
         
     def get_reading_time(self):
         """
@@ -81,18 +200,46 @@ class Post(db.Model):
         if self.reading_time is not None:
             return self.reading_time
             
-        # Strip HTML tags if present (simplified approach)
-        import re
-        text = re.sub(r'<.*?>', '', self.content)
-        
-        # Count words
-        word_count = len(text.split())
+        # Palavras contadas ao salvar; sem isso (linha antiga) conta a partir do conteúdo
+        word_count = self.word_count if self.word_count is not None else count_words(self.content)
         
         # Calculate reading time (using 225 words per minute as average)
         reading_time_minutes = max(1, round(word_count / 225))
         
         return reading_time_minutes
 
+class RelatedPost(db.Model):
+    """Posts relacionados pré-calculados: os mais parecidos com post_id, em ordem de rank (ver app/related.py)"""
+    __tablename__ = 'related_posts'
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    related_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<RelatedPost {self.post_id} #{self.rank} -> {self.related_id}>'
+
+class PostViewCount(db.Model):
+    """Visualizações de um post num dia (UTC), somadas em lote pelo contador write-behind (ver app/popularity.py)"""
+    __tablename__ = 'post_view_counts'
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<PostViewCount {self.post_id} {self.day}: {self.views}>'
+
+class PopularPost(db.Model):
+    """Ranking de popularidade com decaimento, recalculado periodicamente a partir de post_view_counts"""
+    __tablename__ = 'popular_posts'
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<PopularPost #{self.rank} -> {self.post_id}>'
+
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -104,6 +251,21 @@ class Comment(db.Model):
     def __repr__(self):
         return f'<Comment {self.id} by {self.author.username}>'
 
+class ChatMessage(db.Model):
+    """Mensagem da IA de Relacionamento (uma linha por mensagem, do usuário ou do assistente)"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    role = db.Column(db.String(16), nullable=False)  # 'user' ou 'assistant'
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_chat_message_user_id_created_at', 'user_id', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<ChatMessage {self.id} {self.role}>'
+
 @login_manager.user_loader
 def load_user(id):
     try:
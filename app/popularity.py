@@ -0,0 +1,219 @@
+"""
+Contagem de visualizações dos posts (write-behind) e ranking de popularidade
+
+- main.post chama view_counter.record(post_id): só um incremento num dicionário
+  em memória do worker, sem tocar no banco;
+- a cada VIEW_FLUSH_INTERVAL segundos uma thread por processo grava os
+  contadores acumulados num único upsert em lote na tabela post_view_counts
+  (um contador por post e por dia). Se o processo cair, perde-se no máximo
+  um intervalo; no encerramento normal os contadores são gravados (atexit);
+- a cada POPULAR_REFRESH_INTERVAL segundos, um dos workers recalcula a tabela
+  popular_posts: soma das visualizações dos últimos POPULAR_WINDOW_DAYS dias,
+  com peso que cai pela metade a cada POPULAR_HALF_LIFE_DAYS dias. No
+  PostgreSQL um advisory lock da transação garante um único recálculo por vez
+  (quem não o obtém desiste); no SQLite as escritas já são serializadas;
+- popular_posts() lê o ranking para o módulo "Most Read" da página inicial,
+  com cache por worker de POPULAR_CACHE_TTL segundos indexado pela versão do
+  ranking (computed_at) usada no ETag da página.
+"""
+import atexit
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, func, insert, select, text, update
+
+from app.search import ResultCache
+
+logger = logging.getLogger(__name__)
+
+# Linhas do ranking gravadas (o módulo da página inicial mostra as primeiras)
+POPULAR_TABLE_SIZE = 20
+# Linhas por instrução de upsert (limite de parâmetros do SQLite)
+UPSERT_BATCH = 300
+# Chave do advisory lock do recálculo do ranking no PostgreSQL
+POPULAR_REFRESH_LOCK = 0x706F7075
+
+PopularItem = namedtuple('PopularItem', 'id title premium_only')
+
+_popular_cache = ResultCache(ttl=60, max_entries=4)
+
+
+class ViewCounter:
+    """Contadores de visualização em memória, gravados em lote por uma thread do worker"""
+
+    def __init__(self, flush_interval=30):
+        self.flush_interval = flush_interval
+        self.enabled = True
+        self.app = None
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._atexit_registered = False
+
+    def record(self, post_id):
+        if not self.enabled or self.app is None:
+            return
+        self._ensure_flusher()
+        with self._lock:
+            self._counts[post_id] += 1
+
+    def _ensure_flusher(self):
+        # Uma thread por processo (a do master não sobrevive ao fork do gunicorn)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._counts = Counter()  # Contagens herdadas do master não são deste worker
+            threading.Thread(target=self._flush_loop, name='view-counter', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            # Espalhar as gravações dos vários workers ao longo do intervalo
+            time.sleep(self.flush_interval * (0.75 + secrets.randbelow(500) / 1000))
+            self.flush()
+            try:
+                with self.app.app_context():
+                    refresh_popular_posts(self.app)
+            except Exception as e:
+                logger.warning("Erro ao recalcular os posts populares: %s", e)
+
+    def flush(self):
+        """Grava os contadores acumulados; em caso de erro eles voltam para a próxima tentativa"""
+        if self.app is None or self._pid != os.getpid():
+            return 0
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return 0
+        try:
+            with self.app.app_context():
+                from app import db
+                with db.engine.begin() as connection:
+                    written = _write_counts(connection, counts, datetime.utcnow().date())
+            logger.debug("%s visualizações gravadas (%s posts)", sum(counts.values()), written)
+            return written
+        except Exception as e:
+            with self._lock:
+                self._counts.update(counts)
+            logger.warning("Erro ao gravar visualizações (nova tentativa no próximo intervalo): %s", e)
+            return 0
+
+
+view_counter = ViewCounter()
+
+
+def _write_counts(connection, counts, day):
+    from app.models import Post, PostViewCount
+
+    table = PostViewCount.__table__
+    # Posts excluídos desde a visualização são ignorados
+    existing = set(connection.execute(select(Post.id).where(Post.id.in_(list(counts)))).scalars())
+    rows = [{'post_id': post_id, 'day': day, 'views': views}
+            for post_id, views in sorted(counts.items()) if post_id in existing]
+
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        for start in range(0, len(rows), UPSERT_BATCH):
+            statement = upsert(table).values(rows[start:start + UPSERT_BATCH])
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.post_id, table.c.day],
+                set_={'views': table.c.views + statement.excluded.views},
+            ))
+        return len(rows)
+
+    # Outros bancos: UPDATE e, se a linha ainda não existe, INSERT
+    for row in rows:
+        result = connection.execute(
+            update(table).where(table.c.post_id == row['post_id'], table.c.day == day)
+            .values(views=table.c.views + row['views'])
+        )
+        if not result.rowcount:
+            connection.execute(insert(table).values(**row))
+    return len(rows)
+
+
+def refresh_popular_posts(app, force=False):
+    """Recalcula popular_posts se a versão gravada for mais antiga que POPULAR_REFRESH_INTERVAL"""
+    from app import db
+    from app.models import PopularPost, PostViewCount
+
+    now = datetime.utcnow()
+    half_life = max(app.config.get('POPULAR_HALF_LIFE_DAYS', 7), 0.1)
+    window = app.config.get('POPULAR_WINDOW_DAYS', 30)
+    interval = app.config.get('POPULAR_REFRESH_INTERVAL', 300)
+
+    with db.engine.begin() as connection:
+        if connection.dialect.name == 'postgresql' and not connection.execute(
+                text('SELECT pg_try_advisory_xact_lock(:key)'), {'key': POPULAR_REFRESH_LOCK}).scalar():
+            return False  # Outro worker está recalculando
+        computed_at = connection.execute(select(func.max(PopularPost.computed_at))).scalar()
+        if not force and computed_at is not None and computed_at > now - timedelta(seconds=interval):
+            return False
+
+        today = now.date()
+        weights = {today - timedelta(days=age): 0.5 ** (age / half_life) for age in range(window)}
+        score = func.sum(PostViewCount.views * case(weights, value=PostViewCount.day, else_=0.0)).label('score')
+        ranking = connection.execute(
+            select(PostViewCount.post_id, score)
+            .where(PostViewCount.day > today - timedelta(days=window))
+            .group_by(PostViewCount.post_id)
+            .order_by(score.desc(), PostViewCount.post_id.desc())
+            .limit(POPULAR_TABLE_SIZE)
+        ).all()
+
+        connection.execute(delete(PopularPost.__table__))
+        if ranking:
+            connection.execute(insert(PopularPost.__table__), [
+                {'rank': rank, 'post_id': row.post_id, 'score': float(row.score), 'computed_at': now}
+                for rank, row in enumerate(ranking, start=1)
+            ])
+    _popular_cache.clear()
+    logger.info("Ranking de posts populares recalculado (%s posts)", len(ranking))
+    return True
+
+
+def popular_posts(limit, version=None):
+    """
+    Os `limit` posts mais lidos (id, título, premium), com cache por worker.
+    `version` é o max(computed_at) lido para o ETag: outro worker pode ter
+    recalculado o ranking, e a lista em cache da versão anterior não serve.
+    """
+    from app import db
+    from app.models import PopularPost, Post
+
+    key = (limit, version)
+    cached = _popular_cache.get(key)
+    if cached is not None:
+        return cached
+    rows = db.session.execute(
+        select(Post.id, Post.title, Post.premium_only)
+        .join(PopularPost, PopularPost.post_id == Post.id)
+        .order_by(PopularPost.rank)
+        .limit(limit)
+    ).all()
+    items = [PopularItem(*row) for row in rows]
+    _popular_cache.set(key, items)
+    return items
+
+
+def init_popularity(app):
+    """Configura o contador de visualizações e grava o que restar no encerramento do worker"""
+    view_counter.enabled = app.config.get('VIEW_COUNTER_ENABLED', True)
+    view_counter.flush_interval = app.config.get('VIEW_FLUSH_INTERVAL', 30)
+    view_counter.app = app
+    _popular_cache.ttl = app.config.get('POPULAR_CACHE_TTL', 60)
+    if view_counter.enabled and not view_counter._atexit_registered:
+        view_counter._atexit_registered = True
+        atexit.register(view_counter.flush)
+        logger.info("Contador de visualizações ativo (gravação a cada %ss)", view_counter.flush_interval)
@@ -0,0 +1,250 @@
+"""
+Profiler de requisições sob demanda
+
+Admins podem perfilar uma única requisição em qualquer rota:
+
+    /post/42?_profile=cprofile   (determinístico, contagem exata de chamadas)
+    /post/42?_profile=sample     (amostragem da pilha, baixo overhead)
+
+ou com o cabeçalho "X-Profile: cprofile|sample". Acrescentando
+_profile_output=text a resposta é substituída pelo relatório (chamadas das
+views da aplicação, do SQLAlchemy e do Jinja); caso contrário o perfil é salvo
+em PROFILE_DIR e o nome do arquivo vem no cabeçalho X-Profile-File.
+
+Arquivos gerados (prontos para flame graph):
+- .prof   : pstats do cProfile (snakeviz, flameprof, `python -m pstats`);
+- .folded : pilhas colapsadas (flamegraph.pl, speedscope).
+
+Com PROFILE_SAMPLE_EVERY=N, 1 a cada N requisições de cada worker é perfilada
+por amostragem no mesmo diretório, que mantém só os PROFILE_KEEP mais recentes.
+"""
+import cProfile
+import io
+import itertools
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Response, g, request
+from flask_login import current_user
+
+logger = logging.getLogger(__name__)
+
+MODES = ('cprofile', 'sample')
+
+# Só um cProfile pode estar ativo por processo (threads do gthread competiriam)
+_cprofile_lock = threading.Lock()
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Grupos exibidos no relatório: (rótulo, trecho do caminho do arquivo)
+REPORT_GROUPS = (
+    ('app', APP_DIR + os.sep),
+    ('sqlalchemy', os.sep + 'sqlalchemy' + os.sep),
+    ('jinja2', os.sep + 'jinja2' + os.sep),
+)
+
+
+def _group_for(filename):
+    for label, fragment in REPORT_GROUPS:
+        if fragment in filename:
+            return label
+    return None
+
+
+def _short_path(filename):
+    if 'site-packages' + os.sep in filename:
+        return filename.split('site-packages' + os.sep, 1)[1]
+    if filename.startswith(APP_DIR):
+        return os.path.relpath(filename, os.path.dirname(APP_DIR))
+    return os.path.basename(filename)
+
+
+def _gevent_patched():
+    # Sob gevent a thread do sampler é um greenlet e não consegue interromper a requisição
+    gevent_monkey = sys.modules.get('gevent.monkey')
+    return gevent_monkey is not None and gevent_monkey.is_module_patched('threading')
+
+
+class StackSampler:
+    """Amostra periodicamente a pilha da thread da requisição (pilhas colapsadas)"""
+
+    extension = 'folded'
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._groups = {}  # Função -> grupo do relatório
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                function = f"{code.co_name} ({_short_path(code.co_filename)})"
+                if function not in self._groups:
+                    self._groups[function] = _group_for(code.co_filename)
+                stack.append(function)
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def report(self, limit=25):
+        # Amostras em que cada função aparece na pilha (tempo inclusivo)
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            for function in set(stack.split(';')):
+                inclusive[function] += count
+        lines = [f"Amostragem a cada {self.interval * 1000:.1f}ms: {self.samples} amostras"]
+        for label, _ in REPORT_GROUPS:
+            lines.append(f"\n== {label} (amostras, % do total) ==")
+            rows = [(function, count) for function, count in inclusive.most_common()
+                    if self._groups.get(function) == label]
+            for function, count in rows[:limit]:
+                lines.append(f"{count:8d} {100.0 * count / max(self.samples, 1):6.1f}%  {function}")
+        return '\n'.join(lines)
+
+
+class DeterministicProfiler:
+    """cProfile: contagem exata de chamadas, com overhead maior"""
+
+    extension = 'prof'
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        if not _cprofile_lock.acquire(blocking=False):
+            raise RuntimeError("outro cProfile já está ativo neste processo")
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+        _cprofile_lock.release()
+
+    def dump(self, path):
+        self._profile.dump_stats(path)
+
+    def report(self, limit=25):
+        stats = pstats.Stats(self._profile, stream=io.StringIO())
+        lines = [f"cProfile: {stats.total_calls} chamadas em {stats.total_tt * 1000:.1f}ms"]
+        for label, _ in REPORT_GROUPS:
+            lines.append(f"\n== {label} (chamadas, tempo próprio ms, tempo acumulado ms) ==")
+            rows = [
+                (func, data) for func, data in stats.stats.items()
+                if _group_for(func[0]) == label
+            ]
+            rows.sort(key=lambda item: item[1][3], reverse=True)
+            for (filename, line, name), (_, calls, own, cumulative, _) in rows[:limit]:
+                lines.append(f"{calls:8d} {own * 1000:9.2f} {cumulative * 1000:9.2f}  "
+                             f"{name} ({_short_path(filename)}:{line})")
+        return '\n'.join(lines)
+
+
+def _requested_mode():
+    mode = request.args.get('_profile') or request.headers.get('X-Profile')
+    if not mode:
+        return None
+    mode = mode.lower()
+    return mode if mode in MODES else 'cprofile'
+
+
+def _prune(directory, keep):
+    """Mantém apenas os `keep` perfis mais recentes do diretório"""
+    try:
+        files = [os.path.join(directory, name) for name in os.listdir(directory)
+                 if name.endswith(('.prof', '.folded'))]
+        files.sort(key=os.path.getmtime, reverse=True)
+        for path in files[keep:]:
+            os.remove(path)
+    except OSError as e:
+        logger.warning("Erro ao limpar perfis antigos: %s", e)
+
+
+def profile_directory(app):
+    return app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+
+
+def init_profiler(app):
+    """Registra os hooks do profiler na aplicação"""
+    directory = profile_directory(app)
+    sample_every = app.config.get('PROFILE_SAMPLE_EVERY', 0)
+    interval = app.config.get('PROFILE_SAMPLE_INTERVAL', 0.005)
+    keep = app.config.get('PROFILE_KEEP', 50)
+    counter = itertools.count(1)
+
+    def build_profiler(mode):
+        if mode == 'sample' and not _gevent_patched():
+            return StackSampler(interval)
+        return DeterministicProfiler()
+
+    @app.before_request
+    def start_profiler():
+        mode = _requested_mode()
+        if mode is not None:
+            if not (current_user.is_authenticated and current_user.is_admin):
+                return
+            g.profile_explicit = True
+        elif sample_every and next(counter) % sample_every == 0:
+            mode = 'sample'
+        else:
+            return
+        profiler = build_profiler(mode)
+        try:
+            profiler.start()
+        except RuntimeError as e:
+            logger.warning("Perfil não iniciado para %s: %s", request.path, e)
+            return
+        g.profiler = profiler
+        g.profile_started = time.perf_counter()
+
+    @app.after_request
+    def finish_profiler(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.stop()
+        elapsed = time.perf_counter() - g.pop('profile_started')
+
+        if g.pop('profile_explicit', False) and request.args.get('_profile_output') == 'text':
+            report = f"{request.method} {request.full_path} em {elapsed * 1000:.1f}ms\n\n" + profiler.report()
+            return Response(report, mimetype='text/plain', headers={'Cache-Control': 'no-store'})
+
+        endpoint = request.url_rule.endpoint if request.url_rule is not None else 'unmatched'
+        filename = "{}-{}-{}-{:.0f}ms.{}".format(
+            time.strftime('%Y%m%d-%H%M%S'), os.getpid(),
+            re.sub(r'[^A-Za-z0-9_.]', '_', endpoint), elapsed * 1000, profiler.extension,
+        )
+        try:
+            os.makedirs(directory, exist_ok=True)
+            profiler.dump(os.path.join(directory, filename))
+            _prune(directory, keep)
+            response.headers['X-Profile-File'] = filename
+        except OSError as e:
+            logger.error("Erro ao salvar perfil %s: %s", filename, e)
+        return response
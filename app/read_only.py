@@ -0,0 +1,83 @@
+"""
+Requisições de leitura sem escrita no banco
+
+GET/HEAD/OPTIONS não devem gravar nada: uma visualização de página que faz
+commit pega locks de linha e gera WAL à toa. Este módulo:
+
+- marca a transação como READ ONLY no PostgreSQL durante requisições de
+  leitura (o próprio banco recusa qualquer escrita);
+- sinaliza qualquer flush do ORM ou UPDATE/DELETE em massa feito durante uma
+  requisição de leitura, com a rota e os objetos envolvidos.
+
+READ_ONLY_GUARD controla o comportamento:
+- 'enforce' (padrão): transação READ ONLY + aviso no log;
+- 'warn': apenas o aviso no log;
+- 'raise': transação READ ONLY + exceção no flush (útil em desenvolvimento);
+- 'off': desativado.
+
+As sessões HTTP (app/session_store.py) usam conexões próprias e não são
+afetadas.
+"""
+import logging
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+MODES = ('enforce', 'warn', 'raise', 'off')
+
+
+class WriteDuringReadError(RuntimeError):
+    """Levantada (modo 'raise') quando uma requisição de leitura tenta gravar"""
+
+
+def is_read_request():
+    return has_request_context() and request.method in READ_METHODS
+
+
+def _describe_changes(session):
+    changes = [f"novo {obj!r}" for obj in session.new]
+    changes += [f"alterado {obj!r}" for obj in session.dirty if session.is_modified(obj)]
+    changes += [f"removido {obj!r}" for obj in session.deleted]
+    return changes
+
+
+def init_read_only_guard(app, db):
+    """Registra os eventos de sessão que protegem as requisições de leitura"""
+    mode = (app.config.get('READ_ONLY_GUARD') or 'enforce').lower()
+    if mode not in MODES:
+        logger.warning("READ_ONLY_GUARD=%s inválido; usando 'enforce'", mode)
+        mode = 'enforce'
+    if mode == 'off':
+        return
+
+    def flag(message, *args):
+        text = message % args
+        if mode == 'raise':
+            raise WriteDuringReadError(text)
+        logger.warning(text)
+
+    @event.listens_for(db.session, 'after_begin')
+    def set_read_only(session, transaction, connection):
+        if mode != 'warn' and is_read_request() and connection.dialect.name == 'postgresql':
+            # Precisa ser a primeira instrução da transação (vale também com o pgbouncer)
+            connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+
+    @event.listens_for(db.session, 'before_flush')
+    def flag_flush(session, flush_context, instances):
+        if not is_read_request():
+            return
+        changes = _describe_changes(session)
+        if changes:
+            flag("Flush durante %s %s (%s): %s", request.method, request.path,
+                 request.endpoint, '; '.join(changes))
+
+    @event.listens_for(db.session, 'do_orm_execute')
+    def flag_bulk_write(orm_execute_state):
+        if is_read_request() and (orm_execute_state.is_update or orm_execute_state.is_delete):
+            flag("UPDATE/DELETE em massa durante %s %s (%s)", request.method, request.path,
+                 request.endpoint)
+
+    logger.info("Proteção de escrita em requisições de leitura: %s", mode)
@@ -0,0 +1,259 @@
+"""
+Posts relacionados pré-calculados (tabela related_posts)
+
+Similaridade de cosseno entre vetores TF-IDF de título, resumo e conteúdo
+(o título pesa mais que o resumo, que pesa mais que o corpo). O cálculo é
+feito fora da visualização: a página do post só lê as RELATED_POSTS_COUNT
+linhas do post pela chave primária (post_id, rank).
+
+- rebuild_related_posts: recalcula a tabela inteira (scripts/related_posts.py);
+- refresh_related_posts: depois de criar, editar ou excluir posts, recalcula
+  só as linhas afetadas: as dos posts alterados, as que apontam para eles e
+  as dos posts em que eles passam a entrar no top-N. O IDF dos demais posts
+  não é recalculado; o rebuild periódico corrige essa deriva.
+
+Os vetores são esparsos (arrays NumPy no formato CSR/CSC, sem SciPy): termos
+que aparecem em um único post ou em mais de MAX_DF_RATIO dos posts não
+aproximam nada e são descartados, e cada post mantém só os MAX_TERMS_PER_DOC
+termos de maior peso. As similaridades são calculadas em blocos de linhas
+para limitar a memória.
+
+NumPy é opcional: sem ele nada é calculado e a página do post mostra os
+posts mais recentes.
+"""
+import importlib.util
+import logging
+import re
+from collections import Counter, namedtuple
+
+from sqlalchemy import func, select
+
+from app.content import html_to_text
+
+logger = logging.getLogger(__name__)
+
+numpy_available = importlib.util.find_spec('numpy') is not None
+if numpy_available:
+    import numpy as np
+
+# Repetições de cada campo no "documento" do post
+TITLE_WEIGHT = 3
+SUMMARY_WEIGHT = 2
+
+MIN_TOKEN_LENGTH = 3
+MAX_DF_RATIO = 0.5
+MAX_TERMS_PER_DOC = 64
+# Limite de células (linhas do bloco x posts) da matriz de similaridade por bloco
+SCORE_BLOCK_CELLS = 4_000_000
+
+STOPWORDS = frozenset("""
+    the and for are but not you your with this that from have has was were will
+    can all any our out about into more most some such than then them they their
+    there these those what when where which while who why how its also just like
+    very com como das dos mas mais nas nos num numa para pela pelas pelo pelos por
+    que quando sem seu sua seus suas são ser sobre também tem uma umas uns você
+    vocês ela ele elas eles isso isto esse essa este esta muito mesmo ainda onde
+""".split())
+
+TOKEN = re.compile(r'[^\W\d_]+')
+
+Related = namedtuple('Related', 'related_id score')
+
+
+def tokenize(title, summary, content):
+    """Contagem dos termos do post, com título e resumo repetidos pelos seus pesos"""
+    counts = Counter()
+    for text, weight in ((title, TITLE_WEIGHT), (summary, SUMMARY_WEIGHT), (html_to_text(content), 1)):
+        for token in TOKEN.findall((text or '').lower()):
+            if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS:
+                counts[token] += weight
+    return counts
+
+
+class TfidfIndex:
+    """Vetores TF-IDF normalizados de todos os posts, por linha (CSR) e por termo (CSC)"""
+
+    def __init__(self, documents):
+        """documents: iterável de (post_id, Counter de termos)"""
+        vocabulary = {}
+        post_ids, doc_index, term_index, term_counts = [], [], [], []
+        for row, (post_id, counts) in enumerate(documents):
+            post_ids.append(post_id)
+            for term, count in counts.items():
+                doc_index.append(row)
+                term_index.append(vocabulary.setdefault(term, len(vocabulary)))
+                term_counts.append(count)
+
+        self.post_ids = np.asarray(post_ids, dtype=np.int64)
+        self.size = len(post_ids)
+        self.row_of = {post_id: row for row, post_id in enumerate(post_ids)}
+        docs = np.asarray(doc_index, dtype=np.int64)
+        terms = np.asarray(term_index, dtype=np.int64)
+        tf = np.asarray(term_counts, dtype=np.float64)
+
+        # Termos raros (df=1) ou comuns demais não contribuem para a similaridade
+        df = np.bincount(terms, minlength=len(vocabulary))
+        keep = (df[terms] >= 2) & (df[terms] <= max(2, MAX_DF_RATIO * self.size))
+        docs, terms, tf = docs[keep], terms[keep], tf[keep]
+        idf = np.log((1 + self.size) / (1 + df)) + 1
+        weights = (1 + np.log(tf)) * idf[terms]
+
+        # Só os MAX_TERMS_PER_DOC termos mais pesados de cada post
+        order = np.lexsort((-weights, docs))
+        docs, terms, weights = docs[order], terms[order], weights[order]
+        starts = np.searchsorted(docs, docs, side='left')
+        keep = (np.arange(len(docs)) - starts) < MAX_TERMS_PER_DOC
+        docs, terms, weights = docs[keep], terms[keep], weights[keep]
+
+        norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=self.size))
+        weights = weights / np.where(norms > 0, norms, 1)[docs]
+
+        # CSR: entradas de cada post (já ordenadas por post)
+        self.row_ptr = np.concatenate(([0], np.cumsum(np.bincount(docs, minlength=self.size))))
+        self.row_terms, self.row_weights = terms, weights
+        # CSC: posts de cada termo
+        by_term = np.argsort(terms, kind='stable')
+        self.col_ptr = np.concatenate(([0], np.cumsum(np.bincount(terms, minlength=len(vocabulary)))))
+        self.col_docs, self.col_weights = docs[by_term], weights[by_term]
+
+    def scores(self, rows):
+        """Similaridade de cosseno dos posts `rows` com todos os posts (len(rows) x size)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        lengths = self.row_ptr[rows + 1] - self.row_ptr[rows]
+        entries = np.repeat(self.row_ptr[rows] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        local = np.repeat(np.arange(len(rows)), lengths)
+        terms, query = self.row_terms[entries], self.row_weights[entries]
+
+        # Cada termo da consulta encontra a lista de posts que o contêm
+        postings = self.col_ptr[terms + 1] - self.col_ptr[terms]
+        positions = np.repeat(self.col_ptr[terms] - np.cumsum(postings) + postings, postings) + \
+            np.arange(postings.sum())
+        pair_rows = np.repeat(local, postings)
+        pair_weights = np.repeat(query, postings) * self.col_weights[positions]
+        flat = np.bincount(pair_rows * self.size + self.col_docs[positions], weights=pair_weights,
+                           minlength=len(rows) * self.size)
+        return flat.reshape(len(rows), self.size)
+
+    def top_related(self, rows, count):
+        """{post_id: [Related]} com os `count` posts mais parecidos de cada um dos `rows`"""
+        result = {}
+        block_size = max(1, SCORE_BLOCK_CELLS // max(1, self.size))
+        for start in range(0, len(rows), block_size):
+            block = list(rows[start:start + block_size])
+            scores = self.scores(block)
+            scores[np.arange(len(block)), block] = 0  # O próprio post
+            k = min(count, self.size - 1)
+            if k <= 0:
+                result.update((int(self.post_ids[row]), []) for row in block)
+                continue
+            best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for line, row in enumerate(block):
+                ranked = sorted(best[line], key=lambda col: (-scores[line, col], self.post_ids[col]))
+                result[int(self.post_ids[row])] = [
+                    Related(int(self.post_ids[col]), float(scores[line, col]))
+                    for col in ranked if scores[line, col] > 0
+                ]
+        return result
+
+
+def load_index(session):
+    """Índice TF-IDF de todos os posts (o conteúdo é tokenizado enquanto é lido)"""
+    from app.models import Post
+
+    rows = session.execute(
+        select(Post.id, Post.title, Post.summary, Post.content).order_by(Post.id)
+        .execution_options(yield_per=500)
+    )
+    return TfidfIndex((row.id, tokenize(row.title, row.summary, row.content)) for row in rows)
+
+
+def _write_rows(session, related):
+    from app.models import RelatedPost
+
+    session.bulk_insert_mappings(RelatedPost, [
+        {'post_id': post_id, 'rank': rank, 'related_id': item.related_id, 'score': item.score}
+        for post_id, items in related.items()
+        for rank, item in enumerate(items, start=1)
+    ])
+
+
+def rebuild_related_posts(session, count):
+    """Recalcula a tabela inteira numa transação; retorna quantos posts foram processados"""
+    from app.models import RelatedPost
+
+    if not numpy_available:
+        logger.warning("NumPy não instalado; posts relacionados não calculados")
+        return 0
+    index = load_index(session)
+    related = index.top_related(list(range(index.size)), count)
+    session.query(RelatedPost).delete(synchronize_session=False)
+    _write_rows(session, related)
+    session.commit()
+    return index.size
+
+
+def posts_pointing_to(session, post_ids):
+    """Posts que hoje listam algum de `post_ids` entre os relacionados"""
+    from app.models import RelatedPost
+
+    if not post_ids:
+        return set()
+    return set(session.scalars(
+        select(RelatedPost.post_id).where(RelatedPost.related_id.in_(post_ids)).distinct()
+    ))
+
+
+def _thresholds(session, count):
+    """Menor score da lista de cada post (0 se a lista tem menos de `count` itens)"""
+    from app.models import RelatedPost
+
+    rows = session.execute(
+        select(RelatedPost.post_id, func.count(RelatedPost.rank), func.min(RelatedPost.score))
+        .group_by(RelatedPost.post_id)
+    )
+    return {post_id: (minimum if total >= count else 0) for post_id, total, minimum in rows}
+
+
+def refresh_related_posts(session, count, changed_ids=(), stale_ids=()):
+    """
+    Atualiza só as linhas afetadas pela escrita de `changed_ids` (criados ou
+    editados); `stale_ids` são recalculados sem mais nada (ex.: posts que
+    apontavam para um post excluído). Falhas são só registradas: a
+    recomendação nunca impede salvar um post.
+
+    Custo: roda dentro da requisição do admin e relê e tokeniza o conteúdo de
+    todos os posts (load_index), ou seja, cresce com o tamanho do blog. As
+    páginas públicas não pagam esse custo.
+    """
+    from app.models import RelatedPost
+
+    if not numpy_available or not (changed_ids or stale_ids):
+        return 0
+    try:
+        index = load_index(session)
+        changed = [index.row_of[post_id] for post_id in changed_ids if post_id in index.row_of]
+        affected = set(changed)
+        affected.update(index.row_of[post_id] for post_id in stale_ids if post_id in index.row_of)
+        affected.update(index.row_of[post_id] for post_id in posts_pointing_to(session, changed_ids)
+                        if post_id in index.row_of)
+
+        if changed:
+            # Posts em que um alterado supera hoje o último da lista (ou a lista está incompleta)
+            thresholds = _thresholds(session, count)
+            best = index.scores(changed).max(axis=0)
+            for row in np.flatnonzero(best > 0):
+                if best[row] > thresholds.get(int(index.post_ids[row]), 0):
+                    affected.add(int(row))
+
+        related = index.top_related(sorted(affected), count)
+        if related:
+            session.query(RelatedPost).filter(RelatedPost.post_id.in_(list(related))) \
+                .delete(synchronize_session=False)
+            _write_rows(session, related)
+        session.commit()
+        logger.info("Posts relacionados atualizados para %s post(s)", len(related))
+        return len(related)
+    except Exception:
+        session.rollback()
+        logger.exception("Erro ao atualizar posts relacionados de %s", list(changed_ids) or list(stale_ids))
+        return 0
@@ -1,9 +1,17 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort, current_app, send_from_directory
 from flask_login import login_required, current_user
 from app import db
-from app.models import User, Post, Comment
+from app.models import User, Post, Comment, RelatedPost, ChatMessage
 from app.forms import PostForm, UserUpdateForm
+from app.circuit_breaker import all_snapshots, get_breaker
+from app.profiler import profile_directory
+from app.related import posts_pointing_to, refresh_related_posts
+from sqlalchemy.orm import joinedload
 from functools import wraps
+import logging
+import os
+
+logger = logging.getLogger(__name__)
 
 # Decorador para verificar se o usuário é administrador
 def admin_required(f):
@@ -22,7 +30,7 @@ admin_bp = Blueprint('admin', __name__)
 @login_required
 @admin_required
 def dashboard():
-    posts = Post.query.order_by(Post.created_at.desc()).limit(10).all()
+    posts = Post.query.options(joinedload(Post.author)).order_by(Post.created_at.desc()).limit(10).all()
     pending_count = Comment.query.filter_by(approved=False).count()
     
     # Estatísticas para o dashboard
@@ -33,13 +41,14 @@ def dashboard():
         'premium_users_count': User.query.filter_by(is_premium=True).count()
     }
     
-    return render_template('admin/dashboard.html', posts=posts, pending_count=pending_count, stats=stats)
+    return render_template('admin/dashboard.html', posts=posts, pending_count=pending_count, stats=stats,
+                           breakers=all_snapshots())
 
 @admin_bp.route('/all-posts')
 @login_required
 @admin_required
 def all_posts():
-    posts = Post.query.order_by(Post.created_at.desc()).all()
+    posts = Post.query.options(joinedload(Post.author)).order_by(Post.created_at.desc()).all()
     pending_count = Comment.query.filter_by(approved=False).count()
     
     # Estatísticas para o dashboard
@@ -52,6 +61,41 @@ def all_posts():
     
     return render_template('admin/dashboard.html', posts=posts, pending_count=pending_count, show_all=True, stats=stats)
 
+@admin_bp.route('/circuit-breakers')
+@login_required
+@admin_required
+def circuit_breakers():
+    """Estado dos circuit breakers das dependências externas (deste worker)"""
+    return jsonify({'breakers': all_snapshots()})
+
+@admin_bp.route('/circuit-breakers/<name>/reset', methods=['POST'])
+@login_required
+@admin_required
+def reset_circuit_breaker(name):
+    if name not in {snapshot['name'] for snapshot in all_snapshots()}:
+        abort(404)
+    get_breaker(name).reset()
+    flash(f'Circuit breaker {name} reset.', 'success')
+    return redirect(url_for('admin.dashboard'))
+
+@admin_bp.route('/profiles')
+@login_required
+@admin_required
+def profiles():
+    """Perfis salvos pelo profiler (mais recentes primeiro)"""
+    directory = profile_directory(current_app)
+    names = os.listdir(directory) if os.path.isdir(directory) else []
+    names = sorted((name for name in names if name.endswith(('.prof', '.folded'))), reverse=True)
+    return jsonify({'profiles': [
+        {'name': name, 'url': url_for('admin.download_profile', filename=name)} for name in names
+    ]})
+
+@admin_bp.route('/profiles/<path:filename>')
+@login_required
+@admin_required
+def download_profile(filename):
+    return send_from_directory(profile_directory(current_app), filename, as_attachment=True)
+
 @admin_bp.route('/post/new', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -63,7 +107,7 @@ def create_post():
         form.premium_only.data = True
     
     if form.validate_on_submit():
-        image_url = form.image_url.data if form.image_url.data else 'https://via.placeholder.com/1200x400'
+        image_url = form.image_url.data  # Vazia ou inexistente vira placeholder (Post.validate_image_url)
         
         # Processar campos adicionais
         reading_time = form.reading_time.data
@@ -73,12 +117,12 @@ def create_post():
         post = Post(
             title=form.title.data,
             summary=form.summary.data,
-            content=form.content.data,
             image_url=image_url,
             premium_only=form.premium_only.data,
             author=current_user,
             reading_time=reading_time
         )
+        post.set_markdown(form.content.data)  # HTML renderizado uma vez, aqui
         
         # Processar data de publicação
         if created_at and created_at.strip():
@@ -90,6 +134,7 @@ def create_post():
         
         db.session.add(post)
         db.session.commit()
+        refresh_related_posts(db.session, current_app.config.get('RELATED_POSTS_COUNT', 4), changed_ids=[post.id])
         
         # Mensagem personalizada conforme o tipo de post
         if post.premium_only:
@@ -127,7 +172,7 @@ def edit_post(post_id):
             # Atualizar o post com os novos dados
             post.title = title
             post.summary = summary
-            post.content = content
+            post.set_markdown(content)
             if image_url and image_url.strip():
                 post.image_url = image_url
             post.premium_only = premium_only
@@ -148,11 +193,14 @@ def edit_post(post_id):
             
             # Salvar no banco de dados
             db.session.commit()
+            refresh_related_posts(db.session, current_app.config.get('RELATED_POSTS_COUNT', 4), changed_ids=[post.id])
             flash('Your post has been updated successfully!', 'success')
             return redirect(url_for('admin.dashboard'))
     
     # Criar o formulário para o método GET (já preenchido com os dados do post)
     form = PostForm(obj=post)
+    if post.content_markdown is not None:
+        form.content.data = post.content_markdown  # Posts antigos: o HTML vira a fonte na próxima edição
     return render_template('admin/edit_post.html', form=form, post=post)
 
 @admin_bp.route('/post/delete/<int:post_id>', methods=['POST'])
@@ -165,14 +213,21 @@ def delete_post(post_id):
         # Remover comentários relacionados para evitar problemas de integridade
         Comment.query.filter_by(post_id=post_id).delete()
         
+        # Posts que o listavam como relacionado são recalculados depois da exclusão
+        pointing = posts_pointing_to(db.session, [post_id]) - {post_id}
+        RelatedPost.query.filter(
+            (RelatedPost.post_id == post_id) | (RelatedPost.related_id == post_id)
+        ).delete(synchronize_session=False)
+        
         # Excluir o post
         db.session.delete(post)
         db.session.commit()
+        refresh_related_posts(db.session, current_app.config.get('RELATED_POSTS_COUNT', 4), stale_ids=pointing)
         flash('Post deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error deleting post: {str(e)}', 'danger')
-        print(f"ERRO ao excluir post {post_id}: {str(e)}")
+        logger.exception("ERRO ao excluir post %s", post_id)
         
     return redirect(url_for('admin.dashboard'))
 
@@ -266,6 +321,8 @@ def delete_user(user_id):
         return redirect(url_for('admin.manage_users'))
         
     user = User.query.get_or_404(user_id)
+    # Histórico do chat apagado na mesma transação (bancos criados antes do ON DELETE CASCADE)
+    ChatMessage.query.filter_by(user_id=user.id).delete(synchronize_session=False)
     db.session.delete(user)
     db.session.commit()
     flash(f'User {user.username} has been deleted successfully.', 'success')
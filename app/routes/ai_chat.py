@@ -3,9 +3,13 @@ from flask_login import current_user, login_required
 from app.forms import ChatMessageForm
 from app import db
 from app.models import User
+from app.circuit_breaker import CircuitOpenError, get_breaker
+from app.metrics import observe_outbound
+from app.chat_history import build_context, clear_history, get_history_page, save_exchange
 import random
 import time
 import json
+import logging
 import os
 
 # Importação condicional do OpenAI para funcionar com versões antigas e novas
@@ -13,12 +17,10 @@ try:
     # Tentar importar o novo cliente (versão >= 1.0.0)
     from openai import OpenAI
     USING_NEW_CLIENT = True
-    print("Usando cliente OpenAI moderno (versão >= 1.0.0)")
 except ImportError:
     # Fallback para o cliente antigo
     import openai
     USING_NEW_CLIENT = False
-    print("Usando cliente OpenAI legado (versão < 1.0.0)")
 
 # Configuração: desativar modo de simulação para usar a API OpenAI
 SIMULATION_MODE = False
@@ -26,10 +28,11 @@ SIMULATION_MODE = False
 # Blueprint para IA de relacionamento
 ai_chat_bp = Blueprint('ai_chat', __name__)
 
+logger = logging.getLogger(__name__)
+
 # Função para depurar variáveis de ambiente relacionadas à OpenAI
 def debug_environment_vars():
-    """Imprime informações de debug sobre as variáveis de ambiente relacionadas à OpenAI"""
-    print("\n==== DEBUG VARIÁVEIS DE AMBIENTE OPENAI ====")
+    """Registra (DEBUG) informações sobre as variáveis de ambiente relacionadas à OpenAI"""
     # Verificar se as variáveis de ambiente estão definidas
     openai_api_key_env = os.environ.get('OPENAI_API_KEY', 'Não definida')
     # Mascarar a chave para o log
@@ -37,10 +40,7 @@ def debug_environment_vars():
     key_length = len(openai_api_key_env) if openai_api_key_env != 'Não definida' else 0
     key_preview = openai_api_key_env[:4] + "..." if key_length > 4 else ""
     
-    print(f"OPENAI_API_KEY no ambiente: {key_status}")
-    print(f"Comprimento da OPENAI_API_KEY no ambiente: {key_length} caracteres")
-    if key_preview:
-        print(f"Primeiros caracteres: {key_preview}")
+    logger.debug("OPENAI_API_KEY no ambiente: %s (%s caracteres, %s)", key_status, key_length, key_preview)
     
     # Verificar a configuração na aplicação
     app_api_key = current_app.config.get('OPENAI_API_KEY', 'Não definida na configuração')
@@ -48,45 +48,40 @@ def debug_environment_vars():
     app_key_length = len(app_api_key) if app_api_key != 'Não definida na configuração' else 0
     app_key_preview = app_api_key[:4] + "..." if app_key_length > 4 else ""
     
-    print(f"OPENAI_API_KEY na config da aplicação: {app_key_status}")
-    print(f"Comprimento da OPENAI_API_KEY na config: {app_key_length} caracteres")
-    if app_key_preview:
-        print(f"Primeiros caracteres: {app_key_preview}")
+    logger.debug("OPENAI_API_KEY na config da aplicação: %s (%s caracteres, %s)", app_key_status, app_key_length, app_key_preview)
         
     # Verificar o OPENAI_ASSISTANT_ID
     assistant_id_env = os.environ.get('OPENAI_ASSISTANT_ID', 'Não definido')
     assistant_id_status = "Definido" if assistant_id_env != 'Não definido' else "Não definido"
     
-    print(f"OPENAI_ASSISTANT_ID no ambiente: {assistant_id_status}")
-    if assistant_id_status == "Definido":
-        print(f"Valor: {assistant_id_env}")
+    logger.debug("OPENAI_ASSISTANT_ID no ambiente: %s", assistant_id_status)
     
     # Verificar na configuração da aplicação
     app_assistant_id = current_app.config.get('OPENAI_ASSISTANT_ID', 'Não definido na configuração')
     app_assistant_status = "Definido" if app_assistant_id != 'Não definido na configuração' else "Não definido"
     
-    print(f"OPENAI_ASSISTANT_ID na config da aplicação: {app_assistant_status}")
-    if app_assistant_status == "Definido":
-        print(f"Valor: {app_assistant_id}")
-    
-    print("==== FIM DEBUG VARIÁVEIS DE AMBIENTE ====\n")
+    logger.debug("OPENAI_ASSISTANT_ID na config da aplicação: %s", app_assistant_status)
+
+def credits_enforced():
+    """Indica se o usuário atual deve ter créditos de IA debitados"""
+    return current_app.config.get('AI_CREDITS_ENABLED', False) and not current_user.is_admin
 
 # Implementar função de fallback para caso de erro na API
 def get_fallback_response(error_message):
     """Retorna uma resposta de fallback caso haja erro na API"""
-    print(f"Erro na API. Usando resposta de fallback. Erro original: {error_message}")
+    logger.warning("Erro na API. Usando resposta de fallback. Erro original: %s", error_message)
     return "Desculpe, estou enfrentando dificuldades técnicas no momento. Nossa equipe já foi notificada do problema. Por favor, tente novamente mais tarde."
 
 @ai_chat_bp.route('/ia-relacionamento', methods=['GET', 'POST'])
 def ia_relacionamento():
     """Página de IA de Relacionamento"""
     # Depurar variáveis de ambiente relacionadas à OpenAI
-    if current_app.debug:
+    if current_app.debug and logger.isEnabledFor(logging.DEBUG):
         debug_environment_vars()
         
     # Detectar se estamos em ambiente local
     is_local = 'localhost' in request.host or '127.0.0.1' in request.host
-    print(f"Executando em ambiente local: {is_local}")
+    logger.debug("Executando em ambiente local: %s", is_local)
     
     # Verificar se o usuário está autenticado e é premium
     can_access_ai = current_user.is_authenticated and (current_user.is_premium or current_user.is_admin)
@@ -99,26 +94,21 @@ def ia_relacionamento():
     # Verificar se é uma requisição AJAX
     is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
     
-    # Debug da sessão
-    print(f"[DEBUG] SID: {request.cookies.get('session', 'No session cookie')}")
-    print(f"[DEBUG] Session no início da requisição: {session}")
-    
     # Inicializar formulário
     form = ChatMessageForm()
     
     # Para requisições GET, retornar template normalmente
     if request.method == 'GET' or not is_ajax:
-        if 'chat_messages' not in session:
-            session['chat_messages'] = []
-            session.modified = True
+        # Histórico paginado (mais recentes primeiro; ?before=<id> carrega os anteriores)
+        messages, older_id = get_history_page(current_user.id, before_id=request.args.get('before', type=int))
             
-        # Como só usuários premium têm acesso, não precisamos mais verificar créditos
-        # Definir créditos como ilimitados para usuários premium (-1)
-        credits = -1  # -1 representa créditos ilimitados
+        # Sem cobrança habilitada, usuários premium têm créditos ilimitados (-1)
+        credits = current_user.ai_credits if credits_enforced() else -1
             
         return render_template('public/ia_relacionamento.html', 
                               form=form, 
-                              messages=session.get('chat_messages', []),
+                              messages=messages,
+                              older_id=older_id,
                               credits=credits)
     
     # Para requisições POST com AJAX
@@ -142,17 +132,28 @@ def ia_relacionamento():
             
             # Obter mensagem do usuário
             user_message = form.message.data
-            print(f"Mensagem recebida: {user_message}")
+            logger.debug("Mensagem recebida (%s caracteres)", len(user_message or ''))
             
             # Verificar se a mensagem é válida
             if user_message is None or user_message.strip() == '':
                 # Mensagem inválida ou vazia
-                print("Mensagem vazia ou inválida recebida")
+                logger.debug("Mensagem vazia ou inválida recebida")
                 return jsonify({
                     'success': False,
                     'error': "Por favor, digite uma mensagem válida."
                 })
             
+            # Debitar o crédito antes da chamada (UPDATE atômico, sem corrida)
+            charged = False
+            if credits_enforced():
+                if not current_user.use_ai_credit():
+                    return jsonify({
+                        'success': False,
+                        'error': "Você não tem créditos de IA disponíveis no momento.",
+                        'credits_remaining': 0
+                    })
+                charged = True
+            
             # Variável para armazenar a resposta do assistente
             assistant_response = None
             success = True
@@ -161,7 +162,7 @@ def ia_relacionamento():
             try:
                 if SIMULATION_MODE:
                     # Adicionar simulação mais realista
-                    print("Modo de simulação ativado - gerando resposta simulada")
+                    logger.debug("Modo de simulação ativado - gerando resposta simulada")
                     time.sleep(0.5)  # Pequeno delay para simular processamento
                     
                     # Gerar resposta mais realista baseada na mensagem do usuário
@@ -175,20 +176,11 @@ def ia_relacionamento():
                     
                     # Selecionar uma resposta aleatória
                     assistant_response = random.choice(respostas_simuladas)
-                    print(f"Resposta simulada gerada: {assistant_response[:50]}...")
+
                 else:
-                    # Imprimir informações sobre a configuração da API key
-                    api_key_status = "CONFIGURADA" if current_app.config.get('OPENAI_API_KEY') else "NÃO CONFIGURADA"
-                    print(f"Status da API Key: {api_key_status}")
-                    
-                    # Se estiver em modo de desenvolvimento, mostrar mais detalhes
-                    if current_app.debug:
-                        api_key = current_app.config.get('OPENAI_API_KEY', '')
-                        print(f"API Key (primeiros 4 caracteres): {api_key[:4] if api_key else 'Vazia'}")
-                        print(f"Comprimento da API Key: {len(api_key) if api_key else 0} caracteres")
-                    
-                    # Usar OpenAI API para obter resposta, enviando APENAS a mensagem atual
-                    api_response = get_openai_response(user_message)
+                    # Usar OpenAI API com a janela recente do histórico (limitada por tokens)
+                    history = build_context(current_user.id)
+                    api_response = get_openai_response(user_message, history=history)
                     
                     # Verificar se a resposta foi bem-sucedida
                     if api_response["success"]:
@@ -196,35 +188,27 @@ def ia_relacionamento():
                     else:
                         success = False
                         assistant_response = api_response["message"]
-                        print(f"Erro na API: {api_response['debug_info']}")
+                        logger.warning("Erro na API: %s", api_response['debug_info'])
                     
             except Exception as api_error:
                 # Capturar erros específicos da API e usar resposta de fallback
-                print(f"Erro na API OpenAI: {str(api_error)}")
+                logger.exception("Erro na API OpenAI: %s", api_error)
                 error_message = str(api_error)
                 assistant_response = get_fallback_response(error_message)
                 success = False  # Marcar como erro, mas ainda retornar uma resposta
             
-            # Atualizar sessão (de forma simples)
-            if 'chat_messages' not in session:
-                session['chat_messages'] = []
-            
-            # Adicionar mensagem ao histórico
-            messages = session.get('chat_messages', [])
-            messages.append({"user": user_message, "assistant": assistant_response})
-            session['chat_messages'] = messages
-            
-            # Forçar gravação da sessão
-            session.modified = True
+            # Devolver o crédito se a IA não respondeu de fato
+            if charged and not success:
+                current_user.refund_ai_credit()
             
-            print(f"[DEBUG] Sessão após atualização: {session}")
-            print(f"[DEBUG] Mensagens na sessão: {len(session.get('chat_messages', []))}")
+            # Persistir a troca no histórico do usuário
+            save_exchange(current_user.id, user_message, assistant_response)
             
             # Criar e retornar resposta JSON
             response = jsonify({
                 'success': True,  # Sempre retorna sucesso para exibir a resposta
                 'response': assistant_response,
-                'credits_remaining': -1,  # -1 representa créditos ilimitados
+                'credits_remaining': current_user.ai_credits if charged else -1,  # -1 representa créditos ilimitados
                 'api_error': error_message  # Incluir detalhes do erro para debug
             })
             response.headers['Content-Type'] = 'application/json'
@@ -232,10 +216,7 @@ def ia_relacionamento():
             return response
             
         except Exception as e:
-            print(f"ERRO: {str(e)}")
-            import traceback
-            error_details = traceback.format_exc()
-            print(f"Detalhes do erro: {error_details}")
+            logger.exception("ERRO no chat de IA: %s", e)
             
             # Retornar erro como JSON
             response = jsonify({
@@ -249,27 +230,35 @@ def ia_relacionamento():
     # Fallback para qualquer outro caso
     return jsonify({'success': False, 'error': 'Requisição inválida'})
 
-def get_openai_response(user_message):
-    """Obtém uma resposta do OpenAI Assistant enviando apenas a mensagem atual"""
-    print("Iniciando chamada à API OpenAI - enviando apenas a mensagem atual")
+SYSTEM_PROMPT = "Você é um especialista em relacionamentos e reconquista. Seu objetivo é ajudar pessoas a melhorarem seus relacionamentos amorosos e a reconquistar ex-parceiros de maneira saudável. Forneça conselhos práticos, diretos e personalizados para as situações descritas pelo usuário."
+
+def build_messages(user_message, history=None):
+    """Monta a lista de mensagens: prompt de sistema, janela do histórico e mensagem atual"""
+    return [{"role": "system", "content": SYSTEM_PROMPT}] + list(history or []) + [
+        {"role": "user", "content": user_message}
+    ]
+
+def get_openai_response(user_message, history=None):
+    """Obtém uma resposta do OpenAI enviando a mensagem atual e a janela recente do histórico"""
+    logger.debug("Iniciando chamada à API OpenAI - %s mensagens de contexto", len(history or []))
     
     try:
         # Obter chaves da configuração da aplicação
         api_key = current_app.config.get('OPENAI_API_KEY')
         
         if not api_key:
-            print("ERRO: API key não configurada")
+            logger.error("API key da OpenAI não configurada")
             raise ValueError("Chave da API OpenAI não configurada. Verifique as variáveis de ambiente.")
         
         # Limpar a chave da API para garantir que não tenha quebras de linha ou texto adicional
         if '\n' in api_key:
-            print("AVISO: Encontrada quebra de linha na chave da API. Limpando...")
+            logger.warning("Encontrada quebra de linha na chave da API. Limpando...")
             # Pegar apenas a primeira linha (a chave real)
             api_key = api_key.split('\n')[0].strip()
         
         # Verificar e remover prefixos ou sufixos que não deveriam estar lá
         if ' ' in api_key:
-            print("AVISO: Espaços encontrados na chave da API. Limpando...")
+            logger.warning("Espaços encontrados na chave da API. Limpando...")
             api_key = api_key.strip()
             
         # Verificar padrão básico da chave OpenAI
@@ -279,49 +268,42 @@ def get_openai_response(user_message):
         else:
             # Tentar extrair a chave se ela estiver em um formato como "OPENAI_API_KEY=sk-..."
             if '=' in api_key and 'sk-' in api_key:
-                print("AVISO: Formato incorreto na chave da API. Tentando extrair...")
+                logger.warning("Formato incorreto na chave da API. Tentando extrair...")
                 # Obter a parte após "sk-"
                 parts = api_key.split('sk-')
                 if len(parts) > 1:
                     # Reconstruir a chave corretamente
                     extracted_key = parts[1].split()[0].strip() if ' ' in parts[1] else parts[1].strip()
                     api_key = 'sk-' + extracted_key
-                    print(f"Chave extraída com sucesso, novo comprimento: {len(api_key)}")
+                    logger.debug("Chave extraída com sucesso, novo comprimento: %s", len(api_key))
                 else:
-                    print("ERRO: Não foi possível extrair a chave corretamente")
+                    logger.error("Não foi possível extrair a chave da API corretamente")
         
         # Verificar se a API key tem uma estrutura válida (formato básico)
         if not api_key.startswith(('sk-', 'org-')):
-            print(f"AVISO: A API key não parece estar no formato correto")
-        
-        # Log detalhado da API key (primeiros 4 caracteres)
-        key_preview = api_key[:4] + "..." if api_key else "None"
-        print(f"Usando API key: {key_preview}")
-        print(f"Comprimento da API key: {len(api_key)} caracteres")
+            logger.warning("A API key não parece estar no formato correto")
         
         # Configuração do cliente baseada na versão disponível
         if USING_NEW_CLIENT:
-            # Inicializar o cliente com a API key (novo cliente)
-            client = OpenAI(api_key=api_key.strip(), timeout=60.0)
-            print(f"Cliente OpenAI moderno configurado com timeout de 60 segundos")
-            
-            # Criar uma solicitação para a API usando o novo cliente
-            print(f"Enviando solicitação ao modelo gpt-3.5-turbo (novo cliente)")
+            # Inicializar o cliente com a API key (novo cliente); o timeout vem do
+            # orçamento do breaker e sem retries internos, para falhar rápido
+            breaker = get_breaker('openai')
+            client = OpenAI(
+                api_key=api_key.strip(),
+                base_url=current_app.config.get('OPENAI_BASE_URL'),
+                timeout=breaker.timeout,
+                max_retries=0
+            )
+            logger.debug("Enviando solicitação ao modelo gpt-3.5-turbo (novo cliente, timeout %ss)", breaker.timeout)
             
             try:
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": "Você é um especialista em relacionamentos e reconquista. Seu objetivo é ajudar pessoas a melhorarem seus relacionamentos amorosos e a reconquistar ex-parceiros de maneira saudável. Forneça conselhos práticos, diretos e personalizados para as situações descritas pelo usuário."
-                        },
-                        {"role": "user", "content": user_message}
-                    ],
-                    max_tokens=500,
-                    temperature=0.7
-                )
-                print(f"Resposta recebida da API com sucesso (novo cliente)")
+                with breaker, observe_outbound('openai'):
+                    response = client.chat.completions.create(
+                        model="gpt-3.5-turbo",
+                        messages=build_messages(user_message, history),
+                        max_tokens=500,
+                        temperature=0.7
+                    )
                 
                 # Extrair o texto da resposta (formato diferente com o novo cliente)
                 assistant_response = response.choices[0].message.content
@@ -332,19 +314,20 @@ def get_openai_response(user_message):
                     "debug_info": "Resposta gerada com sucesso pela API OpenAI (novo cliente)"
                 }
             
+            except CircuitOpenError as open_error:
+                # Dependência sabidamente fora do ar: responder sem esperar o timeout
+                return {
+                    "success": False,
+                    "message": get_fallback_response(str(open_error)),
+                    "debug_info": f"Circuit open: {str(open_error)}"
+                }
+            
             except Exception as api_error:
-                import traceback
-                error_traceback = traceback.format_exc()
-                print(f"ERRO NA CHAMADA DA API (novo cliente): {str(api_error)}")
-                print(f"Traceback detalhado: {error_traceback}")
+                logger.exception("ERRO NA CHAMADA DA API (novo cliente): %s", api_error,
+                                 extra={'error_type': type(api_error).__name__})
                 
-                # Tentar identificar o tipo de erro
-                error_type = type(api_error).__name__
                 error_message = str(api_error)
                 
-                print(f"Tipo de erro: {error_type}")
-                print(f"Mensagem de erro: {error_message}")
-                
                 if "timeout" in error_message.lower():
                     return {
                         "success": False,
@@ -372,25 +355,20 @@ def get_openai_response(user_message):
         else:
             # Configurar API key para o cliente antigo
             openai.api_key = api_key
-            print(f"API OpenAI legada configurada")
-            
-            # Criar uma solicitação usando o cliente antigo
-            print(f"Enviando solicitação ao modelo gpt-3.5-turbo (cliente legado)")
+            if current_app.config.get('OPENAI_BASE_URL'):
+                openai.api_base = current_app.config['OPENAI_BASE_URL']
+            logger.debug("Enviando solicitação ao modelo gpt-3.5-turbo (cliente legado)")
             
             try:
-                response = openai.ChatCompletion.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {
-                            "role": "system", 
-                            "content": "Você é um especialista em relacionamentos e reconquista. Seu objetivo é ajudar pessoas a melhorarem seus relacionamentos amorosos e a reconquistar ex-parceiros de maneira saudável. Forneça conselhos práticos, diretos e personalizados para as situações descritas pelo usuário."
-                        },
-                        {"role": "user", "content": user_message}
-                    ],
-                    max_tokens=500,
-                    temperature=0.7
-                )
-                print(f"Resposta recebida da API com sucesso (cliente legado)")
+                breaker = get_breaker('openai')
+                with breaker, observe_outbound('openai'):
+                    response = openai.ChatCompletion.create(
+                        model="gpt-3.5-turbo",
+                        messages=build_messages(user_message, history),
+                        max_tokens=500,
+                        temperature=0.7,
+                        request_timeout=breaker.timeout
+                    )
                 
                 # Extrair o texto da resposta (formato do cliente antigo)
                 assistant_response = response.choices[0].message.content
@@ -402,10 +380,7 @@ def get_openai_response(user_message):
                 }
                 
             except Exception as api_error:
-                import traceback
-                error_traceback = traceback.format_exc()
-                print(f"ERRO NA CHAMADA DA API (cliente legado): {str(api_error)}")
-                print(f"Traceback detalhado: {error_traceback}")
+                logger.exception("ERRO NA CHAMADA DA API (cliente legado): %s", api_error)
                 
                 return {
                     "success": False,
@@ -414,10 +389,7 @@ def get_openai_response(user_message):
                 }
     
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"ERRO NA CONFIGURAÇÃO DO OPENAI: {str(e)}")
-        print(f"Detalhes do erro: {error_details}")
+        logger.exception("ERRO NA CONFIGURAÇÃO DO OPENAI: %s", e)
         return {
             "success": False,
             "message": get_fallback_response(str(e)),
@@ -428,30 +400,27 @@ def get_openai_response(user_message):
 def limpar_chat():
     """Limpa o histórico de chat da sessão atual"""
     try:
-        print("Limpando chat. Sessão antes:", dict(session))
+        # Remover o histórico de mensagens do banco de dados
+        if current_user.is_authenticated:
+            deleted = clear_history(current_user.id)
+            logger.debug("%s mensagens removidas do histórico", deleted)
         
-        # Remover o histórico de mensagens
+        # Histórico legado guardado na sessão
         if 'chat_messages' in session:
             session.pop('chat_messages')
-            print("Chat messages removido da sessão")
         
         # Também remover a thread atual
         if 'openai_thread_id' in session:
             session.pop('openai_thread_id')
-            print("Thread ID removido da sessão")
         
         # Forçar a persistência da sessão
         session.modified = True
-        print("Sessão após limpeza:", dict(session))
         
         # Resposta de sucesso
         response_data = {"success": True}
         
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"ERRO AO LIMPAR CHAT: {str(e)}")
-        print(f"Detalhes: {error_details}")
+        logger.exception("ERRO AO LIMPAR CHAT: %s", e)
         
         # Mensagem de erro
         response_data = {"success": False, "message": f"Erro ao limpar o histórico: {str(e)}"}
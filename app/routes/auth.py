@@ -11,15 +11,6 @@ import time
 from flask_wtf import CSRFProtect
 from flask_wtf.csrf import generate_csrf
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
-    handlers=[
-        logging.FileHandler("auth_debug.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger('auth_debug')
 
 # Blueprint de autenticação
@@ -31,16 +22,14 @@ csrf = CSRFProtect()
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     try:
-        logger.info("==== INICIANDO PROCESSO DE LOGIN ====")
-        
         if current_user.is_authenticated:
-            logger.info(f"Usuário já autenticado ({current_user.username}), redirecionando...")
+            logger.debug("Usuário já autenticado (%s), redirecionando", current_user.id)
             return redirect(url_for('main.index'))
         
         form = LoginForm()
         
         if form.validate_on_submit():
-            logger.info(f"Tentativa de login: {form.email.data}")
+            logger.debug("Tentativa de login: %s", form.email.data)
             
             # Adicionar tratamento de erro SSL aqui
             try:
@@ -48,14 +37,14 @@ def login():
                 
                 if user and user.check_password(form.password.data):
                     login_user(user, remember=form.remember_me.data)
-                    logger.info(f"Login bem-sucedido para: {user.email} (ID: {user.id})")
+                    logger.info("Login bem-sucedido", extra={'user_id': user.id})
                     
                     next_page = request.args.get('next')
                     if not next_page or urlparse(next_page).netloc != '':
                         next_page = url_for('main.index')
                     return redirect(next_page)
                 else:
-                    logger.warning(f"Falha de login para email: {form.email.data}")
+                    logger.warning("Falha de login para email: %s", form.email.data)
                     flash('Invalid email or password', 'danger')
             except Exception as e:
                 # Registrar o erro
@@ -117,8 +106,7 @@ def login():
         
         return render_template('auth/login.html', form=form)
     except Exception as e:
-        logger.error(f"Erro no login: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("Erro no login: %s", e)
         flash('An error occurred during login. Please try again.', 'danger')
         return redirect(url_for('auth.login'))
 
@@ -6,8 +6,6 @@ import os
 import secrets
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create a secret token for security
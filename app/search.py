@@ -0,0 +1,348 @@
+"""
+Busca textual nos posts com os índices nativos do banco
+
+- PostgreSQL: coluna gerada post.search_vector (tsvector, índice GIN), criada
+  pela migração e mantida pelo próprio banco em todo INSERT/UPDATE;
+- SQLite (fallback): tabela FTS5 post_fts, sincronizada pelos eventos do ORM
+  em toda criação, edição e exclusão de post;
+- sem nenhum dos dois: LIKE no título e no resumo, sem ranking.
+
+O texto é indexado em quatro partes: título, resumo, corpo público (conteúdo
+dos posts gratuitos ou o trecho dos premium) e corpo premium. Visitantes sem
+acesso premium só encontram e veem trechos das três primeiras: o corpo de um
+post premium nunca aparece num snippet para eles.
+
+Resultados ordenados por relevância, paginados por keyset (cursor
+"score:id") e guardados por SEARCH_CACHE_TTL segundos num cache por worker,
+limpo a cada escrita de post neste processo.
+"""
+import html
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import event, text
+
+from app.content import html_to_text
+
+logger = logging.getLogger(__name__)
+
+# Configuração de texto do PostgreSQL (a mesma da coluna gerada na migração)
+TEXT_SEARCH_CONFIG = 'english'
+
+# Marcadores dos trechos destacados: trocados por <mark> depois de escapar o texto
+MARK_START = '⟦'
+MARK_END = '⟧'
+
+MAX_QUERY_LENGTH = 200
+MAX_TERMS = 8
+
+SearchHit = namedtuple('SearchHit', 'post_id score snippet')
+
+FTS5_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5("
+    "title, summary, body_public, body_premium, tokenize='unicode61 remove_diacritics 2')"
+)
+
+_backends = {}  # URL do banco -> 'postgresql' | 'fts5' | 'like'
+_backends_lock = threading.Lock()
+
+
+class ResultCache:
+    """
+    Cache com TTL e limite de entradas (LRU) para as buscas mais repetidas.
+    Com max_bytes, o total de len(valor) também é limitado (valores bytes/str).
+    """
+
+    def __init__(self, ttl=60, max_entries=256, max_bytes=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _pop(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._bytes -= item[2]
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                self._pop(key)
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        size = len(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._items[key] = (time.monotonic() + self.ttl, value, size)
+            self._bytes += size
+            while len(self._items) > self.max_entries or \
+                    (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._pop(next(iter(self._items)))
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+result_cache = ResultCache()
+
+
+def normalize_query(query):
+    """Termos da busca: palavras em minúsculas, no máximo MAX_TERMS"""
+    return re.findall(r'\w+', (query or '')[:MAX_QUERY_LENGTH].lower())[:MAX_TERMS]
+
+
+def parse_cursor(cursor):
+    try:
+        score, post_id = (cursor or '').split(':', 1)
+        return float(score), int(post_id)
+    except ValueError:
+        return None
+
+
+def format_cursor(hit):
+    return f"{hit.score!r}:{hit.post_id}"
+
+
+def render_snippet(snippet):
+    """Texto do snippet escapado, com os termos encontrados em <mark>"""
+    escaped = html.escape(html.unescape(snippet or ''), quote=False)
+    return escaped.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def backend(connection):
+    """Mecanismo de busca disponível neste banco (verificado uma vez por processo)"""
+    key = str(connection.engine.url)
+    if key not in _backends:
+        with _backends_lock:
+            _backends[key] = _detect_backend(connection)
+            logger.info("Busca de posts: %s", _backends[key])
+    return _backends[key]
+
+
+def _detect_backend(connection):
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        found = connection.execute(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'post' AND column_name = 'search_vector'"
+        )).first()
+        if found:
+            return 'postgresql'
+        logger.warning("Coluna post.search_vector ausente (rode as migrações); busca com LIKE")
+    elif dialect == 'sqlite':
+        found = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'post_fts'"
+        )).first()
+        if found:
+            return 'fts5'
+        logger.warning("Tabela post_fts ausente (rode scripts/rebuild_search_index.py); busca com LIKE")
+    return 'like'
+
+
+def search_posts(connection, query, premium_access, cursor=None, limit=10):
+    """Uma página de resultados: ([SearchHit], cursor da próxima página ou None)"""
+    terms = normalize_query(query)
+    if not terms:
+        return [], None
+    position = parse_cursor(cursor)
+    key = (tuple(terms), bool(premium_access), position, limit)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
+
+    mode = backend(connection)
+    search = {'postgresql': _search_postgresql, 'fts5': _search_fts5}.get(mode, _search_like)
+    rows = search(connection, terms, premium_access, position, limit + 1)
+    hits = [SearchHit(row.id, float(row.score), render_snippet(row.snippet)) for row in rows[:limit]]
+    result = (hits, format_cursor(hits[-1]) if len(rows) > limit else None)
+    result_cache.set(key, result)
+    return result
+
+
+def _keyset(position, score_column, id_column):
+    if position is None:
+        return '', {}
+    condition = (f" AND ({score_column} < :cursor_score OR "
+                 f"({score_column} = :cursor_score AND {id_column} < :cursor_id))")
+    return condition, {'cursor_score': position[0], 'cursor_id': position[1]}
+
+
+def _search_postgresql(connection, terms, premium_access, position, limit):
+    # Sem acesso premium, posts premium só contam título, resumo e trecho (pesos A, B e C)
+    vector = ("p.search_vector" if premium_access else
+              "CASE WHEN p.premium_only THEN ts_filter(p.search_vector, '{a,b,c}') "
+              "ELSE p.search_vector END")
+    body = ("p.content" if premium_access else
+            "CASE WHEN p.premium_only THEN p.teaser_html ELSE p.content END")
+    keyset, params = _keyset(position, 'ranked.score', 'ranked.id')
+    # ts_rank_cd devolve real: sem o cast para float8 o score do cursor (double)
+    # não bate com o da linha e a comparação do keyset repete ou pula resultados
+    sql = f"""
+        SELECT page.id, page.score,
+               ts_headline('{TEXT_SEARCH_CONFIG}',
+                           regexp_replace(coalesce(page.summary, '') || ' ' || coalesce(page.body, ''),
+                                          '<[^>]*>', ' ', 'g'),
+                           page.query,
+                           'StartSel={MARK_START}, StopSel={MARK_END}, MaxFragments=2, '
+                           'MaxWords=30, MinWords=10, FragmentDelimiter=" … "') AS snippet
+        FROM (
+            SELECT ranked.* FROM (
+                SELECT p.id, p.summary, {body} AS body, q.query,
+                       ts_rank_cd({vector}, q.query)::float8 AS score
+                FROM post p,
+                     websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', :query) AS q(query)
+                WHERE p.search_vector @@ q.query AND {vector} @@ q.query
+            ) ranked
+            WHERE true{keyset}
+            ORDER BY ranked.score DESC, ranked.id DESC
+            LIMIT :limit
+        ) page
+        ORDER BY page.score DESC, page.id DESC
+    """
+    params.update(query=' '.join(terms), limit=limit)
+    return connection.execute(text(sql), params).fetchall()
+
+
+def _search_fts5(connection, terms, premium_access, position, limit):
+    match = ' '.join(f'"{term}"' for term in terms)
+    if not premium_access:
+        match = f"{{title summary body_public}} : ({match})"
+    keyset, params = _keyset(position, 'ranked.score', 'ranked.id')
+    sql = f"""
+        SELECT ranked.id, ranked.score, ranked.snippet FROM (
+            SELECT post_fts.rowid AS id,
+                   -bm25(post_fts, 10.0, 5.0, 2.0, 1.0) AS score,
+                   snippet(post_fts, -1, '{MARK_START}', '{MARK_END}', ' … ', 24) AS snippet
+            FROM post_fts
+            WHERE post_fts MATCH :match
+        ) ranked
+        WHERE 1 = 1{keyset}
+        ORDER BY ranked.score DESC, ranked.id DESC
+        LIMIT :limit
+    """
+    params.update(match=match, limit=limit)
+    return connection.execute(text(sql), params).fetchall()
+
+
+def _search_like(connection, terms, premium_access, position, limit):
+    conditions = []
+    params = {'limit': limit}
+    for index, term in enumerate(terms):
+        params[f"term{index}"] = f"%{term}%"
+        conditions.append(f"(lower(p.title) LIKE :term{index} OR lower(p.summary) LIKE :term{index})")
+    keyset, keyset_params = _keyset(position, '0.0', 'p.id')
+    params.update(keyset_params)
+    sql = f"""
+        SELECT p.id, 0.0 AS score, p.summary AS snippet
+        FROM post p
+        WHERE {' AND '.join(conditions)}{keyset}
+        ORDER BY p.id DESC
+        LIMIT :limit
+    """
+    return connection.execute(text(sql), params).fetchall()
+
+
+# --- Sincronização do índice FTS5 (SQLite) ---------------------------------
+
+def _index_rows(connection, post_id=None):
+    """Linhas do post_fts a partir da tabela post (HTML convertido em texto)"""
+    sql = "SELECT id, title, summary, content, teaser_html, premium_only FROM post"
+    params = {}
+    if post_id is not None:
+        sql += " WHERE id = :post_id"
+        params['post_id'] = post_id
+    for row in connection.execute(text(sql), params):
+        body = html_to_text(row.content)
+        yield {
+            'rowid': row.id,
+            'title': row.title or '',
+            'summary': row.summary or '',
+            'body_public': html_to_text(row.teaser_html) if row.premium_only else body,
+            'body_premium': body if row.premium_only else '',
+        }
+
+
+FTS5_INSERT = text(
+    "INSERT INTO post_fts(rowid, title, summary, body_public, body_premium) "
+    "VALUES (:rowid, :title, :summary, :body_public, :body_premium)"
+)
+
+
+def _sync_post(connection, post_id, deleted=False):
+    if connection.dialect.name != 'sqlite' or backend(connection) != 'fts5':
+        return
+    connection.execute(text("DELETE FROM post_fts WHERE rowid = :post_id"), {'post_id': post_id})
+    if not deleted:
+        for row in _index_rows(connection, post_id):
+            connection.execute(FTS5_INSERT, row)
+
+
+def rebuild_search_index(connection, batch_size=500):
+    """Recria o índice de busca do SQLite (ex.: depois de inserções em lote fora do ORM)"""
+    if connection.dialect.name != 'sqlite':
+        return 0  # No PostgreSQL a coluna gerada já reflete a tabela
+    connection.execute(text(FTS5_CREATE))
+    connection.execute(text("DELETE FROM post_fts"))
+    _backends.pop(str(connection.engine.url), None)
+    batch, total = [], 0
+    for row in _index_rows(connection):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            connection.execute(FTS5_INSERT, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        connection.execute(FTS5_INSERT, batch)
+        total += len(batch)
+    result_cache.clear()
+    return total
+
+
+def init_search(app):
+    """Configura o cache, cria o índice FTS5 no SQLite e o sincroniza nas escritas de post"""
+    from app import db
+    from app.models import Post
+
+    result_cache.ttl = app.config.get('SEARCH_CACHE_TTL', 60)
+    result_cache.max_entries = app.config.get('SEARCH_CACHE_SIZE', 256)
+    if not event.contains(Post, 'after_insert', _after_write):
+        event.listen(Post, 'after_insert', _after_write)
+        event.listen(Post, 'after_update', _after_write)
+        event.listen(Post, 'after_delete', _after_delete)
+
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            return
+        try:
+            with db.engine.begin() as connection:
+                if backend(connection) != 'fts5':
+                    total = rebuild_search_index(connection)
+                    logger.info("Índice FTS5 criado com %s posts", total)
+        except Exception as e:
+            # SQLite sem FTS5: a busca continua funcionando com LIKE
+            logger.warning("Índice de busca FTS5 indisponível: %s", e)
+
+
+def _after_write(mapper, connection, target):
+    _sync_post(connection, target.id)
+    result_cache.clear()
+
+
+def _after_delete(mapper, connection, target):
+    _sync_post(connection, target.id, deleted=True)
+    result_cache.clear()
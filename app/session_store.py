@@ -0,0 +1,308 @@
+"""
+Sessões do lado do servidor em SQL
+
+Substitui o backend 'filesystem' do Flask-Session (limitado a
+SESSION_FILE_THRESHOLD arquivos, com varredura de expiração no caminho da
+requisição e impossível de compartilhar entre máquinas). As sessões ficam
+numa tabela com expiração indexada, no banco principal ou num arquivo
+SQLite local (SESSION_SQL_URI). Assim, vários nós atrás de um load balancer
+funcionam sem sticky sessions. Uma thread por processo remove as sessões
+expiradas em segundo plano.
+
+Os dados são serializados em JSON com tags (o mesmo formato do cookie de
+sessão do Flask) e comprimidos com zlib quando passam de um limite.
+
+Uma sessão só é regravada quando o conteúdo serializado muda; sem mudanças,
+a renovação da expiração acontece no máximo uma vez a cada
+`refresh_interval` segundos, o que tira a escrita da maioria dos GETs.
+
+Respostas compartilhadas (feeds, sitemaps) marcam g.skip_session_save: a
+sessão não é gravada e a resposta sai sem Set-Cookie, já que um proxy ou
+CDN pode entregá-la a outros visitantes.
+"""
+import logging
+import os
+import secrets
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from flask import g
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer, want_bytes
+from sqlalchemy import Column, DateTime, LargeBinary, MetaData, String, Table, create_engine, delete, select, update
+from werkzeug.datastructures import CallbackDict
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+session_table = Table(
+    'server_session', metadata,
+    Column('session_id', String(128), primary_key=True),
+    Column('data', LargeBinary, nullable=False),
+    Column('expires_at', DateTime, nullable=False, index=True),
+)
+
+# Marcadores do primeiro byte do payload armazenado
+_RAW = b'j'
+_COMPRESSED = b'z'
+
+
+class SqlSession(CallbackDict, SessionMixin):
+    """Sessão cujo conteúdo vive no banco; o cookie guarda apenas o id"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.expires_at = None
+        self.loaded_payload = None  # Bytes lidos do banco, para detectar alterações
+
+
+class SessionSerializer:
+    """JSON com tags do Flask + zlib acima de `compress_threshold` bytes"""
+
+    def __init__(self, compress_threshold=512):
+        self.compress_threshold = compress_threshold
+        self._json = TaggedJSONSerializer()
+
+    def dumps(self, data):
+        raw = self._json.dumps(dict(data)).encode('utf-8')
+        if len(raw) > self.compress_threshold:
+            return _COMPRESSED + zlib.compress(raw, 6)
+        return _RAW + raw
+
+    def loads(self, payload):
+        payload = bytes(payload)
+        marker, body = payload[:1], payload[1:]
+        if marker == _COMPRESSED:
+            body = zlib.decompress(body)
+        return self._json.loads(body.decode('utf-8'))
+
+
+class SqlSessionInterface(SessionInterface):
+    """SessionInterface do Flask apoiada numa tabela SQL com expiração indexada"""
+
+    serializer = SessionSerializer()
+    session_class = SqlSession
+    # app.conditional só usa cache público se o backend respeitar g.skip_session_save
+    honours_skip_session_save = True
+
+    def __init__(self, engine_factory, key_prefix='', use_signer=True,
+                 sweep_interval=300, sweep_batch=1000, refresh_interval=3600):
+        self._engine_factory = engine_factory
+        self.refresh_interval = refresh_interval
+        self.key_prefix = key_prefix
+        self.use_signer = use_signer
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self._sweeper_pid = None
+        self._sweeper_lock = threading.Lock()
+
+    @property
+    def engine(self):
+        return self._engine_factory()
+
+    def create_table(self):
+        metadata.create_all(self.engine, tables=[session_table])
+
+    # --- Cookie -----------------------------------------------------------
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='flask-session', key_derivation='hmac')
+
+    def _sid_from_cookie(self, app, value):
+        if not value:
+            return None
+        if not self.use_signer:
+            return value
+        try:
+            return self._signer(app).unsign(want_bytes(value)).decode('utf-8')
+        except BadSignature:
+            return None
+
+    def _cookie_value(self, app, sid):
+        if not self.use_signer:
+            return sid
+        return self._signer(app).sign(want_bytes(sid)).decode('utf-8')
+
+    @staticmethod
+    def _new_sid():
+        return secrets.token_urlsafe(32)
+
+    # --- SessionInterface -------------------------------------------------
+
+    def open_session(self, app, request):
+        self._ensure_sweeper(app)
+        sid = self._sid_from_cookie(app, request.cookies.get(self.get_cookie_name(app)))
+        if not sid:
+            return self.session_class(sid=self._new_sid(), new=True)
+
+        row = None
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(
+                    select(session_table.c.data, session_table.c.expires_at)
+                    .where(session_table.c.session_id == self.key_prefix + sid)
+                ).first()
+        except Exception as e:
+            logger.error(f"Erro ao carregar sessão: {str(e)}")
+
+        if row is None or row.expires_at <= datetime.utcnow():
+            return self.session_class(sid=self._new_sid(), new=True)
+        try:
+            data = self.serializer.loads(row.data)
+        except Exception:
+            return self.session_class(sid=self._new_sid(), new=True)
+        session = self.session_class(data, sid=sid)
+        session.expires_at = row.expires_at
+        session.loaded_payload = bytes(row.data)
+        return session
+
+    def save_session(self, app, session, response):
+        if g.get('skip_session_save'):
+            return
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        name = self.get_cookie_name(app)
+        key = self.key_prefix + session.sid
+
+        if not session:
+            # Sessão esvaziada (ex.: logout): remover do banco e o cookie
+            if session.modified and not session.new:
+                self._delete(key)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        # Equivalente ao SESSION_PERMANENT do Flask-Session, aplicado só a sessões com dados
+        if app.config.get('SESSION_PERMANENT', True) and not session.permanent:
+            session.permanent = True
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        payload = self.serializer.dumps(session)
+        if payload == session.loaded_payload and not self._refresh_due(app, session):
+            # Conteúdo idêntico ao do banco e expiração renovada recentemente:
+            # nem o registro nem o cookie precisam ser regravados
+            return
+
+        expires_at = self.get_expiration_time(app, session) or \
+            datetime.utcnow() + app.permanent_session_lifetime
+        self._store(key, payload, expires_at.replace(tzinfo=None))
+
+        response.set_cookie(
+            name,
+            self._cookie_value(app, session.sid),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+    def _refresh_due(self, app, session):
+        """True se a última renovação da expiração foi há mais de `refresh_interval` segundos"""
+        if session.expires_at is None:
+            return True
+        last_refresh = session.expires_at - app.permanent_session_lifetime
+        return (datetime.utcnow() - last_refresh).total_seconds() >= self.refresh_interval
+
+    # --- Persistência -----------------------------------------------------
+
+    def _store(self, key, payload, expires_at):
+        engine = self.engine
+        values = {'data': payload, 'expires_at': expires_at}
+        with engine.begin() as conn:
+            if engine.dialect.name in ('postgresql', 'sqlite'):
+                if engine.dialect.name == 'postgresql':
+                    from sqlalchemy.dialects.postgresql import insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert
+                stmt = insert(session_table).values(session_id=key, **values)
+                conn.execute(stmt.on_conflict_do_update(
+                    index_elements=[session_table.c.session_id], set_=values
+                ))
+                return
+            result = conn.execute(
+                update(session_table).where(session_table.c.session_id == key).values(**values)
+            )
+            if result.rowcount == 0:
+                conn.execute(session_table.insert().values(session_id=key, **values))
+
+    def _delete(self, key):
+        with self.engine.begin() as conn:
+            conn.execute(delete(session_table).where(session_table.c.session_id == key))
+
+    # --- Limpeza em segundo plano -----------------------------------------
+
+    def sweep_expired(self):
+        """Remove sessões expiradas em lotes pequenos (usa o índice de expires_at)"""
+        removed = 0
+        now = datetime.utcnow()
+        while True:
+            with self.engine.begin() as conn:
+                expired = select(session_table.c.session_id).where(
+                    session_table.c.expires_at < now
+                ).limit(self.sweep_batch)
+                result = conn.execute(
+                    delete(session_table).where(session_table.c.session_id.in_(expired.scalar_subquery()))
+                )
+            removed += result.rowcount or 0
+            if not result.rowcount or result.rowcount < self.sweep_batch:
+                return removed
+
+    def _ensure_sweeper(self, app):
+        """Inicia a thread de limpeza uma vez por processo (inclusive após o fork do gunicorn)"""
+        if self.sweep_interval <= 0 or self._sweeper_pid == os.getpid():
+            return
+        with self._sweeper_lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+            thread = threading.Thread(target=self._sweep_loop, args=(app,),
+                                      name='session-sweeper', daemon=True)
+            thread.start()
+
+    def _sweep_loop(self, app):
+        while True:
+            # Espalhar as varreduras dos vários workers ao longo do intervalo
+            time.sleep(self.sweep_interval * (0.5 + secrets.randbelow(1000) / 1000))
+            try:
+                with app.app_context():
+                    removed = self.sweep_expired()
+                if removed:
+                    logger.info(f"{removed} sessões expiradas removidas")
+            except Exception as e:
+                logger.error(f"Erro ao remover sessões expiradas: {str(e)}")
+
+
+def init_sql_sessions(app, db):
+    """Instala a interface de sessão SQL na aplicação e cria a tabela se necessário"""
+    session_uri = app.config.get('SESSION_SQL_URI')
+    if session_uri:
+        # Banco dedicado (ex.: arquivo SQLite local); engine própria e reutilizada
+        engine = create_engine(session_uri, pool_pre_ping=True)
+        engine_factory = lambda: engine
+    else:
+        # Banco principal da aplicação (db.engine exige contexto de aplicação)
+        engine_factory = lambda: db.engine
+
+    interface = SqlSessionInterface(
+        engine_factory,
+        key_prefix=app.config.get('SESSION_KEY_PREFIX', ''),
+        use_signer=app.config.get('SESSION_USE_SIGNER', True),
+        sweep_interval=app.config.get('SESSION_SWEEP_INTERVAL', 300),
+        refresh_interval=app.config.get('SESSION_REFRESH_INTERVAL', 3600),
+    )
+    with app.app_context():
+        interface.create_table()
+    app.session_interface = interface
+    return interface
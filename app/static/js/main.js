@@ -13,6 +13,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // Hide flash messages after 3 seconds
     setupFlashMessages();
 
+    // Fill CSRF tokens of cached pages on demand
+    setupLazyCsrf();
+
     // Apply color palette to specific elements
     
     // 1. Convert all warning badges to primary style
@@ -132,6 +135,42 @@ function setupFlashMessages() {
     });
 }
 
+// Fetch a CSRF token from /csrf-token only when needed (pages may be served from cache)
+let csrfTokenPromise = null;
+
+function getCsrfToken() {
+    if (!csrfTokenPromise) {
+        csrfTokenPromise = fetch('/csrf-token', { credentials: 'same-origin' })
+            .then(response => response.json())
+            .then(data => data.csrf_token)
+            .catch(error => {
+                csrfTokenPromise = null;
+                throw error;
+            });
+    }
+    return csrfTokenPromise;
+}
+
+// Forms with <input name="csrf_token" data-csrf-lazy> get their token on first interaction
+function setupLazyCsrf() {
+    document.querySelectorAll('form').forEach(form => {
+        const input = form.querySelector('input[name="csrf_token"][data-csrf-lazy]');
+        if (!input) {
+            return;
+        }
+        const fill = () => getCsrfToken().then(token => { input.value = token; });
+        form.addEventListener('focusin', fill, { once: true });
+        // Capture: runs before the form's own submit handlers (e.g. AJAX), which see the token on resubmit
+        form.addEventListener('submit', function(e) {
+            if (!input.value) {
+                e.preventDefault();
+                e.stopImmediatePropagation();
+                fill().then(() => form.requestSubmit ? form.requestSubmit() : form.submit());
+            }
+        }, true);
+    });
+}
+
 // Configuração global para AJAX - CSRF desabilitado
 $(document).ready(function() {
     // CSRF token removido para resolver problemas de compatibilidade
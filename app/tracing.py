@@ -0,0 +1,264 @@
+"""
+Rastreamento leve por requisição (spans)
+
+Cada requisição recebe um request ID (o X-Request-ID recebido ou um novo) e
+acumula spans de SQL, renderização de templates e chamadas HTTP externas
+(OpenAI, webhook). Ao final:
+
+- admins recebem um cabeçalho Server-Timing com o tempo por categoria, que
+  aparece na aba Network/Timing do navegador;
+- se TRACE_EXPORT estiver definido, o trace é enviado em segundo plano para
+  um arquivo JSON lines ('file', em TRACE_FILE) ou para um coletor OTLP/HTTP
+  ('otlp', em TRACE_OTLP_ENDPOINT, ex.: http://localhost:4318/v1/traces).
+
+Sem requisição ativa (scripts, inicialização) os spans são ignorados.
+"""
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from flask_login import current_user
+from jinja2 import Template
+
+logger = logging.getLogger(__name__)
+
+# Limite de spans guardados por requisição (páginas com N+1 não estouram a memória)
+MAX_SPANS = 500
+
+# Categorias do Server-Timing, na ordem em que aparecem no cabeçalho
+SERVER_TIMING_CATEGORIES = (('sql', 'SQL'), ('template', 'Templates'), ('http', 'HTTP externo'))
+
+
+class Trace:
+    """Spans de uma requisição; o span raiz é a própria requisição"""
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.trace_id = secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.start_time = time.time()
+        self.started = time.perf_counter()
+        self.spans = []
+        self.dropped = 0
+        self.totals = {}
+
+    def add(self, name, category, started, duration, attributes=None):
+        count, total = self.totals.get(category, (0, 0.0))
+        self.totals[category] = (count + 1, total + duration)
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append({
+            'name': name,
+            'category': category,
+            'start': self.start_time + (started - self.started),
+            'duration': duration,
+            'attributes': attributes or {},
+        })
+
+
+def current_trace():
+    if not has_request_context():
+        return None
+    return g.get('trace')
+
+
+def record_span(name, category, started, attributes=None):
+    """Registra um span já concluído que começou em `started` (time.perf_counter())"""
+    trace = current_trace()
+    if trace is not None:
+        trace.add(name, category, started, time.perf_counter() - started, attributes)
+
+
+@contextmanager
+def span(name, category, **attributes):
+    """with span('openai', 'http'): ..."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        attributes['error'] = type(e).__name__
+        raise
+    finally:
+        record_span(name, category, started, attributes)
+
+
+class TracedTemplate(Template):
+    """Template do Jinja que registra a renderização como span"""
+
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            record_span(self.name or '<string>', 'template', started)
+
+
+def _sends_server_timing():
+    """
+    Só admins recebem Server-Timing. Arquivos estáticos e requisições sem
+    cookie de sessão (ou de "lembrar-me") nem consultam o usuário: ler
+    current_user carregaria a sessão e o usuário e acrescentaria Vary: Cookie.
+    """
+    if request.endpoint == 'static' or g.get('skip_session_save'):
+        return False  # Respostas compartilhadas podem ir para o cache de um proxy
+    cookies = (current_app.session_cookie_name, current_app.config.get('REMEMBER_COOKIE_NAME', 'remember_token'))
+    if not any(name in request.cookies for name in cookies):
+        return False
+    return current_user.is_authenticated and current_user.is_admin
+
+
+def server_timing_header(trace, total):
+    parts = []
+    for category, description in SERVER_TIMING_CATEGORIES:
+        count, duration = trace.totals.get(category, (0, 0.0))
+        if count:
+            parts.append(f'{category};dur={duration * 1000:.1f};desc="{description} ({count})"')
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+# --- Exportação -----------------------------------------------------------
+
+class TraceExporter:
+    """Envia traces em segundo plano; a requisição só enfileira"""
+
+    def __init__(self, mode, path=None, endpoint=None, service_name='blog'):
+        self.mode = mode
+        self.path = path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._queue = queue.SimpleQueue()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, record):
+        self._ensure_worker()
+        self._queue.put(record)
+
+    def _ensure_worker(self):
+        # Uma thread por processo (a do master não sobrevive ao fork do gunicorn)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.SimpleQueue()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='trace-exporter', daemon=True).start()
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            try:
+                if self.mode == 'otlp':
+                    self._send_otlp(record)
+                else:
+                    self._write_file(record)
+            except Exception as e:
+                logger.warning("Falha ao exportar trace %s: %s", record['request_id'], e)
+
+    def _write_file(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, default=str, ensure_ascii=False) + '\n')
+
+    def _send_otlp(self, record):
+        import requests
+        requests.post(self.endpoint, json=self.to_otlp(record), timeout=5)
+
+    def to_otlp(self, record):
+        """Converte o trace para o formato OTLP/JSON (resourceSpans)"""
+        def attributes(values):
+            return [{'key': key, 'value': {'stringValue': str(value)}} for key, value in values.items()]
+
+        def nanos(seconds):
+            return str(int(seconds * 1e9))
+
+        root = {
+            'traceId': record['trace_id'],
+            'spanId': record['span_id'],
+            'name': record['name'],
+            'kind': 2,  # SERVER
+            'startTimeUnixNano': nanos(record['start']),
+            'endTimeUnixNano': nanos(record['start'] + record['duration']),
+            'attributes': attributes(record['attributes']),
+        }
+        children = [{
+            'traceId': record['trace_id'],
+            'spanId': secrets.token_hex(8),
+            'parentSpanId': record['span_id'],
+            'name': child['name'],
+            'kind': 3 if child['category'] == 'http' else 1,  # CLIENT / INTERNAL
+            'startTimeUnixNano': nanos(child['start']),
+            'endTimeUnixNano': nanos(child['start'] + child['duration']),
+            'attributes': attributes(dict(child['attributes'], category=child['category'])),
+        } for child in record['spans']]
+        return {'resourceSpans': [{
+            'resource': {'attributes': attributes({'service.name': self.service_name})},
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': [root] + children}],
+        }]}
+
+
+def _export_record(trace, total, response):
+    return {
+        'request_id': trace.request_id,
+        'trace_id': trace.trace_id,
+        'span_id': trace.span_id,
+        'name': request.url_rule.endpoint if request.url_rule is not None else 'unmatched',
+        'start': trace.start_time,
+        'duration': total,
+        'attributes': {
+            'http.method': request.method,
+            'http.target': request.path,
+            'http.status_code': response.status_code,
+            'request_id': trace.request_id,
+            'dropped_spans': trace.dropped,
+        },
+        'spans': trace.spans,
+    }
+
+
+def init_tracing(app):
+    """Registra os hooks de rastreamento na aplicação"""
+    if not app.config.get('TRACING_ENABLED', True):
+        return
+
+    exporter = None
+    mode = (app.config.get('TRACE_EXPORT') or '').lower()
+    if mode == 'file':
+        exporter = TraceExporter('file', path=app.config.get('TRACE_FILE') or
+                                 os.path.join(app.instance_path, 'traces.jsonl'))
+    elif mode == 'otlp' and app.config.get('TRACE_OTLP_ENDPOINT'):
+        exporter = TraceExporter('otlp', endpoint=app.config['TRACE_OTLP_ENDPOINT'],
+                                 service_name=app.config.get('TRACE_SERVICE_NAME', 'blog'))
+    elif mode:
+        logger.warning("TRACE_EXPORT=%s inválido ou sem destino; traces não serão exportados", mode)
+
+    app.jinja_env.template_class = TracedTemplate
+
+    @app.before_request
+    def start_trace():
+        # O ID recebido de um proxy é reaproveitado, mas com tamanho limitado
+        request_id = (request.headers.get('X-Request-ID') or '')[:64] or secrets.token_hex(8)
+        g.trace = Trace(request_id)
+
+    @app.after_request
+    def finish_trace(response):
+        trace = g.pop('trace', None)
+        if trace is None:
+            return response
+        total = time.perf_counter() - trace.started
+        response.headers['X-Request-ID'] = trace.request_id
+        if _sends_server_timing():
+            response.headers['Server-Timing'] = server_timing_header(trace, total)
+        if exporter is not None:
+            exporter.submit(_export_record(trace, total, response))
+        return response
+
+    logger.info("Rastreamento ativo (exportação: %s)", mode or 'desativada')
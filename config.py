@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from datetime import timedelta
+from worker_presets import engine_options
 
 # Carrega variáveis de ambiente do arquivo .env, se existir
 load_dotenv()
@@ -92,11 +93,92 @@ class Config:
             SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(INSTANCE_PATH, 'blog.db')
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pool de conexões dimensionado junto com o preset de workers (ver worker_presets.py)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options() if SQLALCHEMY_DATABASE_URI.startswith('postgresql') else {}
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
+    # Requisições GET/HEAD sem escrita: 'enforce' (READ ONLY + aviso), 'warn', 'raise' ou 'off'
+    READ_ONLY_GUARD = os.environ.get('READ_ONLY_GUARD', 'enforce').lower()
+    
+    # Backend das sessões: 'sql' (tabela no banco, compartilhável entre nós) ou 'filesystem'
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sql').lower()
+    # Banco dedicado às sessões (ex.: sqlite:////caminho/sessions.db); vazio = banco principal
+    SESSION_SQL_URI = os.environ.get('SESSION_SQL_URI') or None
+    SESSION_SWEEP_INTERVAL = int(os.environ.get('SESSION_SWEEP_INTERVAL') or 300)
+    # Intervalo mínimo (segundos) entre renovações da expiração de uma sessão sem alterações
+    SESSION_REFRESH_INTERVAL = int(os.environ.get('SESSION_REFRESH_INTERVAL') or 3600)
     
     # Configurações da API OpenAI
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
     OPENAI_ASSISTANT_ID = os.environ.get('OPENAI_ASSISTANT_ID')
+    # Endpoint alternativo compatível com a API (ex.: scripts/openai_stub.py em http://127.0.0.1:8089/v1)
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL') or None
+    
+    # Orçamento de tempo por dependência externa e parâmetros do circuit breaker
+    OPENAI_TIMEOUT = float(os.environ.get('OPENAI_TIMEOUT') or 20)
+    WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT') or 5)
+    CIRCUIT_BREAKER_FAILURE_RATE = float(os.environ.get('CIRCUIT_BREAKER_FAILURE_RATE') or 0.5)
+    CIRCUIT_BREAKER_WINDOW = int(os.environ.get('CIRCUIT_BREAKER_WINDOW') or 20)
+    CIRCUIT_BREAKER_MIN_CALLS = int(os.environ.get('CIRCUIT_BREAKER_MIN_CALLS') or 5)
+    CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.environ.get('CIRCUIT_BREAKER_RESET_TIMEOUT') or 30)
+    
+    # Histórico da IA: mensagens por página e orçamento de tokens do contexto enviado ao modelo
+    CHAT_HISTORY_PAGE_SIZE = int(os.environ.get('CHAT_HISTORY_PAGE_SIZE') or 20)
+    CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get('CHAT_CONTEXT_TOKEN_BUDGET') or 1500)
+    
+    # Cobrança de créditos de IA por mensagem (admins nunca são cobrados)
+    AI_CREDITS_ENABLED = os.environ.get('AI_CREDITS_ENABLED', 'False').lower() == 'true'
+    
+    # Métricas Prometheus em /metrics (acesso de admin ou "Authorization: Bearer <METRICS_TOKEN>")
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+    
+    # Rastreamento por requisição: TRACE_EXPORT = '' (desativado), 'file' ou 'otlp'
+    TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'True').lower() == 'true'
+    TRACE_EXPORT = os.environ.get('TRACE_EXPORT', '')
+    TRACE_FILE = os.environ.get('TRACE_FILE') or None  # Padrão: instance/traces.jsonl
+    TRACE_OTLP_ENDPOINT = os.environ.get('TRACE_OTLP_ENDPOINT') or None
+    TRACE_SERVICE_NAME = os.environ.get('TRACE_SERVICE_NAME', 'blog')
+    
+    # Profiler: diretório dos perfis, amostragem de 1 a cada N requisições (0 = desativada)
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or None  # Padrão: instance/profiles
+    PROFILE_SAMPLE_EVERY = int(os.environ.get('PROFILE_SAMPLE_EVERY') or 0)
+    PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL') or 0.005)
+    PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP') or 50)
+    
+    # Compressão das respostas dinâmicas (brotli se instalado, senão gzip)
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'True').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 500)
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL') or 6)  # gzip: 1-9
+    COMPRESS_BR_LEVEL = int(os.environ.get('COMPRESS_BR_LEVEL') or 4)  # brotli: 0-11
+    COMPRESS_CACHE_SIZE = int(os.environ.get('COMPRESS_CACHE_SIZE') or 128)  # 0 = sem LRU
+    COMPRESS_MIMETYPES = [t.strip() for t in os.environ.get('COMPRESS_MIMETYPES', '').split(',') if t.strip()]
+    
+    # Usar os pacotes gerados por scripts/build_assets.py (app/static/dist) quando existirem
+    ASSET_BUNDLES = os.environ.get('ASSET_BUNDLES', 'True').lower() == 'true'
+    
+    # Busca de posts: resultados por página e cache por worker (segundos; 0 = sem cache)
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE') or 10)
+    SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL') or 60)
+    SEARCH_CACHE_SIZE = int(os.environ.get('SEARCH_CACHE_SIZE') or 256)
+    
+    # Posts relacionados exibidos no fim de cada post (pré-calculados, ver scripts/related_posts.py)
+    RELATED_POSTS_COUNT = int(os.environ.get('RELATED_POSTS_COUNT') or 4)
+    
+    # Visualizações dos posts: contadas em memória e gravadas em lote a cada VIEW_FLUSH_INTERVAL segundos
+    VIEW_COUNTER_ENABLED = os.environ.get('VIEW_COUNTER_ENABLED', 'True').lower() == 'true'
+    VIEW_FLUSH_INTERVAL = int(os.environ.get('VIEW_FLUSH_INTERVAL') or 30)
+    # Ranking "Most Read": janela, meia-vida do peso das visualizações e frequência de recálculo
+    POPULAR_WINDOW_DAYS = int(os.environ.get('POPULAR_WINDOW_DAYS') or 30)
+    POPULAR_HALF_LIFE_DAYS = float(os.environ.get('POPULAR_HALF_LIFE_DAYS') or 7)
+    POPULAR_REFRESH_INTERVAL = int(os.environ.get('POPULAR_REFRESH_INTERVAL') or 300)
+    POPULAR_CACHE_TTL = int(os.environ.get('POPULAR_CACHE_TTL') or 60)
+    POPULAR_POSTS_COUNT = int(os.environ.get('POPULAR_POSTS_COUNT') or 5)
+    
+    # Feed RSS e sitemaps: itens do feed, URLs por sitemap (máximo 50 mil) e cache por worker (total em bytes)
+    FEED_ITEMS = int(os.environ.get('FEED_ITEMS') or 30)
+    SITEMAP_MAX_URLS = int(os.environ.get('SITEMAP_MAX_URLS') or 50000)
+    FEED_CACHE_TTL = int(os.environ.get('FEED_CACHE_TTL') or 3600)
+    FEED_CACHE_MAX_BYTES = int(os.environ.get('FEED_CACHE_MAX_BYTES') or 4 * 1024 * 1024)
     
     # Configurações de Email (para implementação futura)
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
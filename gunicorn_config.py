@@ -1,8 +1,26 @@
-import multiprocessing
+import importlib.util
+import os
+import shutil
+import tempfile
+from worker_presets import get_preset, max_db_connections
+
+# Métricas agregadas entre workers: o diretório precisa existir (e estar limpo)
+# antes de a aplicação e o prometheus_client serem importados pelo preload_app
+if importlib.util.find_spec('prometheus_client') is not None:
+    metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                                        os.path.join(tempfile.gettempdir(), 'blog-prometheus'))
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+# Preset de workers selecionado por GUNICORN_PRESET (sync, gthread ou gevent)
+preset = get_preset()
 
 # Configurações de ligação do Gunicorn
-bind = "0.0.0.0:8000"
-workers = multiprocessing.cpu_count() * 2 + 1
+bind = os.environ.get('BIND', "0.0.0.0:8000")
+workers = preset['workers']
+worker_class = preset['worker_class']
+threads = preset['threads']
+worker_connections = preset['worker_connections']
 
 # Configurações de logging para reduzir verbosidade
 accesslog = None  # Desativa o log de acesso
@@ -10,12 +28,32 @@ errorlog = "-"    # Envia erros para stderr
 loglevel = "warning"  # Apenas warnings e erros
 
 # Timeout
-timeout = 300
+timeout = preset['timeout']
 
 # Modo silencioso
 capture_output = True  # Captura stdout/stderr
-worker_class = "sync"  # Classe de worker padrão
-preload_app = True     # Pré-carrega a aplicação
+preload_app = preset['preload_app']  # Pré-carrega a aplicação (exceto gevent)
 
 # Outras configurações
-graceful_timeout = 30  # Timeout para shutdown suave 
+graceful_timeout = 30  # Timeout para shutdown suave
+
+def when_ready(server):
+    server.log.warning(
+        "Preset %s: %s workers x %s threads (%s conexões/worker), timeout %ss, até %s conexões no banco",
+        preset['name'], workers, threads, worker_connections, timeout, max_db_connections(preset)
+    )
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # psycopg2 não é cooperativo por padrão; sem o patch uma query bloqueia o worker inteiro
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            server.log.warning("psycogreen não instalado: queries PostgreSQL bloquearão o worker gevent")
+
+def child_exit(server, worker):
+    # Remove os gauges "live" do worker que saiu
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
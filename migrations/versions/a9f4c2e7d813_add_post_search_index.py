@@ -0,0 +1,45 @@
+"""Add full-text search index to post
+
+Revision ID: a9f4c2e7d813
+Revises: e7a3c9d05b18
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9f4c2e7d813'
+down_revision = 'e7a3c9d05b18'
+branch_labels = None
+depends_on = None
+
+
+# Pesos: A título, B resumo, C corpo público (trecho dos premium), D corpo premium.
+# Sem acesso premium, a busca usa ts_filter(search_vector, '{a,b,c}') nos posts premium.
+SEARCH_VECTOR = """
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(summary, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(
+        CASE WHEN premium_only THEN teaser_html ELSE content END, '')), 'C') ||
+    setweight(to_tsvector('english', coalesce(
+        CASE WHEN premium_only THEN content ELSE NULL END, '')), 'D')
+"""
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite: a tabela FTS5 post_fts é criada e populada pela aplicação
+        # (app/search.init_search ou scripts/rebuild_search_index.py)
+        return
+    # Coluna gerada: o próprio banco a mantém em todo INSERT/UPDATE
+    op.execute(f"ALTER TABLE post ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED")
+    op.execute("CREATE INDEX ix_post_search_vector ON post USING gin (search_vector)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        op.execute("DROP TABLE IF EXISTS post_fts")
+        return
+    op.execute("DROP INDEX IF EXISTS ix_post_search_vector")
+    op.execute("ALTER TABLE post DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,38 @@
+"""Add related_posts table
+
+Revision ID: b2d6e8f1c4a9
+Revises: a9f4c2e7d813
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d6e8f1c4a9'
+down_revision = 'a9f4c2e7d813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Populada por `python scripts/related_posts.py`; até lá a página do post mostra os mais recentes
+    op.create_table('related_posts',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('related_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['related_id'], ['post.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('post_id', 'rank')
+    )
+    with op.batch_alter_table('related_posts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_related_posts_related_id'), ['related_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('related_posts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_related_posts_related_id'))
+
+    op.drop_table('related_posts')
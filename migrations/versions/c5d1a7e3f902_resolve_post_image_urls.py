@@ -0,0 +1,48 @@
+"""Resolve post image URLs at save time
+
+Revision ID: c5d1a7e3f902
+Revises: 8e41d2c7a9f3
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d1a7e3f902'
+down_revision = '8e41d2c7a9f3'
+branch_labels = None
+depends_on = None
+
+PLACEHOLDER_IMAGE_URL = 'https://via.placeholder.com/1200x400'
+POST_4_IMAGE_URL = 'https://img.freepik.com/free-photo/side-view-couple-holding-each-other_23-2148735555.jpg?t=st=1742409398~exp=1742412998~hmac=59e342a62de1c61aedc5a53c00356ab4406ded130e98eca884480d2d68360910&w=900'
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'app'))
+
+post = sa.table('post', sa.column('id', sa.Integer), sa.column('image_url', sa.String))
+
+
+def upgrade():
+    # Correções que a view main.post aplicava (e gravava) a cada visualização
+    op.execute(post.update().where(post.c.id == 4).values(image_url=POST_4_IMAGE_URL))
+    op.execute(
+        post.update()
+        .where(sa.or_(post.c.image_url.is_(None), sa.func.trim(post.c.image_url) == ''))
+        .values(image_url=PLACEHOLDER_IMAGE_URL)
+    )
+
+    connection = op.get_bind()
+    local_images = connection.execute(
+        sa.select(post.c.id, post.c.image_url).where(post.c.image_url.like('/static/%'))
+    ).fetchall()
+    missing = [row.id for row in local_images
+               if not os.path.exists(os.path.join(APP_DIR, row.image_url.lstrip('/')))]
+    if missing:
+        op.execute(post.update().where(post.c.id.in_(missing)).values(image_url=PLACEHOLDER_IMAGE_URL))
+
+
+def downgrade():
+    # Correção de dados: não há o que desfazer
+    pass
@@ -0,0 +1,46 @@
+"""Add post_view_counts and popular_posts tables
+
+Revision ID: c8e1f5a2b7d4
+Revises: b2d6e8f1c4a9
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e1f5a2b7d4'
+down_revision = 'b2d6e8f1c4a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('post_view_counts',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('views', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('post_id', 'day')
+    )
+    with op.batch_alter_table('post_view_counts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_post_view_counts_day'), ['day'], unique=False)
+
+    op.create_table('popular_posts',
+        sa.Column('rank', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('rank')
+    )
+
+
+def downgrade():
+    op.drop_table('popular_posts')
+
+    with op.batch_alter_table('post_view_counts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_post_view_counts_day'))
+
+    op.drop_table('post_view_counts')
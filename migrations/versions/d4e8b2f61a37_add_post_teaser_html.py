@@ -0,0 +1,49 @@
+"""Add teaser_html and word_count to post
+
+Revision ID: d4e8b2f61a37
+Revises: c5d1a7e3f902
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e8b2f61a37'
+down_revision = 'c5d1a7e3f902'
+branch_labels = None
+depends_on = None
+
+post = sa.table('post', sa.column('id', sa.Integer), sa.column('content', sa.Text),
+                sa.column('teaser_html', sa.Text), sa.column('word_count', sa.Integer))
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('teaser_html', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('word_count', sa.Integer(), nullable=True))
+
+    # Preencher os posts existentes com o mesmo código usado ao salvar
+    from app.content import count_words, make_teaser
+
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(post.c.id, post.c.content).where(post.c.id > last_id).order_by(post.c.id).limit(500)
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            connection.execute(
+                post.update().where(post.c.id == row.id)
+                .values(teaser_html=make_teaser(row.content), word_count=count_words(row.content))
+            )
+        last_id = rows[-1].id
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('word_count')
+        batch_op.drop_column('teaser_html')
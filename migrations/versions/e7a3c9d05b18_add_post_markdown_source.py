@@ -0,0 +1,32 @@
+"""Add Markdown source and rendered metadata to post
+
+Revision ID: e7a3c9d05b18
+Revises: d4e8b2f61a37
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3c9d05b18'
+down_revision = 'd4e8b2f61a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Posts existentes continuam com o HTML em content (content_markdown NULL)
+    # até a próxima edição ou `python scripts/render_posts.py --adopt-html`
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_markdown', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('headings', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('render_version', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('render_version')
+        batch_op.drop_column('headings')
+        batch_op.drop_column('content_markdown')
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Benchmark HTTP da aplicação com um conjunto de dados semeado e escalável
+
+1) Semear um banco dedicado (SQLite local ou um PostgreSQL local):
+
+    python scripts/benchmark.py seed --posts 100000 --comments 1000000 --users 50000
+
+2) Rodar os cenários contra a aplicação WSGI real (create_app + test_client),
+   salvando uma linha de base ou comparando com ela:
+
+    python scripts/benchmark.py run --save-baseline instance/benchmark_baseline.json
+    python scripts/benchmark.py run --compare instance/benchmark_baseline.json
+
+Para cada cenário (/, /posts com cada filtro e ordenação, /post/<id>,
+páginas do admin e login) são reportados vazão, latência p50/p95/p99 e
+consultas SQL por requisição.
+
+O banco padrão é instance/benchmark.db (--database-url para outro). O seed
+apaga e recria todas as tabelas desse banco; por segurança ele se recusa a
+rodar contra o pooler do Supabase.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+# Logs da aplicação só atrapalham a medição
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+DEFAULT_DATABASE_URL = 'sqlite:///' + os.path.join(ROOT_DIR, 'instance', 'benchmark.db')
+BENCH_PASSWORD = 'bench123'
+# Domínio aceito pelo email-validator (".local" é de uso especial e reprovado no LoginForm)
+BENCH_DOMAIN = 'bench.example.com'
+ADMIN_EMAIL = f'bench-admin@{BENCH_DOMAIN}'
+AUTHOR_COUNT = 20  # Os primeiros usuários são admins e autores dos posts
+
+WORDS = (
+    "relacionamento reconquista confiança comunicação espaço tempo carinho respeito "
+    "conversa mensagem encontro distância saudade atenção diálogo paciência escuta "
+    "sentimento emoção rotina limite gesto presença atitude futuro passado mudança"
+).split()
+
+
+def percentile(values, pct):
+    """Percentil por nearest-rank sobre uma lista já ordenada"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def create_benchmark_app(database_url):
+    """create_app() apontando para o banco do benchmark"""
+    from config import Config
+    from worker_presets import engine_options
+
+    Config.SQLALCHEMY_DATABASE_URI = database_url
+    Config.SQLALCHEMY_ENGINE_OPTIONS = engine_options() if database_url.startswith('postgresql') else {}
+    # Sem contador de visualizações: a thread de gravação e o flush do atexit
+    # somariam escritas às medições (e o banco temporário já não existe no exit)
+    Config.VIEW_COUNTER_ENABLED = False
+    from app import create_app
+    return create_app()
+
+
+# --- Seed -----------------------------------------------------------------
+
+def _sentence(rng, min_words=6, max_words=18):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def _content(rng):
+    paragraphs = []
+    for index in range(rng.randint(3, 30)):
+        if index and index % 5 == 0:
+            paragraphs.append(f"<h3>{_sentence(rng, 3, 6)[:-1]}</h3>")
+        paragraphs.append('<p>' + ' '.join(_sentence(rng) for _ in range(rng.randint(2, 6))) + '</p>')
+    return '\n'.join(paragraphs)
+
+
+def _insert_batches(db, table, rows_iter, total, batch_size, label):
+    batch = []
+    inserted = 0
+    started = time.perf_counter()
+    for row in rows_iter:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+            inserted += len(batch)
+            batch = []
+            print(f"\r  {label}: {inserted}/{total}", end='', flush=True)
+    if batch:
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        inserted += len(batch)
+    print(f"\r  {label}: {inserted}/{total} em {time.perf_counter() - started:.1f}s")
+
+
+def seed(args):
+    if 'pooler.supabase.com' in args.database_url or '.supabase.co' in args.database_url:
+        print("Recusando semear um banco do Supabase; use SQLite ou um PostgreSQL local")
+        return 1
+
+    from werkzeug.security import generate_password_hash
+
+    app = create_benchmark_app(args.database_url)
+    from app import db
+    from app.content import count_words, make_teaser
+    from app.models import Comment, Post, User
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    # Um único hash para todos: gerar 50k hashes levaria minutos e não é o que se mede
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+
+    with app.app_context():
+        print(f"Recriando as tabelas em {args.database_url.split('@')[-1]}...")
+        db.drop_all()
+        db.create_all()
+
+        def users():
+            for user_id in range(1, args.users + 1):
+                is_author = user_id <= AUTHOR_COUNT
+                is_premium = is_author or rng.random() < 0.1
+                yield {
+                    'id': user_id,
+                    'username': 'bench-admin' if user_id == 1 else f"user{user_id:06d}",
+                    'email': ADMIN_EMAIL if user_id == 1 else f"user{user_id}@{BENCH_DOMAIN}",
+                    'password_hash': password_hash,
+                    'age': rng.randint(18, 70),
+                    'is_admin': is_author,
+                    'is_premium': is_premium,
+                    'ai_credits': 5 if is_premium else 1,
+                    'created_at': now - timedelta(days=rng.randint(0, 1500)),
+                }
+
+        post_dates = {}
+
+        def posts():
+            for post_id in range(1, args.posts + 1):
+                created_at = now - timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+                post_dates[post_id] = created_at
+                content = _content(rng)
+                yield {
+                    'id': post_id,
+                    'title': _sentence(rng, 3, 9)[:-1][:100],
+                    'summary': _sentence(rng, 10, 25)[:200],
+                    'content': content,
+                    # Inserção em lote não passa pelo Post.validate_content
+                    'teaser_html': make_teaser(content),
+                    'word_count': count_words(content),
+                    'image_url': f"https://picsum.photos/seed/{post_id}/1200/400",
+                    'premium_only': rng.random() < 0.3,
+                    'created_at': created_at,
+                    'reading_time': rng.choice([None, None, rng.randint(2, 20)]),
+                    'user_id': rng.randint(1, min(AUTHOR_COUNT, args.users)),
+                }
+
+        def comments():
+            for comment_id in range(1, args.comments + 1):
+                # Distribuição enviesada: poucos posts concentram muitos comentários
+                post_id = min(args.posts, int(rng.paretovariate(1.2))) if rng.random() < 0.3 \
+                    else rng.randint(1, args.posts)
+                yield {
+                    'id': comment_id,
+                    'content': _sentence(rng, 4, 30),
+                    'created_at': post_dates[post_id] + timedelta(minutes=rng.randint(1, 60 * 24 * 30)),
+                    'approved': rng.random() < 0.85,
+                    'user_id': rng.randint(1, args.users),
+                    'post_id': post_id,
+                }
+
+        _insert_batches(db, User.__table__, users(), args.users, args.batch_size, 'usuários')
+        _insert_batches(db, Post.__table__, posts(), args.posts, args.batch_size, 'posts')
+        _insert_batches(db, Comment.__table__, comments(), args.comments, args.batch_size, 'comentários')
+
+        if db.engine.dialect.name == 'postgresql':
+            # IDs explícitos não avançam as sequences
+            for table in ('user', 'post', 'comment'):
+                db.session.execute(db.text(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM \"{table}\"))"
+                ))
+            db.session.commit()
+
+        # A inserção em lote não passa pelos eventos do ORM que mantêm o índice FTS5
+        from app.search import rebuild_search_index
+        with db.engine.begin() as connection:
+            rebuild_search_index(connection, args.batch_size)
+
+    print(f"Dataset pronto. Admin: {ADMIN_EMAIL} / {BENCH_PASSWORD}")
+    return 0
+
+
+# --- Execução -------------------------------------------------------------
+
+def build_scenarios(post_ids):
+    """(nome, método, path ou gerador de path, cliente, status esperado)"""
+    scenarios = [
+        ('index', 'GET', '/', 'anon', 200),
+        ('index_page_50', 'GET', '/?page=50', 'anon', 200),
+    ]
+    for post_type in ('all', 'free', 'premium'):
+        for sort in ('recent', 'read_time_asc', 'read_time_desc'):
+            scenarios.append((f"posts_{post_type}_{sort}", 'GET',
+                              f"/posts?type={post_type}&sort={sort}", 'anon', 200))
+    scenarios += [
+        ('post_detail', 'GET', lambda rng: f"/post/{rng.choice(post_ids)}", 'anon', 200),
+        ('post_detail_admin', 'GET', lambda rng: f"/post/{rng.choice(post_ids)}", 'admin', 200),
+        ('admin_dashboard', 'GET', '/admin/', 'admin', 200),
+        ('admin_all_posts', 'GET', '/admin/all-posts', 'admin', 200),
+        ('login', 'POST', '/auth/login', 'login', 302),
+    ]
+    return scenarios
+
+
+class LoginError(RuntimeError):
+    """O admin semeado não conseguiu entrar: as medições de admin e de login seriam inválidas"""
+
+
+def login_client(app):
+    client = app.test_client()
+    response = client.post('/auth/login', data={'email': ADMIN_EMAIL, 'password': BENCH_PASSWORD})
+    if response.status_code != 302:
+        raise LoginError(f"Falha no login do admin {ADMIN_EMAIL} (HTTP {response.status_code}); "
+                         f"rode o seed de novo (o banco pode ter sido semeado com outro email)")
+    return client
+
+
+def run_scenario(app, scenario, clients, counter, args, rng):
+    name, method, path, client_kind, expected_status = scenario
+    latencies = []
+    queries = []
+    errors = 0
+
+    def request_once():
+        target = path(rng) if callable(path) else path
+        if client_kind == 'login':
+            client = app.test_client()
+            call = lambda: client.post(target, data={'email': ADMIN_EMAIL, 'password': BENCH_PASSWORD})
+        else:
+            client = clients[client_kind]
+            call = lambda: client.open(target, method=method)
+        counter['n'] = 0
+        started = time.perf_counter()
+        response = call()
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        return elapsed, counter['n'], response.status_code
+
+    for _ in range(args.warmup):
+        request_once()
+
+    wall_started = time.perf_counter()
+    for _ in range(args.requests):
+        elapsed, query_count, status = request_once()
+        latencies.append(elapsed)
+        queries.append(query_count)
+        if status != expected_status:
+            errors += 1
+    wall = time.perf_counter() - wall_started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries_per_request': round(sum(queries) / len(queries), 1) if queries else 0.0,
+        'max_queries': max(queries) if queries else 0,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Imprime a variação em relação à linha de base; retorna os cenários que regrediram"""
+    regressions = []
+    print(f"\n{'cenário':<30} {'p50 Δ%':>8} {'p95 Δ%':>8} {'rps Δ%':>8} {'queries':>12}")
+    for name, current in results.items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None:
+            print(f"{name:<30} {'(novo)':>8}")
+            continue
+
+        def delta(key):
+            return 100.0 * (current[key] - previous[key]) / previous[key] if previous[key] else 0.0
+
+        queries = f"{previous['queries_per_request']}→{current['queries_per_request']}"
+        print(f"{name:<30} {delta('p50_ms'):>+8.1f} {delta('p95_ms'):>+8.1f} "
+              f"{delta('throughput_rps'):>+8.1f} {queries:>12}")
+        if delta('p95_ms') > tolerance * 100 or current['queries_per_request'] > previous['queries_per_request']:
+            regressions.append(name)
+    return regressions
+
+
+def run(args):
+    app = create_benchmark_app(args.database_url)
+    from sqlalchemy import event
+    from app import db
+    from app.models import Post
+
+    rng = random.Random(args.seed)
+    counter = {'n': 0}
+
+    with app.app_context():
+        post_ids = [row[0] for row in db.session.query(Post.id).order_by(Post.id).limit(50000).all()]
+        if not post_ids:
+            print("Banco sem posts; rode 'python scripts/benchmark.py seed' antes")
+            return 1
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        counter['n'] += 1
+
+    try:
+        clients = {'anon': app.test_client(), 'admin': login_client(app)}
+    except LoginError as e:
+        print(f"ERRO: {e}")
+        return 1
+    selected = set(filter(None, (args.only or '').split(',')))
+    results = {}
+
+    print(f"\n{'cenário':<30} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'erros':>6}")
+    for scenario in build_scenarios(post_ids):
+        if selected and scenario[0] not in selected:
+            continue
+        summary = run_scenario(app, scenario, clients, counter, args, rng)
+        results[scenario[0]] = summary
+        print(f"{scenario[0]:<30} {summary['throughput_rps']:>8} {summary['p50_ms']:>9} "
+              f"{summary['p95_ms']:>9} {summary['p99_ms']:>9} {summary['queries_per_request']:>8} "
+              f"{summary['errors']:>6}")
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'database': engine.dialect.name,
+        'requests_per_scenario': args.requests,
+        'scenarios': results,
+    }
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nRegressões (p95 acima de {args.tolerance:.0%} ou mais consultas): {', '.join(regressions)}")
+            exit_code = 1 if args.fail_on_regression else 0
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nLinha de base salva em {args.save_baseline}")
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return exit_code
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark HTTP do blog com dataset semeado")
+    parser.add_argument('--database-url', default=DEFAULT_DATABASE_URL,
+                        help="Banco do benchmark (padrão: instance/benchmark.db)")
+    parser.add_argument('--seed', type=int, default=42, help="Semente do gerador aleatório")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help="Apagar e semear o banco do benchmark")
+    seed_parser.add_argument('--users', type=int, default=50000)
+    seed_parser.add_argument('--posts', type=int, default=100000)
+    seed_parser.add_argument('--comments', type=int, default=1000000)
+    seed_parser.add_argument('--batch-size', type=int, default=5000)
+
+    run_parser = commands.add_parser('run', help="Executar os cenários")
+    run_parser.add_argument('--requests', type=int, default=200, help="Requisições medidas por cenário")
+    run_parser.add_argument('--warmup', type=int, default=10)
+    run_parser.add_argument('--only', help="Cenários a executar, separados por vírgula")
+    run_parser.add_argument('--save-baseline', help="Salvar os resultados como linha de base")
+    run_parser.add_argument('--compare', help="Comparar com uma linha de base salva")
+    run_parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Aumento relativo de p95 tolerado na comparação (padrão 0.2)")
+    run_parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Sair com código 1 se houver regressão")
+    run_parser.add_argument('--json', dest='json_path', help="Salvar os resultados em JSON neste arquivo")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'seed':
+        return seed(args)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
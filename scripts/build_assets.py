@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Build dos arquivos estáticos
+
+Para cada pacote de app/assets.py (BUNDLES):
+- concatena os arquivos de origem (CSS: @import sobe para o topo do pacote);
+- minifica (rcssmin/rjsmin se instalados; senão o minificador conservador
+  deste script, que só remove comentários e espaços);
+- grava app/static/dist/<nome>.<hash>.<ext>, com o hash do conteúdo no nome;
+- gera as variantes pré-comprimidas .gz e .br (brotli, se instalado), só
+  quando ficam menores que o original.
+
+O resultado é descrito em app/static/dist/manifest.json, lido pela aplicação
+na inicialização. Rodar a cada deploy (ver Dockerfile):
+
+    python scripts/build_assets.py
+    python scripts/build_assets.py --no-minify   # só concatena (depuração)
+
+Os arquivos com hash podem ser cacheados para sempre pelo navegador: qualquer
+mudança de conteúdo gera um nome novo.
+"""
+
+import argparse
+import gzip
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import shutil
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+from app.assets import BUILD_MANIFEST, BUNDLES, DIST_DIR, ENCODING_SUFFIXES, FINGERPRINT_LENGTH  # noqa: E402
+
+STATIC_DIR = os.path.join(ROOT_DIR, 'app', 'static')
+
+brotli = None
+for _module in ('brotli', 'brotlicffi'):
+    if importlib.util.find_spec(_module) is not None:
+        brotli = importlib.import_module(_module)
+        break
+
+# Caractere antes de '/' que indica início de expressão regular (e não divisão)
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^\n') | {''}
+IDENTIFIER_CHARS = re.compile(r'[\w$]')
+
+CSS_STRING_OR_COMMENT = r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/'
+CSS_IMPORT = re.compile(r'@import\s+(?:url\((?:"[^"]*"|\'[^\']*\'|[^)]*)\)|"[^"]*"|\'[^\']*\')[^;]*;')
+
+
+def _read_string(source, index, quote):
+    """Índice logo após o fim da string/template/regex iniciada em `index`"""
+    index += 1
+    in_class = False
+    while index < len(source):
+        char = source[index]
+        if char == '\\':
+            index += 2
+            continue
+        if quote == '/' and char == '[':
+            in_class = True
+        elif quote == '/' and char == ']':
+            in_class = False
+        elif char == quote and not in_class:
+            return index + 1
+        elif char == '\n' and quote in '\'"/':
+            break  # String quebrada: não mexer no resto da linha
+        index += 1
+    return index
+
+
+def minify_js(source):
+    """
+    Remove comentários, indentação e linhas vazias preservando strings,
+    templates e expressões regulares. As quebras de linha são mantidas para não
+    depender da inserção automática de ponto e vírgula.
+    """
+    output = []
+    index = 0
+    pending_space = False
+    while index < len(source):
+        char = source[index]
+        following = source[index + 1:index + 2]
+        if char in '\'"`':
+            end = _read_string(source, index, char)
+            output.append(source[index:end])
+            pending_space = False
+            index = end
+            continue
+        if char == '/' and following == '/':
+            newline = source.find('\n', index)
+            index = len(source) if newline == -1 else newline
+            continue
+        if char == '/' and following == '*':
+            end = source.find('*/', index + 2)
+            index = len(source) if end == -1 else end + 2
+            pending_space = True
+            continue
+        if char == '/':
+            previous = next((part[-1] for part in reversed(output) if part != ' '), '')
+            if previous in REGEX_PRECEDERS:
+                end = _read_string(source, index, '/')
+                output.append(source[index:end])
+                index = end
+                pending_space = False
+                continue
+        if char == '\n':
+            while output and output[-1] == ' ':
+                output.pop()
+            if output and output[-1] != '\n':
+                output.append('\n')
+            pending_space = False
+            index += 1
+            continue
+        if char in ' \t\r':
+            pending_space = True
+            index += 1
+            continue
+        if pending_space:
+            last = output[-1][-1:] if output else ''
+            # Espaço só é necessário entre identificadores/números (e em "+ +", "- -")
+            if IDENTIFIER_CHARS.match(last) and IDENTIFIER_CHARS.match(char) or \
+                    (last == char and char in '+-'):
+                output.append(' ')
+            pending_space = False
+        output.append(char)
+        index += 1
+    return ''.join(output).strip() + '\n'
+
+
+def minify_css(source):
+    """Remove comentários e espaços desnecessários (espaço antes de ':' é mantido)"""
+    strings = []
+
+    def keep_string(match):
+        if match.group(1) is None:
+            return ''  # Comentário
+        strings.append(match.group(1))
+        return f"\x00{len(strings) - 1}\x00"
+
+    # Strings e comentários numa única passada: um não esconde o outro
+    source = re.sub(CSS_STRING_OR_COMMENT, keep_string, source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    source = source.replace(';}', '}')
+    return re.sub(r'\x00(\d+)\x00', lambda m: strings[int(m.group(1))], source).strip() + '\n'
+
+
+def get_minifier(extension):
+    if extension == '.css':
+        if importlib.util.find_spec('rcssmin') is not None:
+            import rcssmin
+            return rcssmin.cssmin
+        return minify_css
+    if extension == '.js':
+        if importlib.util.find_spec('rjsmin') is not None:
+            import rjsmin
+            return rjsmin.jsmin
+        return minify_js
+    return None
+
+
+def concatenate(sources, extension):
+    parts = []
+    for source in sources:
+        with open(os.path.join(STATIC_DIR, source), encoding='utf-8') as f:
+            parts.append(f.read())
+    if extension == '.css':
+        # @import só vale no início da folha de estilos: sobe para o topo do pacote
+        imports = []
+
+        def hoist(match):
+            imports.append(match.group(0).strip())
+            return ''
+
+        parts = [CSS_IMPORT.sub(hoist, part) for part in parts]
+        parts.insert(0, '\n'.join(imports))
+    if extension == '.js':
+        # Cada arquivo termina sua última instrução antes do próximo
+        parts = [part.rstrip() + '\n;' for part in parts]
+    return '\n'.join(parts)
+
+
+def compress(data, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build(minify=True):
+    dist_dir = os.path.join(STATIC_DIR, DIST_DIR)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    if brotli is None:
+        print("Aviso: brotli não instalado; apenas variantes .gz serão geradas")
+
+    manifest = {'bundles': {}}
+    for name, sources in BUNDLES.items():
+        stem, extension = os.path.splitext(name)
+        content = concatenate(sources, extension)
+        minifier = get_minifier(extension) if minify else None
+        if minifier is not None:
+            content = minifier(content)
+        data = content.encode('utf-8')
+
+        digest = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]
+        filename = f"{stem}.{digest}{extension}"
+        write(os.path.join(dist_dir, filename), data)
+
+        encodings = {}
+        sizes = [f"{len(data):>7}"]
+        for encoding, suffix in ENCODING_SUFFIXES:
+            compressed = compress(data, encoding)
+            if compressed is None or len(compressed) >= len(data):
+                continue
+            write(os.path.join(dist_dir, filename + suffix), compressed)
+            encodings[encoding] = filename + suffix
+            sizes.append(f"{encoding} {len(compressed):>6}")
+
+        original = sum(os.path.getsize(os.path.join(STATIC_DIR, source)) for source in sources)
+        manifest['bundles'][name] = {'file': filename, 'encodings': encodings, 'sources': sources}
+        print(f"{name:<16} {original:>7} -> {'  '.join(sizes)}  ({DIST_DIR}/{filename})")
+
+    write(os.path.join(STATIC_DIR, BUILD_MANIFEST),
+          json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    print(f"\nManifesto gravado em app/static/{BUILD_MANIFEST}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera os pacotes estáticos com hash e pré-compressão")
+    parser.add_argument('--no-minify', action='store_true', help="Apenas concatenar, sem minificar")
+    args = parser.parse_args(argv)
+    return build(minify=not args.no_minify)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do caminho de chat (/ia-relacionamento)
+
+Dispara mensagens concorrentes, autenticadas como um usuário premium, e
+reporta vazão e latência de cauda (p50/p95/p99). Pode usar uma aplicação já
+em execução (--target) ou subir o gunicorn uma vez por classe de worker
+(--worker-classes), com o stub local da OpenAI no lugar da API real:
+
+    python scripts/load_test_chat.py --stub --worker-classes sync,gthread \\
+        --email premium@exemplo.com --password premium123 --concurrency 32
+
+O usuário precisa existir e ser premium (ver scripts/init_db.py).
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+MESSAGES = [
+    "Terminamos há duas semanas e ela não responde minhas mensagens. O que devo fazer?",
+    "Como saber se ainda existe chance de reconquista?",
+    "Devo aplicar contato zero ou tentar conversar agora?",
+    "Ele disse que precisa de espaço. Quanto tempo devo esperar?",
+]
+
+
+def percentile(values, pct):
+    """Percentil por nearest-rank sobre uma lista já ordenada"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def login(target, email, password, timeout):
+    """Abre uma sessão HTTP autenticada na aplicação"""
+    session = requests.Session()
+    response = session.post(
+        f"{target}/auth/login",
+        data={'email': email, 'password': password, 'remember_me': 'y'},
+        allow_redirects=False,
+        timeout=timeout,
+    )
+    if response.status_code not in (301, 302, 303):
+        raise RuntimeError(f"Falha no login ({response.status_code}); verifique email/senha")
+    return session
+
+
+def run_scenario(target, args):
+    """Executa o cenário contra `target` e retorna o resumo das medições"""
+    local = threading.local()
+    results = []
+    results_lock = threading.Lock()
+
+    def get_session():
+        if not hasattr(local, 'session'):
+            local.session = login(target, args.email, args.password, args.timeout)
+        return local.session
+
+    def send(index):
+        session = get_session()
+        started = time.perf_counter()
+        outcome = 'ok'
+        try:
+            response = session.post(
+                f"{target}/ia-relacionamento",
+                data={'message': MESSAGES[index % len(MESSAGES)]},
+                headers={'X-Requested-With': 'XMLHttpRequest'},
+                timeout=args.timeout,
+            )
+            if response.status_code != 200:
+                outcome = f"http_{response.status_code}"
+            else:
+                payload = response.json()
+                if not payload.get('success'):
+                    outcome = 'app_error'
+                elif payload.get('api_error'):
+                    outcome = 'fallback'
+        except requests.Timeout:
+            outcome = 'timeout'
+        except Exception:
+            outcome = 'exception'
+        elapsed = time.perf_counter() - started
+        with results_lock:
+            results.append((elapsed, outcome))
+
+    # Aquecer: autenticar todas as threads antes de medir
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda _: get_session(), range(args.concurrency)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(send, range(args.requests)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for elapsed, _ in results)
+    outcomes = {}
+    for _, outcome in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    return {
+        'requests': len(results),
+        'concurrency': args.concurrency,
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(len(results) / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        'outcomes': outcomes,
+    }
+
+
+def wait_until_ready(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return True
+        except requests.RequestException:
+            time.sleep(0.5)
+    return False
+
+
+def start_stub(args):
+    command = [
+        sys.executable, os.path.join(ROOT_DIR, 'scripts', 'openai_stub.py'),
+        '--port', str(args.stub_port),
+        '--latency-ms', str(args.stub_latency_ms),
+        '--error-rate', str(args.stub_error_rate),
+    ]
+    process = subprocess.Popen(command, cwd=ROOT_DIR)
+    if not wait_until_ready(f"http://127.0.0.1:{args.stub_port}/health", timeout=15):
+        process.terminate()
+        raise RuntimeError("Stub da OpenAI não respondeu")
+    return process
+
+
+def start_gunicorn(worker_class, port, args, env):
+    command = [
+        'gunicorn', '-c', 'gunicorn_config.py',
+        '--worker-class', worker_class,
+        '--bind', f"127.0.0.1:{port}",
+        '--workers', str(args.workers),
+        '--threads', str(args.threads),
+        'app:app',
+    ]
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env)
+    if not wait_until_ready(f"http://127.0.0.1:{port}/", timeout=90):
+        process.terminate()
+        raise RuntimeError(f"gunicorn ({worker_class}) não subiu")
+    return process
+
+
+def print_report(label, summary):
+    print(f"\n=== {label} ===")
+    print(f"Requisições: {summary['requests']}  Concorrência: {summary['concurrency']}  "
+          f"Duração: {summary['wall_seconds']}s")
+    print(f"Vazão: {summary['throughput_rps']} req/s")
+    print(f"Latência p50={summary['p50_ms']}ms  p95={summary['p95_ms']}ms  "
+          f"p99={summary['p99_ms']}ms  max={summary['max_ms']}ms")
+    print(f"Resultados: {summary['outcomes']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do chat de IA")
+    parser.add_argument('--target', help="URL de uma aplicação já em execução (ex.: http://127.0.0.1:8000)")
+    parser.add_argument('--worker-classes', default='sync',
+                        help="Classes de worker do gunicorn a comparar, separadas por vírgula")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help="Threads por worker (gthread)")
+    parser.add_argument('--base-port', type=int, default=8100)
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--timeout', type=float, default=90)
+    parser.add_argument('--stub', action='store_true', help="Subir scripts/openai_stub.py e apontar a aplicação para ele")
+    parser.add_argument('--stub-port', type=int, default=8089)
+    parser.add_argument('--stub-latency-ms', type=float, default=800)
+    parser.add_argument('--stub-error-rate', type=float, default=0.0)
+    parser.add_argument('--json', dest='json_path', help="Salvar os resultados em JSON neste arquivo")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {}
+    stub = start_stub(args) if args.stub else None
+
+    try:
+        if args.target:
+            report['target'] = run_scenario(args.target.rstrip('/'), args)
+            print_report(args.target, report['target'])
+        else:
+            env = dict(os.environ)
+            if stub is not None:
+                env['OPENAI_BASE_URL'] = f"http://127.0.0.1:{args.stub_port}/v1"
+                env.setdefault('OPENAI_API_KEY', 'sk-stub')
+            for offset, worker_class in enumerate(filter(None, args.worker_classes.split(','))):
+                port = args.base_port + offset
+                server = start_gunicorn(worker_class, port, args, env)
+                try:
+                    report[worker_class] = run_scenario(f"http://127.0.0.1:{port}", args)
+                    print_report(f"worker_class={worker_class}", report[worker_class])
+                finally:
+                    server.terminate()
+                    server.wait(timeout=30)
+    finally:
+        if stub is not None:
+            stub.terminate()
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResultados salvos em {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
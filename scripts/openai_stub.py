@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Servidor local compatível com a API de chat completions da OpenAI
+
+Permite exercitar o cliente real, os timeouts, o circuit breaker e o
+tratamento de erros sem chamar a OpenAI. Aponte a aplicação para ele com:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=sk-stub
+
+Exemplos:
+
+    python scripts/openai_stub.py --latency-ms 800 --jitter 0.5
+    python scripts/openai_stub.py --error-rate 0.1 --timeout-rate 0.02
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLIES = [
+    "Obrigado por compartilhar isso comigo. Mantenha uma comunicação clara e honesta; a reconquista exige paciência e compreensão mútua.",
+    "Foque primeiro no seu próprio desenvolvimento pessoal. Quando nos tornamos a melhor versão de nós mesmos, naturalmente atraímos as pessoas de volta.",
+    "Dê espaço para que ambos possam refletir. O tempo permite que as emoções se acalmem e a razão prevaleça.",
+    "Estabeleça limites saudáveis. Manter o respeito mútuo após um término demonstra maturidade emocional.",
+]
+
+
+class StubSettings:
+    """Distribuição de latência e taxas de erro configuradas na linha de comando"""
+
+    def __init__(self, args):
+        self.latency_ms = args.latency_ms
+        self.jitter = args.jitter
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.timeout_rate = args.timeout_rate
+        self.hang_seconds = args.hang_seconds
+        self.chunk_delay_ms = args.chunk_delay_ms
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'hung': 0}
+
+    def sample_latency(self):
+        """Latência log-normal com mediana `latency_ms` (jitter = desvio do log)"""
+        if self.jitter <= 0:
+            return self.latency_ms / 1000.0
+        return random.lognormvariate(math.log(max(self.latency_ms, 1)), self.jitter) / 1000.0
+
+    def count(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+
+def estimate_tokens(text):
+    return len(text or '') // 4 + 1
+
+
+def make_handler(settings):
+    class ChatCompletionsHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass  # Silencioso: o volume de requisições de um teste de carga é alto
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/') in ('/health', '/v1/health'):
+                with settings.lock:
+                    counters = dict(settings.counters)
+                self._send_json(200, {'status': 'ok', 'counters': counters})
+            else:
+                self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+
+        def do_POST(self):
+            if self.path.rstrip('/') not in ('/v1/chat/completions', '/chat/completions'):
+                self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+                return
+
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self._send_json(400, {'error': {'message': 'Invalid JSON body', 'type': 'invalid_request_error'}})
+                return
+
+            settings.count('requests')
+            roll = random.random()
+
+            # Injeção de falhas: pendurar (para testar timeouts), 429 ou 500
+            if roll < settings.timeout_rate:
+                settings.count('hung')
+                time.sleep(settings.hang_seconds)
+                self._send_json(504, {'error': {'message': 'Upstream timeout (stub)', 'type': 'server_error'}})
+                return
+            roll -= settings.timeout_rate
+            if roll < settings.rate_limit_rate:
+                settings.count('rate_limited')
+                self._send_json(429, {'error': {'message': 'Rate limit reached (stub)', 'type': 'rate_limit_error'}},
+                                headers={'Retry-After': '1'})
+                return
+            roll -= settings.rate_limit_rate
+            if roll < settings.error_rate:
+                settings.count('errors')
+                time.sleep(settings.sample_latency() / 4)
+                self._send_json(500, {'error': {'message': 'Internal error (stub)', 'type': 'server_error'}})
+                return
+
+            messages = payload.get('messages') or []
+            prompt_tokens = sum(estimate_tokens(m.get('content')) for m in messages)
+            reply = random.choice(REPLIES)
+            completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+            created = int(time.time())
+            model = payload.get('model', 'gpt-3.5-turbo')
+
+            if payload.get('stream'):
+                self._stream(completion_id, created, model, reply)
+                return
+
+            time.sleep(settings.sample_latency())
+            self._send_json(200, {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': created,
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': reply},
+                    'finish_reason': 'stop',
+                }],
+                'usage': {
+                    'prompt_tokens': prompt_tokens,
+                    'completion_tokens': estimate_tokens(reply),
+                    'total_tokens': prompt_tokens + estimate_tokens(reply),
+                },
+            })
+
+        def _stream(self, completion_id, created, model, reply):
+            """Resposta em server-sent events, uma palavra por chunk"""
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+
+            # Tempo até o primeiro token
+            time.sleep(settings.sample_latency())
+            words = reply.split(' ')
+            for index, word in enumerate(words):
+                delta = {'content': word if index == 0 else ' ' + word}
+                if index == 0:
+                    delta['role'] = 'assistant'
+                self._write_event({
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                    'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}],
+                })
+                time.sleep(settings.chunk_delay_ms / 1000.0)
+            self._write_event({
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                'model': model, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+            })
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+
+        def _write_event(self, payload):
+            self.wfile.write(b'data: ' + json.dumps(payload).encode('utf-8') + b'\n\n')
+            self.wfile.flush()
+
+    return ChatCompletionsHandler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local compatível com a API de chat da OpenAI")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=800, help="Mediana da latência de resposta")
+    parser.add_argument('--jitter', type=float, default=0.4, help="Desvio do log da latência (0 = latência fixa)")
+    parser.add_argument('--chunk-delay-ms', type=float, default=20, help="Intervalo entre chunks no modo stream")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fração de respostas 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Fração de respostas 429")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="Fração de requisições que ficam penduradas")
+    parser.add_argument('--hang-seconds', type=float, default=120, help="Duração das requisições penduradas")
+    parser.add_argument('--seed', type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(StubSettings(args)))
+    server.daemon_threads = True
+    print(f"Stub da OpenAI ouvindo em http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
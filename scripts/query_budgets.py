@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Orçamento de consultas SQL por rota
+
+Executa as rotas principais contra a aplicação real (create_app +
+test_client), captura as instruções SQL de cada requisição pelos eventos do
+SQLAlchemy e falha se alguma rota passar do máximo declarado em BUDGETS. É o
+que impede uma mudança de template de reintroduzir N+1 em post.author ou
+comment.author sem ninguém perceber.
+
+    python scripts/query_budgets.py            # banco temporário semeado (pequeno)
+    python scripts/query_budgets.py --record   # grava as consultas atuais como referência
+
+Quando um orçamento estoura, as consultas são listadas normalizadas e
+agrupadas (repetições em destaque) e, se houver referência gravada, com um
+diff contra ela. Sai com código 1 se algum orçamento for excedido, para uso
+em CI. É um script, e não um teste, porque o repositório não tem suíte de
+testes nem pytest configurado.
+"""
+
+import argparse
+import difflib
+import json
+import os
+import re
+import sys
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark import ADMIN_EMAIL, ROOT_DIR, LoginError, create_benchmark_app, login_client  # noqa: E402
+from benchmark import seed as seed_database  # noqa: E402
+
+SNAPSHOT_PATH = os.path.join(ROOT_DIR, 'instance', 'query_snapshots.json')
+
+# endpoint -> (path, cliente, máximo de consultas por requisição)
+# Clientes autenticados pagam 2 consultas fixas (sessão + usuário) e, de vez
+# em quando, a renovação da sessão: daí a folga de 1 nas rotas do admin.
+# As rotas públicas incluem a consulta dos validadores do GET condicional.
+BUDGETS = {
+    'main.index': ('/', 'anon', 4),
+    'main.post': ('/post/{post_id}', 'anon', 6),
+    'main.all_posts': ('/posts?type=all&sort=recent', 'anon', 6),
+    'main.search': ('/search?q=relacionamento+confiança', 'anon', 2),
+    'admin.dashboard': ('/admin/', 'admin', 9),
+    'admin.all_posts': ('/admin/all-posts', 'admin', 9),
+}
+
+# Revalidação com If-None-Match: só a consulta dos validadores, resposta 304
+REVALIDATION_BUDGET = 1
+
+
+class QueryRecorder:
+    """Captura as instruções SQL executadas numa engine enquanto está ativo"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        from sqlalchemy import event
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        from sqlalchemy import event
+        event.remove(self.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return False
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+def normalize(statement):
+    """SQL numa linha, sem literais e com listas IN colapsadas, para comparar e agrupar"""
+    statement = re.sub(r'\s+', ' ', statement).strip()
+    statement = re.sub(r"'(?:[^']|'')*'", '?', statement)
+    statement = re.sub(r'\b\d+\b', '?', statement)
+    statement = re.sub(r'\((?:\?|%\([^)]+\)s)(?:, ?(?:\?|%\([^)]+\)s))+\)', '(...)', statement)
+    return statement
+
+
+def describe(statements, expected=None):
+    """Texto legível das consultas de uma requisição (agrupadas e, se possível, diff)"""
+    normalized = [normalize(statement) for statement in statements]
+    lines = []
+    for statement, count in Counter(normalized).most_common():
+        marker = f"{count}x" if count > 1 else '  '
+        lines.append(f"    {marker:>4} {statement[:220]}")
+    if expected is not None:
+        diff = difflib.unified_diff(expected, normalized, 'referência', 'atual', lineterm='', n=1)
+        diff = list(diff)
+        if diff:
+            lines.append("    diff contra a referência gravada:")
+            lines.extend(f"      {line[:220]}" for line in diff)
+    return '\n'.join(lines)
+
+
+def check(app, args):
+    from app import db
+    from app.models import Post
+
+    with app.app_context():
+        # Post gratuito: o aviso de conteúdo premium (flash) gravaria a sessão
+        post_id = db.session.query(Post.id).filter(Post.premium_only.is_(False)) \
+            .order_by(Post.id).limit(1).scalar()
+        if post_id is None:
+            print("Banco sem posts; rode 'python scripts/benchmark.py seed' antes")
+            return 1
+        engine = db.engine
+
+    snapshots = {}
+    if os.path.exists(SNAPSHOT_PATH) and not args.record:
+        with open(SNAPSHOT_PATH) as f:
+            snapshots = json.load(f)
+
+    try:
+        clients = {'anon': app.test_client(), 'admin': login_client(app)}
+    except LoginError as e:
+        print(f"ERRO: {e}")
+        return 1
+    recorded = {}
+    failures = 0
+
+    for endpoint, (path, client_kind, budget) in BUDGETS.items():
+        path = path.format(post_id=post_id)
+        client = clients[client_kind]
+        client.get(path)  # Aquecimento: caches e primeira renovação da sessão
+        with QueryRecorder(engine) as recorder:
+            response = client.get(path)
+        recorded[endpoint] = [normalize(statement) for statement in recorder.statements]
+
+        status = 'OK ' if recorder.count <= budget else 'ERRO'
+        print(f"[{status}] {endpoint:<18} {recorder.count:>3}/{budget} consultas  "
+              f"(HTTP {response.status_code}, {path})")
+        if response.status_code != 200:
+            print(f"    resposta inesperada: HTTP {response.status_code}")
+            failures += 1
+        if recorder.count > budget:
+            failures += 1
+            print(describe(recorder.statements, snapshots.get(endpoint)))
+        elif args.verbose:
+            print(describe(recorder.statements))
+
+        etag = response.headers.get('ETag')
+        if etag and client_kind == 'anon':
+            with QueryRecorder(engine) as recorder:
+                revalidated = client.get(path, headers={'If-None-Match': etag})
+            ok = revalidated.status_code == 304 and recorder.count <= REVALIDATION_BUDGET
+            print(f"[{'OK ' if ok else 'ERRO'}] {endpoint + ' (304)':<18} {recorder.count:>3}/"
+                  f"{REVALIDATION_BUDGET} consultas  (HTTP {revalidated.status_code})")
+            if not ok:
+                failures += 1
+                print(describe(recorder.statements))
+
+    if args.record:
+        os.makedirs(os.path.dirname(SNAPSHOT_PATH), exist_ok=True)
+        with open(SNAPSHOT_PATH, 'w') as f:
+            json.dump(recorded, f, indent=2)
+        print(f"\nReferência gravada em {SNAPSHOT_PATH}")
+
+    if failures:
+        print(f"\n{failures} rota(s) fora do orçamento")
+        return 1
+    print("\nTodas as rotas dentro do orçamento")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica o número de consultas SQL por rota")
+    parser.add_argument('--database-url', help="Banco já semeado (padrão: SQLite temporário semeado agora)")
+    parser.add_argument('--record', action='store_true', help="Gravar as consultas atuais como referência")
+    parser.add_argument('--verbose', action='store_true', help="Listar as consultas de todas as rotas")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        return check(create_benchmark_app(args.database_url), args)
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = 'sqlite:///' + os.path.join(directory, 'budgets.db')
+        # Poucos autores e vários comentários por post: N+1 aparece na contagem
+        seed_args = argparse.Namespace(database_url=database_url, seed=42, users=60,
+                                       posts=40, comments=600, batch_size=500)
+        if seed_database(seed_args) != 0:
+            return 1
+        print(f"\nAdmin do dataset: {ADMIN_EMAIL}\n")
+        return check(create_benchmark_app(database_url), args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Recria o índice de busca dos posts no SQLite (tabela FTS5 post_fts)
+
+Criação, edição e exclusão de posts pelo ORM já mantêm o índice; use este
+script depois de inserções em lote ou de alterações feitas direto no banco:
+
+    python scripts/rebuild_search_index.py
+
+No PostgreSQL não há nada a fazer: post.search_vector é uma coluna gerada.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recria o índice de busca FTS5 dos posts")
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    from app.search import rebuild_search_index
+
+    app = create_app()
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            print("PostgreSQL: post.search_vector é mantida pelo banco, nada a recriar")
+            return 0
+        try:
+            with db.engine.begin() as connection:
+                total = rebuild_search_index(connection, args.batch_size)
+        except Exception as e:
+            print(f"ERRO ao recriar o índice de busca: {e}")
+            return 1
+        print(f"{total} post(s) indexado(s)")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
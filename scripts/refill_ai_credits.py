@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Reposição periódica dos créditos de IA
+
+Executa um único UPDATE em lote que devolve o saldo padrão a todos os
+usuários com créditos zerados. Deve ser agendado (cron, Railway cron job):
+
+    python -m scripts.refill_ai_credits
+"""
+
+import sys
+from app import create_app, db
+
+def refill():
+    """Repõe os créditos de IA de todos os usuários zerados"""
+    app = create_app()
+
+    with app.app_context():
+        from app.models import User
+        try:
+            updated = User.refill_ai_credits()
+            print(f"Créditos repostos para {updated} usuário(s)")
+            return True
+        except Exception as e:
+            db.session.rollback()
+            print(f"ERRO ao repor créditos: {str(e)}")
+            return False
+
+if __name__ == "__main__":
+    sys.exit(0 if refill() else 1)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Recalcula a tabela related_posts (posts relacionados por similaridade TF-IDF)
+
+Criar, editar ou excluir um post no admin já atualiza as linhas afetadas;
+este recálculo completo corrige a deriva do IDF acumulada entre execuções e
+popula a tabela na primeira vez. Pode rodar periodicamente (ex.: cron diário):
+
+    python scripts/related_posts.py
+    python scripts/related_posts.py --count 6
+
+Requer NumPy.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula os posts relacionados de todos os posts")
+    parser.add_argument('--count', type=int, help="Relacionados por post (padrão: RELATED_POSTS_COUNT)")
+    args = parser.parse_args(argv)
+
+    from app.related import numpy_available, rebuild_related_posts
+
+    if not numpy_available:
+        print("NumPy não instalado: pip install numpy")
+        return 1
+
+    app = create_app()
+    with app.app_context():
+        count = args.count or app.config.get('RELATED_POSTS_COUNT', 4)
+        started = time.perf_counter()
+        try:
+            total = rebuild_related_posts(db.session, count)
+        except Exception as e:
+            db.session.rollback()
+            print(f"ERRO ao calcular posts relacionados: {e}")
+            return 1
+        print(f"{total} post(s) processado(s) em {time.perf_counter() - started:.1f}s")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Re-renderização em lote dos posts escritos em Markdown
+
+O HTML de cada post é gerado uma única vez, ao salvar. Quando o renderizador
+muda (extensões, sanitização: app/content.RENDERER_VERSION), os posts
+gravados com uma versão anterior precisam ser renderizados de novo:
+
+    python scripts/render_posts.py               # só os desatualizados
+    python scripts/render_posts.py --all         # todos os posts em Markdown
+    python scripts/render_posts.py --adopt-html  # também os antigos em HTML (o HTML vira a fonte)
+    python scripts/render_posts.py --dry-run     # apenas conta
+
+Processa em lotes por id, com um commit por lote.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db  # noqa: E402
+
+
+def render_posts(args):
+    from sqlalchemy import or_
+    from app.content import RENDERER_VERSION
+    from app.models import Post
+
+    app = create_app()
+    with app.app_context():
+        query = Post.query
+        if not args.adopt_html:
+            query = query.filter(Post.content_markdown.isnot(None))
+        if not args.all:
+            query = query.filter(or_(Post.render_version.is_(None), Post.render_version < RENDERER_VERSION))
+
+        total = query.count()
+        print(f"{total} post(s) para renderizar (versão do renderizador: {RENDERER_VERSION})")
+        if args.dry_run or not total:
+            return 0
+
+        rendered = 0
+        last_id = 0
+        try:
+            while True:
+                posts = query.filter(Post.id > last_id).order_by(Post.id).limit(args.batch_size).all()
+                if not posts:
+                    break
+                for post in posts:
+                    source = post.content_markdown if post.content_markdown is not None else post.content
+                    post.set_markdown(source)
+                last_id = posts[-1].id
+                db.session.commit()
+                rendered += len(posts)
+                print(f"\r  {rendered}/{total}", end='', flush=True)
+        except Exception as e:
+            db.session.rollback()
+            print(f"\nERRO ao renderizar posts (último lote desfeito): {e}")
+            return 1
+        print(f"\n{rendered} post(s) renderizado(s)")
+        return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-renderiza o HTML dos posts a partir do Markdown")
+    parser.add_argument('--all', action='store_true', help="Renderizar mesmo os que já estão na versão atual")
+    parser.add_argument('--adopt-html', action='store_true',
+                        help="Incluir posts sem fonte Markdown, usando o HTML atual como fonte")
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--dry-run', action='store_true', help="Apenas contar os posts afetados")
+    return render_posts(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Presets de execução do gunicorn (sync, gthread, gevent)
+
+Cada preset dimensiona juntos os workers/threads do gunicorn e o pool de
+conexões do SQLAlchemy, para que o total de conexões abertas no pooler do
+Supabase seja previsível. O preset é escolhido pela variável GUNICORN_PRESET
+e cada valor pode ser sobrescrito individualmente:
+
+    WEB_WORKERS, WEB_THREADS, WEB_WORKER_CONNECTIONS, WEB_TIMEOUT,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+Notas de thread-safety verificadas para os modos gthread/gevent:
+- db.session do Flask-SQLAlchemy é um scoped_session por contexto de
+  aplicação (thread ou greenlet), nunca compartilhado entre requisições;
+- o cliente OpenAI é criado por requisição e o circuit breaker usa locks;
+- os handlers do logging são protegidos por lock (cooperativo com gevent).
+"""
+import importlib.util
+import multiprocessing
+import os
+
+DEFAULT_PRESET = 'sync'
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    try:
+        return int(value) if value else default
+    except ValueError:
+        return default
+
+
+def _base_presets(cpu_count):
+    return {
+        # Um request por processo: concorrência limitada ao número de workers
+        'sync': {
+            'worker_class': 'sync',
+            'workers': cpu_count * 2 + 1,
+            'threads': 1,
+            'worker_connections': 1,
+            'timeout': 300,
+            'preload_app': True,
+            'db_pool_size': 1,
+            'db_max_overflow': 1,
+        },
+        # Threads por worker: chamadas bloqueantes (OpenAI, webhook) liberam o GIL
+        'gthread': {
+            'worker_class': 'gthread',
+            'workers': cpu_count + 1,
+            'threads': 8,
+            'worker_connections': 8,
+            'timeout': 90,
+            'preload_app': True,
+            'db_pool_size': 4,
+            'db_max_overflow': 4,
+        },
+        # Greenlets: muitas requisições esperando I/O externo por worker; o pool
+        # é menor que worker_connections porque a maioria espera a OpenAI, não o banco
+        'gevent': {
+            'worker_class': 'gevent',
+            'workers': cpu_count,
+            'threads': 1,
+            'worker_connections': 200,
+            'timeout': 90,
+            'preload_app': False,  # O monkey patching precisa acontecer antes de importar a app
+            'db_pool_size': 5,
+            'db_max_overflow': 10,
+        },
+    }
+
+
+def preset_name():
+    """Nome do preset selecionado (GUNICORN_PRESET), com fallback para o padrão"""
+    name = (os.environ.get('GUNICORN_PRESET') or DEFAULT_PRESET).strip().lower()
+    return name if name in _base_presets(1) else DEFAULT_PRESET
+
+
+def get_preset(name=None):
+    """Retorna o preset com as sobrescritas de variáveis de ambiente aplicadas"""
+    name = name or preset_name()
+    if name == 'gevent' and importlib.util.find_spec('gevent') is None:
+        # Mesmo padrão das extensões opcionais: degradar em vez de quebrar o deploy
+        print("AVISO: gevent não está instalado; usando o preset gthread")
+        name = 'gthread'
+
+    preset = dict(_base_presets(multiprocessing.cpu_count())[name])
+    preset['name'] = name
+    preset['workers'] = _env_int('WEB_WORKERS', preset['workers'])
+    preset['threads'] = _env_int('WEB_THREADS', preset['threads'])
+    preset['worker_connections'] = _env_int('WEB_WORKER_CONNECTIONS', preset['worker_connections'])
+    preset['timeout'] = _env_int('WEB_TIMEOUT', preset['timeout'])
+    if name == 'gthread' and not os.environ.get('DB_POOL_SIZE'):
+        # O pool acompanha o número de threads quando WEB_THREADS é alterado
+        preset['db_pool_size'] = max(1, preset['threads'] // 2)
+        preset['db_max_overflow'] = max(1, preset['threads'] - preset['db_pool_size'])
+    preset['db_pool_size'] = _env_int('DB_POOL_SIZE', preset['db_pool_size'])
+    preset['db_max_overflow'] = _env_int('DB_MAX_OVERFLOW', preset['db_max_overflow'])
+    return preset
+
+
+def engine_options(preset=None):
+    """Opções de create_engine (SQLALCHEMY_ENGINE_OPTIONS) para bancos com pool de conexões"""
+    preset = preset or get_preset()
+    return {
+        'pool_size': preset['db_pool_size'],
+        'max_overflow': preset['db_max_overflow'],
+        'pool_timeout': 10,
+        'pool_recycle': 300,
+        'pool_pre_ping': True,
+    }
+
+
+def max_db_connections(preset=None):
+    """Máximo de conexões que todos os workers juntos podem abrir"""
+    preset = preset or get_preset()
+    return preset['workers'] * (preset['db_pool_size'] + preset['db_max_overflow'])